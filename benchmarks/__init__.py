@@ -0,0 +1 @@
+# Benchmarks for the CarAI command pipeline (run with: python -m benchmarks.<name>)
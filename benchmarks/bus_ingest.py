@@ -0,0 +1,131 @@
+"""
+Throughput check for vehicle signal ingestion (core/vehicle_bus.py).
+
+Generates a synthetic bus recording (speed/rpm at 100 Hz, fuel at 1 Hz,
+padded with unrelated frames up to --fps) and pushes it
+through a BusIngestor into a CarState and a TelemetryStore, either from a
+log file as fast as possible or over the local UDP stand-in. Reports frames
+per second, CPU share of the ingest thread, batch decode times and how
+often CarState was updated, and checks the decoded values.
+
+    python -m benchmarks.bus_ingest [--source log|udp] [--seconds 60] [--fps 5000] [--out results.json]
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from core import metrics
+from core.car_state import CarState
+from core.telemetry import TelemetryStore
+from core.vehicle_bus import FRAME, BusIngestor, LogFileSource, UdpSource, send_frames, write_log
+
+
+def make_frames(seconds, fps, seed=0):
+    rng = np.random.default_rng(seed)
+    n = int(seconds * fps)
+    frames = np.zeros(n, dtype=FRAME)
+    frames["t"] = 1_700_000_000.0 + np.arange(n) / fps
+    frames["dlc"] = 8
+    frames["id"] = rng.integers(0x400, 0x7FF, n)  # traffic we don't decode
+    frames["data"] = rng.integers(0, 256, (n, 8))
+
+    def every(hz):
+        return np.arange(0, n, max(int(fps / hz), 1))
+
+    speed_rows = every(100)
+    speed = 50 + 40 * np.sin(np.linspace(0, 6, len(speed_rows)))          # km/h
+    frames["id"][speed_rows] = 0x1A0
+    payload = (np.round(speed / 0.01).astype(np.uint64)
+               | (np.uint64(3000 * 4) << np.uint64(16)))
+    frames["data"][speed_rows] = payload.astype("<u8").view(np.uint8).reshape(-1, 8)
+
+    fuel_rows = every(1)
+    fuel = np.linspace(80, 79, len(fuel_rows))
+    frames["id"][fuel_rows] = 0x2F0
+    frames["data"][fuel_rows] = 0
+    frames["data"][fuel_rows, 0] = np.round(fuel / 0.4)
+    return frames, speed[-1], fuel[-1]
+
+
+def run(source_kind="log", seconds=60.0, fps=5000, publish_hz=10.0):
+    metrics.reset()
+    frames, last_speed, last_fuel = make_frames(seconds, fps)
+    state = CarState()
+    telemetry = TelemetryStore()
+    redraws = []
+    state.subscribe(lambda diff, version: redraws.append(version))
+
+    tmp = tempfile.TemporaryDirectory()
+    if source_kind == "log":
+        path = os.path.join(tmp.name, "bus.log")
+        write_log(path, frames)
+        source = LogFileSource(path, realtime=False)
+    else:
+        source = UdpSource("127.0.0.1", 0)
+
+    ingestor = BusIngestor(source, state, telemetry, publish_hz=publish_hz)
+    ingestor.start()
+    wall_start = time.monotonic()
+    if source_kind == "udp":
+        # Paced at --fps in 20 ms slices, like a bus adapter would deliver them
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        step = max(int(fps * 0.02), 1)
+        for i in range(0, len(frames), step):
+            due = wall_start + i / fps
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            send_frames(sender, source.address, frames[i:i + step])
+        time.sleep(0.5)
+        sender.close()
+    else:
+        source.finished.wait()
+        ingestor.thread.join()
+    stats = ingestor.stats()
+    ingestor.stop()
+    wall = time.monotonic() - wall_start
+    tmp.cleanup()
+
+    return {
+        "source": source_kind,
+        "frames_sent": len(frames),
+        "frames_received": stats["frames"],
+        "wall_seconds": wall,
+        "frames_per_second": stats["frames"] / wall if wall else 0.0,
+        "cpu_share": stats["cpu_share"],
+        "batch_seconds": stats["batch"],
+        "state_updates": len(redraws),
+        "state_updates_per_second": len(redraws) / wall if wall else 0.0,
+        "speed_ok": bool(abs(state.speed - last_speed) <= 1),
+        "fuel_ok": bool(abs(state.fuel - last_fuel) <= 1),
+        "telemetry_bytes": telemetry.memory_bytes(),
+        "speed_history": telemetry.aggregate("vehicle_speed", None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["log", "udp"], default="log")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--fps", type=int, default=5000)
+    parser.add_argument("--publish-hz", type=float, default=10.0)
+    parser.add_argument("--out", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args.source, args.seconds, args.fps, args.publish_hz)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+    return 0 if results["speed_ok"] and results["fuel_ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
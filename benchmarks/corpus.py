@@ -0,0 +1,62 @@
+"""
+Representative driver commands for the benchmarks.
+
+Each entry has the utterance, the CarState fields it should leave behind
+(None for questions), and canned replies the Ollama stub gives for it in
+heuristic and structured output mode.
+"""
+import json
+
+
+def _calls(*calls):
+    return json.dumps({"calls": [{"tool": t, "args": a} for t, a in calls]})
+
+
+def _heuristic(*calls):
+    return "\n".join(json.dumps({"tool": t, "args": a}) for t, a in calls)
+
+
+def _entry(utterance, expect, calls=(), answer=None, heuristic=None):
+    return {
+        "utterance": utterance,
+        "expect": expect,
+        "heuristic": heuristic if heuristic is not None else (_heuristic(*calls) if calls else answer),
+        "structured": _calls(*calls) if calls else json.dumps({"answer": answer}),
+    }
+
+
+CORPUS = [
+    # Handled by the local intent parser
+    _entry("turn on the AC", {"ac_on": True}, [("ac", {"on": "on"})]),
+    _entry("AC off please", {"ac_on": False}, [("ac", {"on": "off"})]),
+    _entry("set the temperature to 19 degrees", {"ac_on": True, "ac_temp": 19}, [("ac", {"on": "on", "temperature": 19})]),
+    _entry("lights on", {"lights_on": True}, [("lights", {"on": "on"})]),
+    _entry("switch the headlights off", {"lights_on": False}, [("lights", {"on": "off"})]),
+    _entry("wipers on", {"wipers_on": True}, [("wipers", {"on": "on"})]),
+    _entry("stop the wipers", {"wipers_on": False}, [("wipers", {"on": "off"})]),
+    _entry("open the driver window", {"windows": {"driver": 100, "passenger": 0}}, [("window", {"window": "driver", "action": "open"})]),
+    _entry("navigate to the airport", {"destination": "Airport"}, [("nav", {"destination": "Airport"})]),
+    _entry("cancel navigation", {"destination": None}, [("stop_nav", {})]),
+    _entry("turn the AC on at 20 and switch the headlights on", {"ac_on": True, "ac_temp": 20, "lights_on": True},
+           [("ac", {"on": "on", "temperature": 20}), ("lights", {"on": "on"})]),
+    # Need the LLM
+    _entry("it's getting dark out here", {"lights_on": True}, [("lights", {"on": "on"})]),
+    _entry("it's raining and I can't see a thing", {"wipers_on": True}, [("wipers", {"on": "on"})]),
+    _entry("I'm freezing", {"ac_on": False}, [("ac", {"on": "off"})]),
+    _entry("make it a bit cooler in here, like 18", {"ac_on": True, "ac_temp": 18}, [("ac", {"on": "on", "temperature": 18})],
+           heuristic='```json\n{"tool": "ac", "args": {"on": "on", "temperature": 18}}\n```'),
+    _entry("take me to the nearest charging station", {"destination": "Nearest Charging Station"},
+           [("nav", {"destination": "Nearest Charging Station"})],
+           heuristic='Sure! {"tool": "nav", "args": {"destination": "Nearest Charging Station"}}'),
+    _entry("let some air in on the passenger side", {"windows": {"driver": 0, "passenger": 100}},
+           [("window", {"window": "passenger", "action": "open"})]),
+    _entry("it's dark and wet, sort it out", {"lights_on": True, "wipers_on": True},
+           [("lights", {"on": "on"}), ("wipers", {"on": "on"})]),
+    _entry("what's the capital of France?", None, answer="The capital of France is Paris."),
+    _entry("tell me a short joke", None,
+           answer="Why did the car get a flat tire? Because there was a fork in the road. Sorry, that one was a bit deflating."),
+    _entry("how far can I drive on a full charge?", None,
+           answer="On a full charge you can usually drive around four hundred kilometres. Driving style and weather change that a lot."),
+]
+
+BY_UTTERANCE = {e["utterance"].lower(): e for e in CORPUS}
@@ -0,0 +1,189 @@
+"""
+Local stand-in for the Ollama HTTP API (/api/chat, /api/tags, /api/version).
+
+Replies come from benchmarks.corpus (or a fixed fallback) and are delivered at
+a configurable token rate after a configurable first-token latency, with an
+optional one-off model load delay to mimic cold starts. --reject-format
+answers requests with a JSON-schema `format` with HTTP 400, like an Ollama
+too old for structured output. Needs no network and no Ollama install:
+
+    python -m benchmarks.ollama_stub --port 11500 --tokens-per-second 40
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .corpus import BY_UTTERANCE
+
+_TOKEN = re.compile(r"\s*\S{1,4}|\s+")
+FALLBACK_ANSWER = "I'm not sure about that."
+
+
+def tokenize(text: str):
+    """Rough stand-in for a tokenizer: chunks of up to four characters."""
+    return _TOKEN.findall(text)
+
+
+class StubConfig:
+    def __init__(self, tokens_per_second=50.0, first_token_latency=0.05, load_time=0.0,
+                 error_rate=0.0, responses=None, reject_format=False):
+        self.tokens_per_second = tokens_per_second
+        self.first_token_latency = first_token_latency
+        self.load_time = load_time
+        self.error_rate = error_rate
+        self.reject_format = reject_format
+        self.responses = responses or {}  # utterance -> reply, overrides the corpus
+        self.loaded = set()
+        self.requests = 0
+        self.random = random.Random(0)  # failures are reproducible between runs
+        self.lock = threading.Lock()
+
+    def reply_for(self, utterance: str, structured: bool) -> str:
+        key = utterance.strip().lower()
+        if key in self.responses:
+            return self.responses[key]
+        entry = BY_UTTERANCE.get(key)
+        if entry:
+            return entry["structured" if structured else "heuristic"]
+        return json.dumps({"answer": FALLBACK_ANSWER}) if structured else FALLBACK_ANSWER
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # set by make_server
+
+    def log_message(self, *args):
+        pass  # keep benchmark output clean
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json(200, {"version": "0.0.0-stub"})
+        elif self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": m} for m in sorted(self.config.loaded)]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != "/api/chat":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        cfg = self.config
+        model = request.get("model", "")
+        with cfg.lock:
+            cfg.requests += 1
+            fail = cfg.random.random() < cfg.error_rate
+            cold = model not in cfg.loaded
+            cfg.loaded.add(model)
+        if fail:
+            self._send_json(500, {"error": "stub: simulated failure"})
+            return
+        if cfg.reject_format and isinstance(request.get("format"), dict):
+            self._send_json(400, {"error": "stub: invalid format: expected \"json\" or a JSON schema"})
+            return
+
+        started = time.monotonic()
+        load = cfg.load_time if cold else 0.0
+        time.sleep(load)
+
+        messages = request.get("messages") or []
+        user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        reply = cfg.reply_for(user, bool(request.get("format"))) if user else ""
+        tokens = tokenize(reply)
+        options = request.get("options") or {}
+        if options.get("num_predict"):
+            tokens = tokens[:options["num_predict"]]
+
+        time.sleep(cfg.first_token_latency)
+        stats = {
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": sum(len(m.get("content", "")) for m in messages) // 4,
+            "eval_count": len(tokens),
+        }
+
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                self._chunk(self._message(model, token, False))
+                time.sleep(1.0 / cfg.tokens_per_second)
+            final = self._message(model, "", True)
+            final.update(stats, total_duration=int((time.monotonic() - started) * 1e9), done_reason="stop")
+            self._chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(len(tokens) / cfg.tokens_per_second)
+            body = self._message(model, reply if tokens else "", True)
+            body.update(stats, total_duration=int((time.monotonic() - started) * 1e9), done_reason="stop")
+            self._send_json(200, body)
+
+    @staticmethod
+    def _message(model, content, done):
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+
+    def _chunk(self, body):
+        data = (json.dumps(body) + "\n").encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def make_server(config: StubConfig = None, host="127.0.0.1", port=0):
+    """Creates (but doesn't start) a stub server; port 0 picks a free port."""
+    handler = type("StubHandler", (_Handler,), {"config": config or StubConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(config: StubConfig = None, host="127.0.0.1", port=0):
+    """Starts a stub on a daemon thread. Returns (server, base_url)."""
+    server = make_server(config, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    parser.add_argument("--load-time", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--reject-format", action="store_true", help="answer schema-constrained requests with 400")
+    args = parser.parse_args()
+
+    config = StubConfig(args.tokens_per_second, args.first_token_latency, args.load_time, args.error_rate,
+                        reject_format=args.reject_format)
+    server = make_server(config, args.host, args.port)
+    print(f"Ollama stub listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compares the structured (schema-constrained) output mode with the heuristic
+free-form mode: tokens generated per command and parse-failure rate.
+
+Needs a running Ollama with config.OLLAMA_MODEL pulled (the stub in
+benchmarks.ollama_stub replays canned output and says nothing about a model).
+    python -m benchmarks.output_modes [--repeat N] [--out results.json]
+"""
+import argparse
+import json
+import sys
+
+from core import tool_registry
+from core.llm_client import get_client
+from core.ollama_handler import SYSTEM_PROMPT, parse_tool_calls
+from core.structured_output import OUTPUT_SCHEMA, STRUCTURED_SYSTEM_PROMPT, parse_response
+
+from .corpus import CORPUS
+
+COMMANDS = [entry["utterance"] for entry in CORPUS]
+
+
+def _valid(tool_calls) -> bool:
+    try:
+        for name, args in tool_calls:
+            tool_registry.resolve(name).validate(args)
+        return True
+    except tool_registry.ToolCallError:
+        return False
+
+
+def _heuristic(content: str) -> bool:
+    """True if today's heuristic parser got something usable out of the reply."""
+    content = content.replace("```json", "").replace("```", "")
+    tool_calls = parse_tool_calls(content)
+    if tool_calls:
+        return _valid(tool_calls)
+    return "{" not in content  # plain answer is fine, broken JSON is not
+
+
+def _structured(content: str) -> bool:
+    try:
+        tool_calls, _ = parse_response(content)
+    except ValueError:
+        return False
+    return _valid(tool_calls)
+
+
+MODES = {
+    "heuristic": (SYSTEM_PROMPT, None, _heuristic),
+    "structured": (STRUCTURED_SYSTEM_PROMPT, OUTPUT_SCHEMA, _structured),
+}
+
+
+def run(repeat: int = 1) -> dict:
+    client = get_client()
+    results = {}
+    for mode, (prompt, fmt, check) in MODES.items():
+        tokens, failures, samples = 0, 0, 0
+        for _ in range(repeat):
+            for command in COMMANDS:
+                messages = [{'role': 'system', 'content': prompt}, {'role': 'user', 'content': command}]
+                kwargs = {"format": fmt} if fmt else {}
+                response = client.chat(messages, **kwargs)
+                tokens += response.get('eval_count') or 0
+                failures += 0 if check(response['message']['content']) else 1
+                samples += 1
+        results[mode] = {
+            "commands": samples,
+            "tokens_per_command": tokens / samples,
+            "parse_failure_rate": failures / samples,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--out", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
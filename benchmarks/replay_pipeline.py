@@ -0,0 +1,191 @@
+"""
+Runs recorded sessions through the whole voice pipeline (wake word ->
+endpointing -> STT -> command scheduler -> Ollama stub) with no microphone,
+and reports wake-word detection rate, false accepts, transcripts, per-stage
+latencies from the traces and throughput (seconds of audio per wall second).
+
+Sessions are 16 kHz mono 16-bit WAV files. An optional JSON file of the same
+name holds the labels: when each wake word ends (seconds) and what the
+commands were:
+    {"wake": [1.9, 7.4], "commands": ["turn on the ac", "open the windows"]}
+
+Needs PyQt6, the wake-word model and the configured STT engine; speech
+output is off.
+    python -m benchmarks.replay_pipeline --sessions path/to/wavs [--fast] [--out results.json]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from core import config, llm_client, metrics, tracing
+from core.audio_source import WavReplaySource
+from core.car_state import CarState
+
+from .ollama_stub import StubConfig, start_in_background
+
+MATCH_WINDOW = 1.0  # seconds between a labelled wake word and a detection
+
+
+def _labels(wav_path):
+    path = os.path.splitext(wav_path)[0] + ".json"
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _normalise(text):
+    return " ".join(re.sub(r"[^a-z0-9 ]", " ", text.lower()).split())
+
+
+def _wait_drained(voice, timeout):
+    """Waits until every reader has caught up with the replayed audio and no command is running."""
+    deadline = time.monotonic() + timeout
+    idle_since = None
+    while time.monotonic() < deadline:
+        capture = voice.capture
+        stats = voice.scheduler.stats()
+        idle = (capture is not None and not voice.is_processing
+                and stats["queue_depth"] == 0 and stats["active"] == 0
+                and all(r.position >= capture.position for r in list(capture.ring.readers)))
+        if idle:
+            idle_since = idle_since or time.monotonic()
+            if time.monotonic() - idle_since >= 0.5:
+                return True
+        else:
+            idle_since = None
+        time.sleep(0.05)
+    return False
+
+
+def _score(source, traces, transcripts):
+    """Matches wake-word detections and transcripts against each file's labels."""
+    detections = sorted(t["audio_position"] for t in traces
+                        if t.get("trigger") == "wake_word" and "audio_position" in t)
+    files = []
+    for path, first, end in source.segments:
+        labels = _labels(path)
+        found = [(p - first) / source.rate for p in detections if first <= p < end + source.rate]
+        expected = labels.get("wake", [])
+        hits = 0
+        unmatched = list(found)
+        for at in expected:
+            near = [d for d in unmatched if abs(d - at) <= MATCH_WINDOW]
+            if near:
+                hits += 1
+                unmatched.remove(near[0])
+        heard = [text for position, text in transcripts if first <= position < end + source.rate]
+        commands = [_normalise(c) for c in labels.get("commands", [])]
+        files.append({
+            "file": os.path.basename(path),
+            "seconds": (end - first) / source.rate,
+            "labelled": "wake" in labels,
+            "wake_expected": len(expected),
+            "wake_detected": hits,
+            "false_accepts": len(unmatched) if "wake" in labels else None,
+            "detections": [round(d, 2) for d in found],
+            "transcripts": heard,
+            "commands_matched": sum(1 for c in commands if c in [_normalise(h) for h in heard]),
+            "commands_expected": len(commands),
+        })
+    return files
+
+
+def run(paths, fast=False, stub=None, drain_timeout=60.0):
+    from PyQt6.QtCore import QCoreApplication, Qt
+    from core.voice_handler import VoiceHandler
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    server, host = start_in_background(stub or StubConfig())
+    config.OLLAMA_HOST = host
+    llm_client._client = None  # pick up the new host
+    metrics.reset()
+
+    traces = []
+    tracing.add_listener(traces.append)
+    source = WavReplaySource(paths, realtime=not fast)
+    voice = VoiceHandler(CarState(), audio_source=source, speech=False)
+
+    # Final transcripts, tagged with where in the replayed audio they were heard
+    transcripts = []
+    lock = threading.Lock()
+
+    def on_status(message):
+        if message.startswith("You: ") and not message.endswith("..."):
+            capture = voice.capture
+            with lock:
+                transcripts.append((capture.position if capture else 0, message[5:]))
+    # The status signal is emitted from the voice thread; there is no event loop here
+    voice.voice_status.connect(on_status, Qt.ConnectionType.DirectConnection)
+
+    wall_start = time.monotonic()
+    voice.start()
+    try:
+        source.finished.wait()
+        drained = _wait_drained(voice, drain_timeout)
+    finally:
+        wall = time.monotonic() - wall_start
+        voice.stop()
+        tracing.remove_listener(traces.append)
+        server.shutdown()
+    del app
+
+    audio_seconds = source.delivered / source.rate
+    files = _score(source, traces, transcripts)
+    labelled = [f for f in files if f["labelled"]]
+    expected = sum(f["wake_expected"] for f in labelled)
+    commands_expected = sum(f["commands_expected"] for f in files)
+    return {
+        "mode": "fast" if fast else "realtime",
+        "files": len(files),
+        "audio_seconds": audio_seconds,
+        "wall_seconds": wall,
+        "realtime_factor": audio_seconds / wall if wall else 0.0,
+        "drained": drained,
+        "wake_detection_rate": sum(f["wake_detected"] for f in labelled) / expected if expected else None,
+        "false_accepts": sum(f["false_accepts"] for f in labelled),
+        "false_accepts_per_hour": (sum(f["false_accepts"] for f in labelled)
+                                   / (sum(f["seconds"] for f in labelled) / 3600) if labelled else None),
+        "command_match_rate": (sum(f["commands_matched"] for f in files) / commands_expected
+                               if commands_expected else None),
+        "outcomes": {o: sum(1 for t in traces if t.get("outcome") == o)
+                     for o in sorted({t.get("outcome") for t in traces if t.get("outcome")})},
+        "stages": tracing.stage_stats(),
+        "dropped_samples": metrics.counter("audio.dropped_samples"),
+        "per_file": files,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", required=True, help="directory of WAV files (or a single WAV)")
+    parser.add_argument("--fast", action="store_true", help="replay as fast as the pipeline keeps up")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    parser.add_argument("--out", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.sessions):
+        paths = sorted(glob.glob(os.path.join(args.sessions, "*.wav")))
+    else:
+        paths = [args.sessions]
+    if not paths:
+        print(f"No WAV files in {args.sessions}")
+        return 1
+
+    results = run(paths, fast=args.fast, stub=StubConfig(args.tokens_per_second, args.first_token_latency))
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
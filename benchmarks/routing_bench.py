@@ -0,0 +1,202 @@
+"""
+Latency benchmark for offline routing (core/routing.py) on a synthetic
+city-sized road graph: a jittered street grid with faster arterials every
+few blocks and some streets missing.
+
+Reports graph load time, cold query latency for plain A* and for A* with
+landmarks (ALT), cached query latency and incremental reroute latency after
+a deviation (against a cold search from the same point), and checks a
+sample of routes against plain Dijkstra.
+
+    python -m benchmarks.routing_bench [--size 250] [--queries 200] [--out results.json]
+    python -m benchmarks.routing_bench --write models/roads.npz   # demo graph for the app
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from core import metrics
+from core.routing import RoadGraph, Router, build_landmarks, dijkstra
+
+PLACES = ["Home", "Office", "Airport", "Central Station", "Hospital", "Mall", "Stadium", "Beach", "University"]
+
+
+def make_city_graph(size=250, block_m=120.0, seed=0):
+    """size x size junctions (~size^2 nodes, ~4 size^2 directed edges)."""
+    rng = np.random.default_rng(seed)
+    rows, cols = np.divmod(np.arange(size * size), size)
+    lat0, lon0 = 47.37, 8.54
+    jitter = rng.normal(0, block_m * 0.15, (2, size * size))
+    lat = lat0 + (rows * block_m + jitter[0]) / 111_320.0
+    lon = lon0 + (cols * block_m + jitter[1]) / (111_320.0 * math.cos(math.radians(lat0)))
+
+    edges = []
+    for dr, dc in ((0, 1), (1, 0)):
+        ok = (rows + dr < size) & (cols + dc < size)
+        a = np.flatnonzero(ok)
+        b = a + dr * size + dc
+        # Every 8th street is an arterial
+        line = rows[a] if dr == 0 else cols[a]
+        speed = np.where(line % 8 == 0, rng.uniform(60, 80, len(a)), rng.uniform(30, 50, len(a)))
+        keep = rng.random(len(a)) > 0.05   # a few missing street segments
+        edges.append((a[keep], b[keep], speed[keep]))
+    a = np.concatenate([e[0] for e in edges])
+    b = np.concatenate([e[1] for e in edges])
+    speed = np.concatenate([e[2] for e in edges])
+    # Both directions
+    src = np.concatenate((a, b))
+    dst = np.concatenate((b, a))
+    speed = np.concatenate((speed, speed))
+    order = np.argsort(src, kind="stable")
+    src, dst, speed = src[order], dst[order], speed[order]
+    indptr = np.zeros(size * size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=size * size), out=indptr[1:])
+
+    y = np.radians(lat) * 6371000.0
+    x = np.radians(lon) * math.cos(math.radians(lat0)) * 6371000.0
+    length = np.hypot(x[src] - x[dst], y[src] - y[dst])
+    places = {name: int(rng.integers(size * size)) for name in PLACES}
+    return RoadGraph(lat, lon, indptr, dst, length, speed, places)
+
+
+def _stats(values):
+    values = sorted(values)
+    return {"p50_ms": metrics.percentile(values, 50) * 1000, "p95_ms": metrics.percentile(values, 95) * 1000,
+            "max_ms": values[-1] * 1000}
+
+
+def _cold_queries(router, pairs):
+    timings, settled = [], []
+    for s, t in pairs:
+        router.cache.clear()
+        router._heuristics.clear()
+        metrics.reset()
+        started = time.perf_counter()
+        router.route(s, t)
+        timings.append(time.perf_counter() - started)
+        settled.append(metrics.summary("routing.settled").get("last", 0))
+    out = _stats(timings)
+    out["settled_p50"] = metrics.percentile(settled, 50)
+    return out
+
+
+def run(size=250, queries=200, landmarks=8, seed=0):
+    rng = random.Random(seed)
+    graph = make_city_graph(size, seed=seed)
+    started = time.perf_counter()
+    build_landmarks(graph, landmarks)
+    build_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "roads.npz")
+        graph.save(path)
+        file_bytes = os.path.getsize(path)
+        started = time.perf_counter()
+        graph = RoadGraph.load(path)
+        load_seconds = time.perf_counter() - started
+
+    plain = RoadGraph(graph.lat, graph.lon, graph.indptr, graph.indices, graph.length_m, graph.speed_kmh)
+    pairs = [(rng.randrange(graph.nodes), rng.randrange(graph.nodes)) for _ in range(queries)]
+    alt_router = Router(graph)
+    results = {
+        "nodes": graph.nodes,
+        "edges": len(graph.indices),
+        "file_bytes": file_bytes,
+        "landmark_build_seconds": build_seconds,
+        "load_seconds": load_seconds,
+        "astar": _cold_queries(Router(plain), pairs[:max(queries // 4, 1)]),
+        "alt": _cold_queries(alt_router, pairs),
+    }
+
+    # Cached: the same destinations again, from the start or from part way along
+    alt_router.cache.clear()
+    routes = [alt_router.route(s, t) for s, t in pairs]
+    timings = []
+    for route in routes:
+        if route is None:
+            continue
+        node = route.nodes[len(route.nodes) // 2]
+        started = time.perf_counter()
+        alt_router.route(node, route.target)
+        timings.append(time.perf_counter() - started)
+    results["cached"] = _stats(timings)
+
+    # Deviation: leave the route half way at a side street, then reroute
+    reroute, scratch = [], []
+    for route in routes:
+        if route is None or len(route.nodes) < 10:
+            continue
+        at = route.nodes[len(route.nodes) // 2]
+        off = [v for v in graph._indices[graph._indptr[at]:graph._indptr[at + 1]] if v not in route.index]
+        if not off:
+            continue
+        # As in the car: the route was just planned, so its bounds are warm
+        alt_router.cache.clear()
+        alt_router._heuristics.clear()
+        alt_router.route(route.nodes[0], route.target)
+        alt_router.cache.clear()
+        started = time.perf_counter()
+        new = alt_router.reroute(route, off[0])
+        reroute.append(time.perf_counter() - started)
+        alt_router.cache.clear()
+        alt_router._heuristics.clear()
+        started = time.perf_counter()
+        fresh = alt_router.route(off[0], route.target)
+        scratch.append(time.perf_counter() - started)
+        if new is not None and fresh is not None and new.seconds > fresh.seconds + 1e-6:
+            results.setdefault("reroute_suboptimal", 0)
+            results["reroute_suboptimal"] = results["reroute_suboptimal"] + 1
+    results["reroute"] = _stats(reroute) if reroute else {}
+    results["reroute_from_scratch"] = _stats(scratch) if scratch else {}
+
+    # Optimality against Dijkstra
+    mismatches = 0
+    for s, t in pairs[:10]:
+        exact = dijkstra(graph.indptr, graph.indices, graph.seconds, s, graph.nodes)[t]
+        alt_router.cache.clear()
+        route = alt_router.route(s, t)
+        found = route.seconds if route else math.inf
+        if not (math.isinf(exact) and math.isinf(found)) and abs(found - exact) > 1e-6 * max(exact, 1.0):
+            mismatches += 1
+    results["dijkstra_mismatches"] = mismatches
+    return results
+
+
+def write_demo(path, size=120, landmarks=8):
+    graph = make_city_graph(size)
+    build_landmarks(graph, landmarks)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    graph.save(path)
+    print(f"Wrote {path}: {graph.nodes} nodes, places: {', '.join(graph.places)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=250, help="grid side (size^2 junctions)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--landmarks", type=int, default=8)
+    parser.add_argument("--write", help="write a demo graph to this path and exit")
+    parser.add_argument("--out", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    if args.write:
+        write_demo(args.write, landmarks=args.landmarks)
+        return 0
+    results = run(args.size, args.queries, args.landmarks)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+    return 1 if results["dijkstra_mismatches"] or results.get("reroute_suboptimal") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+End-to-end command latency benchmark.
+
+Runs the benchmarks.corpus commands through the command pipeline against the
+local Ollama stub (or a real server with --host) and reports p50/p95/p99
+latency, throughput and parse-success rate as JSON. Runs headless with no
+network:
+
+    python -m benchmarks.run --mode stream --repeat 5 --out results.json
+
+Modes:
+    command  ollama_handler.process_command
+    stream   ollama_handler.process_command_stream (also reports time to first sentence)
+    voice    VoiceHandler._process_text_logic with speech output disabled
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import config, llm_client, metrics
+from core.car_state import CarState
+
+from .corpus import CORPUS
+from .ollama_stub import StubConfig, start_in_background
+
+
+def _matches(state: CarState, expect) -> bool:
+    return all(getattr(state, field) == value for field, value in expect.items())
+
+
+def _succeeded(entry, state: CarState, reply: str, handler) -> bool:
+    """A tool command must leave the expected state; a question needs a real answer."""
+    if entry["expect"] is not None:
+        return _matches(state, entry["expect"])
+    failures = (handler.NOT_UNDERSTOOD, handler.OFFLINE_REPLY, "I'm having trouble connecting to my local brain.")
+    return bool(reply) and reply not in failures
+
+
+def _make_runner(mode: str):
+    from core import ollama_handler
+
+    if mode == "command":
+        def run(text, state):
+            return ollama_handler.process_command(text, state), None
+    elif mode == "stream":
+        def run(text, state):
+            started = time.monotonic()
+            first = []
+
+            def on_sentence(sentence):
+                if not first:
+                    first.append(time.monotonic() - started)
+            reply = ollama_handler.process_command_stream(text, state, on_sentence=on_sentence)
+            return reply, first[0] if first else None
+    elif mode == "voice":
+        from core.voice_handler import VoiceHandler
+        handlers = {}
+
+        def run(text, state):
+            if id(state) not in handlers:
+                voice = VoiceHandler(state)
+                voice.AUDIO_AVAILABLE = False  # speak() becomes a no-op
+                handlers[id(state)] = voice
+            handlers.pop(id(state))._process_text_logic(text)
+            return "", None
+    else:
+        raise ValueError(f"unknown mode {mode}")
+    return run, ollama_handler
+
+
+def _stats(values) -> dict:
+    if not values:
+        return {}
+    return {
+        "mean": sum(values) / len(values),
+        "p50": metrics.percentile(values, 50),
+        "p95": metrics.percentile(values, 95),
+        "p99": metrics.percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def run(mode="command", repeat=3, concurrency=1, host=None, stub=None, fast_path=True, cache=True):
+    server = None
+    if host is None:
+        server, host = start_in_background(stub or StubConfig())
+    config.OLLAMA_HOST = host
+    config.FAST_PATH_ENABLED = fast_path
+    config.COMMAND_CACHE_ENABLED = cache
+    llm_client._client = None  # pick up the new host
+    metrics.reset()
+
+    runner, handler = _make_runner(mode)
+    handler.command_cache.clear()
+    handler.llm_breaker.record_success()
+    handler._structured_supported = True
+    jobs = [entry for _ in range(repeat) for entry in CORPUS]
+
+    def one(entry):
+        state = CarState()
+        started = time.monotonic()
+        reply, first_audio = runner(entry["utterance"], state)
+        elapsed = time.monotonic() - started
+        ok = _succeeded(entry, state, reply, handler) if mode != "voice" or entry["expect"] else True
+        return entry["utterance"], elapsed, first_audio, ok
+
+    wall_start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, jobs))
+    wall = time.monotonic() - wall_start
+
+    if server:
+        server.shutdown()
+
+    per_command = {}
+    for utterance, elapsed, _, ok in samples:
+        item = per_command.setdefault(utterance, {"latencies": [], "ok": 0})
+        item["latencies"].append(elapsed)
+        item["ok"] += ok
+
+    first_audio = [f for _, _, f, _ in samples if f is not None]
+    return {
+        "mode": mode,
+        "repeat": repeat,
+        "concurrency": concurrency,
+        "fast_path": fast_path,
+        "cache": cache,
+        "python": platform.python_version(),
+        "commands": len(samples),
+        "wall_seconds": wall,
+        "throughput_per_second": len(samples) / wall if wall else 0.0,
+        "parse_success_rate": sum(ok for *_, ok in samples) / len(samples),
+        "latency": _stats([elapsed for _, elapsed, _, _ in samples]),
+        "time_to_first_sentence": _stats(first_audio),
+        "routes": handler.route_stats(),
+        "per_command": {
+            u: {"p50": metrics.percentile(i["latencies"], 50), "success_rate": i["ok"] / len(i["latencies"])}
+            for u, i in per_command.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["command", "stream", "voice"], default="command")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--host", help="benchmark a real Ollama server instead of the stub")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--first-token-latency", type=float, default=0.05)
+    parser.add_argument("--load-time", type=float, default=0.0)
+    parser.add_argument("--reject-format", action="store_true",
+                        help="stub answers schema-constrained requests with HTTP 400")
+    parser.add_argument("--no-fast-path", action="store_true")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--out", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    stub = StubConfig(args.tokens_per_second, args.first_token_latency, args.load_time,
+                      reject_format=args.reject_format)
+    results = run(args.mode, args.repeat, args.concurrency, args.host, stub,
+                  fast_path=not args.no_fast_path, cache=not args.no_cache)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
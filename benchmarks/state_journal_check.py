@@ -0,0 +1,175 @@
+"""
+Crash-consistency check and restore timing for the CarState journal
+(core/state_journal.py).
+
+Writes a random history of state changes, then simulates a crash at every
+byte offset of the journal (a torn final write) and with corrupted bytes in
+the last record. Each time, restore must give exactly the state after the
+last intact record, and a write after the restore must survive the next
+restore. Also checks a crash between writing a snapshot and truncating the
+journal, then times snapshot + tail restore for a full journal.
+
+    python -m benchmarks.state_journal_check [--changes 60] [--out results.json]
+
+Exits with status 1 if any case restores the wrong state.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from core.car_state import CarState
+from core.state_journal import PERSISTED, StateJournal, read_records
+
+
+def _persisted(state):
+    snap = state.snapshot()
+    return {k: dict(v) if k == "windows" else v for k, v in ((k, getattr(snap, k)) for k in PERSISTED)}
+
+
+def _random_change(rng):
+    choice = rng.randrange(6)
+    if choice == 0:
+        return {"ac_on": rng.random() < 0.5, "ac_temp": rng.randint(16, 30)}
+    if choice == 1:
+        return {"lights_on": rng.random() < 0.5}
+    if choice == 2:
+        return {"wipers_on": rng.random() < 0.5}
+    if choice == 3:
+        return {"destination": rng.choice([None, "Home", "Office", "Zürich Hauptbahnhof"])}
+    if choice == 4:
+        return {"windows": {"driver": rng.choice([0, 100]), "passenger": rng.choice([0, 100])}}
+    return {"fuel": rng.randint(0, 100)}
+
+
+def _write_history(directory, changes, seed, compact_every=10_000):
+    """Applies `changes` random updates through an attached journal. Returns the expected state after each record."""
+    rng = random.Random(seed)
+    state = CarState()
+    journal = StateJournal(directory, compact_every=compact_every, fsync=False)
+    journal.restore(state)
+    journal.attach(state)
+    expected = [_persisted(state)]
+    for _ in range(changes):
+        before = state.version
+        state.update(**_random_change(rng))
+        if state.version != before:
+            expected.append(_persisted(state))
+    journal.close()
+    return expected
+
+
+def _restore(directory):
+    state = CarState()
+    journal = StateJournal(directory, fsync=False)
+    info = journal.restore(state)
+    return state, journal, info
+
+
+def check_torn_writes(changes, seed):
+    failures = []
+    cases = 0
+    with tempfile.TemporaryDirectory() as base:
+        clean = os.path.join(base, "clean")
+        expected = _write_history(clean, changes, seed)
+        with open(os.path.join(clean, "state.journal"), "rb") as f:
+            data = f.read()
+        ends = [end for _, _, end in read_records(data)]
+        crash = os.path.join(base, "crash")
+
+        def run_case(name, journal_bytes):
+            nonlocal cases
+            cases += 1
+            shutil.rmtree(crash, ignore_errors=True)
+            shutil.copytree(clean, crash)
+            with open(os.path.join(crash, "state.journal"), "wb") as f:
+                f.write(journal_bytes)
+            intact = sum(1 for _, _, _ in read_records(journal_bytes))
+            state, journal, _ = _restore(crash)
+            if _persisted(state) != expected[intact]:
+                failures.append(f"{name}: restored the wrong state")
+                return
+            # The next run must be able to append after the trimmed journal
+            journal.attach(state)
+            state.update(ac_temp=17 if state.ac_temp != 17 else 18)
+            after = _persisted(state)
+            journal.close()
+            if _persisted(_restore(crash)[0]) != after:
+                failures.append(f"{name}: write after restore was lost")
+
+        for cut in range(len(data) + 1):
+            run_case(f"truncated at byte {cut}", data[:cut])
+        if len(ends) >= 2:
+            last_start = ends[-2]
+            for i in range(last_start, len(data)):
+                damaged = bytearray(data)
+                damaged[i] ^= 0xFF
+                run_case(f"flipped byte {i} in last record", bytes(damaged))
+    return cases, failures
+
+
+def check_compaction_crash(changes, seed):
+    """A crash after the snapshot was renamed but before the journal was truncated."""
+    with tempfile.TemporaryDirectory() as base:
+        expected = _write_history(base, changes, seed)
+        with open(os.path.join(base, "state.journal"), "rb") as f:
+            journal_bytes = f.read()
+        state, journal, _ = _restore(base)
+        journal.attach(state)
+        journal.queue.put(None)       # stop the writer so we can compact from here
+        journal.thread.join()
+        journal.thread = None
+        journal.compact()
+        journal.close()
+        with open(os.path.join(base, "state.journal"), "wb") as f:
+            f.write(journal_bytes)    # the old journal is back, as if never truncated
+        restored, _, info = _restore(base)
+        ok = _persisted(restored) == expected[-1] and info["replayed"] == 0
+        return ok
+
+
+def time_restore(records, seed, repeat=20):
+    with tempfile.TemporaryDirectory() as base:
+        # Snapshot half way, then a journal tail of records / 2
+        _write_history(base, records, seed, compact_every=max(records // 2, 1))
+        size = os.path.getsize(os.path.join(base, "state.journal"))
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            _, _, info = _restore(base)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return {"records": records, "journal_bytes": size, "replayed": info["replayed"],
+                "restore_ms_median": timings[len(timings) // 2] * 1000, "restore_ms_max": timings[-1] * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--changes", type=int, default=60, help="history length for the crash cases")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    cases, failures = check_torn_writes(args.changes, args.seed)
+    compaction_ok = check_compaction_crash(args.changes, args.seed)
+    results = {
+        "torn_write_cases": cases,
+        "failures": failures[:20],
+        "failure_count": len(failures),
+        "compaction_crash_ok": compaction_ok,
+        "restore": time_restore(256, args.seed),
+    }
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+    return 0 if not failures and compaction_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
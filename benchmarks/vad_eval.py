@@ -0,0 +1,193 @@
+"""
+Measures the VAD / endpointer (core/vad.py) against labelled recordings:
+frame accuracy, speech precision/recall, false starts and endpoint latency
+(how long after the labelled end of speech the command was closed).
+
+Fixtures are 16 kHz mono 16-bit WAV files, each with a JSON file of the same
+name listing the speech segments in seconds:
+    {"speech": [[0.52, 1.84], [2.40, 3.10]]}
+
+    python -m benchmarks.vad_eval --fixtures path/to/wavs [--out results.json]
+    python -m benchmarks.vad_eval --synthetic 20     # generated fixtures, no recordings needed
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from core import config
+from core.audio_source import read_wav
+from core.metrics import percentile
+from core.vad import VoiceActivityDetector, Endpointer
+
+RATE = 16000
+BLOCK = 480  # 30 ms, same block size the voice handler reads
+
+
+def write_wav(path, samples):
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(samples.astype(np.int16).tobytes())
+
+
+def make_synthetic(directory, count, seed=0):
+    """
+    Writes `count` fixtures: cabin-like noise (low rumble plus hiss) with one
+    or two bursts of voiced "speech" (a harmonic series with a wandering pitch
+    and syllable-rate amplitude envelope).
+    """
+    rng = np.random.default_rng(seed)
+    for n in range(count):
+        duration = rng.uniform(3.0, 6.0)
+        t = np.arange(int(duration * RATE)) / RATE
+        noise_level = rng.uniform(100, 600)
+        rumble = np.convolve(rng.normal(0, 1, len(t)), np.ones(40) / 40, mode="same")
+        signal = noise_level * (rng.normal(0, 0.5, len(t)) + 4 * rumble)
+
+        segments = []
+        start = rng.uniform(0.4, 1.0)
+        for _ in range(rng.integers(1, 3)):
+            length = rng.uniform(0.6, 1.6)
+            end = min(start + length, duration - 0.8)
+            if end - start < 0.3:
+                break
+            i, j = int(start * RATE), int(end * RATE)
+            seg_t = t[i:j] - start
+            pitch = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * 1.5 * seg_t))
+            phase = 2 * np.pi * np.cumsum(pitch) / RATE
+            voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+            envelope = 0.6 + 0.4 * np.abs(np.sin(2 * np.pi * 3.0 * seg_t))
+            signal[i:j] += noise_level * rng.uniform(6, 15) * voiced * envelope
+            segments.append([round(start, 3), round(end, 3)])
+            start = end + rng.uniform(0.5, 1.0)
+
+        name = os.path.join(directory, f"synthetic_{n:03d}")
+        write_wav(name + ".wav", np.clip(signal, -32768, 32767))
+        with open(name + ".json", "w") as f:
+            json.dump({"speech": segments}, f)
+
+
+def _labels(segments, frames, frame):
+    truth = np.zeros(frames, dtype=bool)
+    for start, end in segments:
+        truth[int(start * RATE) // frame:int(end * RATE) // frame] = True
+    return truth
+
+
+def evaluate_file(wav_path, segments):
+    samples = read_wav(wav_path)
+    vad = VoiceActivityDetector(rate=RATE, frame_ms=config.VAD_FRAME_MS,
+                                energy_margin_db=config.VAD_ENERGY_MARGIN_DB,
+                                onset_ms=config.VAD_ONSET_MS, hangover_ms=config.VAD_END_SILENCE_MS)
+    # Fed in live-sized blocks so onset/hangover state crosses block boundaries
+    started = time.perf_counter()
+    decisions = np.concatenate([vad.process(samples[i:i + BLOCK]) for i in range(0, len(samples), BLOCK)])
+    cpu = time.perf_counter() - started
+    truth = _labels(segments, len(decisions), vad.frame)
+
+    # Endpoint latency for the first utterance, as the voice handler would see it
+    endpointer = Endpointer(VoiceActivityDetector(rate=RATE, frame_ms=config.VAD_FRAME_MS,
+                                                  energy_margin_db=config.VAD_ENERGY_MARGIN_DB,
+                                                  onset_ms=config.VAD_ONSET_MS,
+                                                  hangover_ms=config.VAD_END_SILENCE_MS),
+                            no_speech_timeout=config.LISTEN_TIMEOUT, max_seconds=config.PHRASE_TIME_LIMIT)
+    status = None
+    for i in range(0, len(samples), BLOCK):
+        status = endpointer.feed(samples[i:i + BLOCK])
+        if status:
+            break
+
+    latency = None
+    if segments and status == "end":
+        # Pauses shorter than the hangover merge utterances; measure from the
+        # last labelled end the endpointer spanned
+        spanned = [end for start, end in segments if start * RATE < endpointer.speech_end]
+        latency = endpointer.speech_end / RATE - spanned[-1]
+
+    return {
+        "file": os.path.basename(wav_path),
+        "frames": len(decisions),
+        "correct": int(np.sum(decisions == truth)),
+        "true_positive": int(np.sum(decisions & truth)),
+        "false_positive": int(np.sum(decisions & ~truth)),
+        "false_negative": int(np.sum(~decisions & truth)),
+        "false_start": bool(segments) and endpointer.speech_start is not None
+                       and endpointer.speech_start / RATE < segments[0][0] - 0.2,
+        "status": status,
+        "endpoint_latency": latency,
+        "realtime_factor": cpu / (len(samples) / RATE),
+    }
+
+
+def run(fixtures_dir):
+    results = []
+    for wav_path in sorted(glob.glob(os.path.join(fixtures_dir, "*.wav"))):
+        label_path = os.path.splitext(wav_path)[0] + ".json"
+        if not os.path.exists(label_path):
+            print(f"Skipping {wav_path}: no labels")
+            continue
+        with open(label_path) as f:
+            segments = json.load(f)["speech"]
+        results.append(evaluate_file(wav_path, segments))
+
+    frames = sum(r["frames"] for r in results) or 1
+    tp = sum(r["true_positive"] for r in results)
+    fp = sum(r["false_positive"] for r in results)
+    fn = sum(r["false_negative"] for r in results)
+    latencies = [r["endpoint_latency"] for r in results if r["endpoint_latency"] is not None]
+    return {
+        "config": {
+            "frame_ms": config.VAD_FRAME_MS,
+            "end_silence_ms": config.VAD_END_SILENCE_MS,
+            "onset_ms": config.VAD_ONSET_MS,
+            "energy_margin_db": config.VAD_ENERGY_MARGIN_DB,
+        },
+        "files": len(results),
+        "frame_accuracy": sum(r["correct"] for r in results) / frames,
+        "precision": tp / (tp + fp) if tp + fp else None,
+        "recall": tp / (tp + fn) if tp + fn else None,
+        "false_starts": sum(1 for r in results if r["false_start"]),
+        "missed": sum(1 for r in results if r["status"] == "timeout"),
+        "endpoint_latency": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "max": max(latencies) if latencies else None,
+        },
+        "realtime_factor": max((r["realtime_factor"] for r in results), default=None),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="directory of .wav files with .json labels")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="generate N synthetic fixtures instead")
+    parser.add_argument("--out", help="write JSON results to this file")
+    args = parser.parse_args()
+    if not args.fixtures and not args.synthetic:
+        parser.error("give --fixtures or --synthetic")
+
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as directory:
+            make_synthetic(directory, args.synthetic)
+            results = run(directory)
+    else:
+        results = run(args.fixtures)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+CPU budget check for wake-word detection (core/wakeword.py).
+
+Feeds audio through the detector in real time (80 ms chunks, as the
+microphone would) or as fast as possible, and reports per-chunk inference
+time, CPU used per second of audio, dropped chunks, detector process exits
+and detections. Exits with status 1 if CPU use is over --budget (fraction
+of one core), so it can gate changes to the model or ONNX settings.
+
+Needs openwakeword + onnxruntime and the model files.
+    python -m benchmarks.wakeword_cpu [--mode process|inprocess] [--seconds 30]
+                                      [--wav speech.wav] [--fast] [--budget 0.25]
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from core import config, metrics
+from core.wakeword import CHUNK_SIZE, create_detector, ProcessDetector
+
+RATE = 16000
+
+
+def _audio(seconds, wav=None):
+    if wav:
+        from core.audio_source import read_wav
+        samples = read_wav(wav)
+        repeats = int(np.ceil(seconds * RATE / len(samples)))
+        return np.tile(samples, repeats)[:int(seconds * RATE)]
+    # Cabin-like background noise
+    rng = np.random.default_rng(0)
+    return (rng.normal(0, 300, int(seconds * RATE))).astype(np.int16)
+
+
+def run(mode, seconds, wav=None, fast=False, threads=1):
+    metrics.reset()
+    detector = create_detector(mode, config.WAKEWORD_MODEL, config.WAKEWORD_THRESHOLD, threads)
+    actual_mode = "process" if isinstance(detector, ProcessDetector) else "inprocess"
+    audio = _audio(seconds, wav)
+    detections = []
+    late = 0
+
+    cpu_start = time.process_time()
+    started = time.monotonic()
+    for n, i in enumerate(range(0, len(audio) - CHUNK_SIZE + 1, CHUNK_SIZE)):
+        if not fast:
+            # Pace like the microphone; count chunks we couldn't hand over on time
+            due = started + n * CHUNK_SIZE / RATE
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            elif wait < -CHUNK_SIZE / RATE:
+                late += 1
+        detections += detector.feed(audio[i:i + CHUNK_SIZE], i)
+    if actual_mode == "process":
+        time.sleep(1.5)  # let the child finish and send its last stats
+        detections += detector.poll()
+    wall = time.monotonic() - started
+    cpu = time.process_time() - cpu_start
+    child_cpu = detector.cpu if actual_mode == "process" else 0.0
+    detector.close()
+
+    audio_seconds = len(audio) / RATE
+    inference = metrics.summary("wakeword.inference")
+    return {
+        "mode": actual_mode,
+        "audio_seconds": audio_seconds,
+        "wall_seconds": wall,
+        "realtime": not fast,
+        "chunks": inference["count"],
+        "inference_ms": {k: inference.get(k, 0.0) * 1000 for k in ("p50", "p95", "p99", "max")},
+        "cpu_per_audio_second": {
+            "caller": cpu / audio_seconds,
+            "detector_process": child_cpu / audio_seconds,
+            "total": (cpu + child_cpu) / audio_seconds,
+        },
+        "dropped_chunks": metrics.counter("wakeword.dropped_chunks"),
+        "process_exits": metrics.counter("wakeword.process_exits"),
+        "late_chunks": late,
+        "detections": len(detections),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", default=config.WAKEWORD_MODE, choices=["process", "inprocess"])
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--wav", help="16 kHz mono WAV to loop instead of noise")
+    parser.add_argument("--fast", action="store_true", help="don't pace in real time")
+    parser.add_argument("--threads", type=int, default=config.WAKEWORD_THREADS)
+    parser.add_argument("--budget", type=float, default=0.25,
+                        help="max CPU seconds per audio second (fraction of one core)")
+    parser.add_argument("--out", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args.mode, args.seconds, args.wav, args.fast, args.threads)
+    results["budget"] = args.budget
+    results["within_budget"] = results["cpu_per_audio_second"]["total"] <= args.budget
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
+    return 0 if results["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,48 @@
 from .car_state import CarState
+from . import routing
 
 
 def set_ac(state: CarState, on: str = "on", **kwargs) -> str:
-    state.ac_on = (on.lower() == "on")
+    changes = {"ac_on": on.lower() == "on"}
     
     # Handle both 'temperature' and 'temp' shorthands from different models
     temperature = kwargs.get("temperature") or kwargs.get("temp")
     
     if temperature is not None:
-        state.ac_temp = max(16, min(30, int(temperature)))
-    return f"AC {'turned on' if state.ac_on else 'turned off'}" + (f" at {state.ac_temp}°C" if state.ac_on else "")
+        changes["ac_temp"] = max(16, min(30, int(temperature)))
+    # Both fields change in one update, and the reply describes that same version
+    with state.transaction():
+        state.update(**changes)
+        ac_on, ac_temp = state.ac_on, state.ac_temp
+    return f"AC {'turned on' if ac_on else 'turned off'}" + (f" at {ac_temp}°C" if ac_on else "") + "."
+
+NO_ROUTE = "No offline route found."
 
 def navigate_to(state: CarState, destination: str) -> str:
-    state.destination = destination
-    return f"Navigating to {destination}. ETA 28 minutes."
+    # Route on the offline road graph if there is one (core/routing.py)
+    nav = routing.navigator(state)
+    target = nav.router.graph.place(destination) if nav else None
+    route = nav.start(target) if target is not None else None
+    if route is None:
+        if nav:
+            nav.stop()
+        state.update(destination=destination, eta_minutes=None)
+        return f"Navigating to {destination}." + (f" {NO_ROUTE}" if nav else "")
+    minutes = max(1, round(route.seconds / 60))
+    state.update(destination=destination, eta_minutes=minutes)
+    return f"Navigating to {destination}. ETA {minutes} minute{'s' if minutes != 1 else ''}."
+
+def resume_navigation(state: CarState):
+    # The state journal restores the destination but not the route: plan it again
+    if state.destination:
+        return navigate_to(state, state.destination)
+    return None
 
 def stop_navigation(state: CarState) -> str:
-    state.destination = None
+    nav = getattr(state, "navigator", None)
+    if nav is not None:
+        nav.stop()
+    state.update(destination=None, eta_minutes=None)
     return "Navigation cancelled."
 
 def toggle_lights(state: CarState, on: str) -> str:
@@ -27,12 +53,15 @@ def toggle_wipers(state: CarState, on: str) -> str:
     state.wipers_on = (on.lower() == "on")
     return f"Wipers {'activated' if state.wipers_on else 'stopped'}."
 
-def control_window(state: CarState, window: str, action: str) -> str:
+def control_window(state: CarState, action: str, window: str = "all") -> str:
     target_state = 100 if action.lower() == "open" else 0
     
-    if window in ["driver", "all"]:
-        state.windows["driver"] = target_state
-    if window in ["passenger", "all"]:
-        state.windows["passenger"] = target_state
+    with state.transaction():
+        windows = dict(state.windows)
+        if window in ["driver", "all"]:
+            windows["driver"] = target_state
+        if window in ["passenger", "all"]:
+            windows["passenger"] = target_state
+        state.update(windows=windows)
         
-    return f"{window.capitalize()} window(s) {action}ed."
+    return f"{window.capitalize()} window(s) {'opened' if target_state else 'closed'}."
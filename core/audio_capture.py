@@ -0,0 +1,190 @@
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from . import metrics
+from .audio_source import MicrophoneSource
+
+# One always-open capture stream feeding a preallocated ring buffer.
+# Wake-word detection and command capture both read from the buffer through
+# their own cursors, so nothing is lost between "Hey Jarvis" and the command
+# and the microphone is never reopened. Positions are absolute sample counts
+# since the stream started, which makes "0.3 s before the detection" a simple
+# subtraction. The samples come from an AudioSource (core/audio_source.py):
+# the microphone, or a WAV replay for headless runs.
+
+RATE = 16000
+
+
+class AudioRingBuffer:
+    """Fixed-size int16 ring buffer addressed by absolute sample position."""
+
+    def __init__(self, seconds: float = 10.0, rate: int = RATE):
+        self.rate = rate
+        self.capacity = int(seconds * rate)
+        self.data = np.zeros(self.capacity, dtype=np.int16)
+        self.position = 0  # total samples ever written
+        self.cond = threading.Condition()
+        self.readers = weakref.WeakSet()  # live cursors, for wait_for_room()
+
+    def write(self, samples: np.ndarray):
+        samples = np.asarray(samples, dtype=np.int16).reshape(-1)
+        n = len(samples)
+        if n == 0:
+            return
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+        with self.cond:
+            start = (self.position + n - len(samples)) % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self.data[start:start + first] = samples[:first]
+            if first < len(samples):
+                self.data[:len(samples) - first] = samples[first:]
+            self.position += n
+            self.cond.notify_all()
+
+    @property
+    def oldest(self) -> int:
+        """Oldest absolute position still held in the buffer."""
+        return max(0, self.position - self.capacity)
+
+    def read(self, start: int, count: int) -> np.ndarray:
+        """Copies samples [start, start + count) (clamped to what is available)."""
+        with self.cond:
+            start = max(start, self.oldest)
+            end = min(start + count, self.position)
+            if end <= start:
+                return np.zeros(0, dtype=np.int16)
+            i, j = start % self.capacity, end % self.capacity
+            if i < j or j == 0:
+                return self.data[i:j or self.capacity].copy()
+            return np.concatenate((self.data[i:], self.data[:j]))
+
+    def wait_for(self, position: int, timeout: float = None) -> bool:
+        """Blocks until `position` samples have been written."""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.position >= position, timeout)
+
+    def wait_for_room(self, count: int, timeout: float = None) -> bool:
+        """
+        Blocks until `count` more samples can be written without overwriting
+        anything a live cursor hasn't read. Only used by sources that can wait
+        (file replay); the microphone never does.
+        """
+        with self.cond:
+            return self.cond.wait_for(
+                lambda: all(self.position + count - r.position <= self.capacity for r in list(self.readers)),
+                timeout)
+
+    def _moved(self):
+        with self.cond:
+            self.cond.notify_all()
+
+
+class AudioCursor:
+    """Independent sequential reader over an AudioRingBuffer."""
+
+    def __init__(self, ring: AudioRingBuffer, position: int = None):
+        self.ring = ring
+        self.position = ring.position if position is None else position
+        self.dropped = 0  # samples overwritten before this reader got to them
+        ring.readers.add(self)
+
+    def read(self, count: int, timeout: float = 1.0):
+        """Returns the next `count` samples, or None if they didn't arrive in time."""
+        if not self.ring.wait_for(self.position + count, timeout):
+            return None
+        if self.position < self.ring.oldest:
+            self.dropped += self.ring.oldest - self.position
+            metrics.incr("audio.dropped_samples", self.ring.oldest - self.position)
+            self.position = self.ring.oldest
+        samples = self.ring.read(self.position, count)
+        self.position += len(samples)
+        self.ring._moved()
+        return samples
+
+    def seek(self, position: int):
+        self.position = max(position, self.ring.oldest)
+        self.ring._moved()
+
+
+class NoiseFloor:
+    """
+    Running estimate of background level (RMS) for the cabin.
+    Falls quickly to quieter blocks and rises slowly, so speech doesn't drag
+    it up but a louder engine or fan is picked up within a few seconds.
+    """
+
+    def __init__(self, initial: float = 300.0, rise: float = 0.01, fall: float = 0.2):
+        self.level = initial
+        self.rise = rise
+        self.fall = fall
+
+    def update(self, samples: np.ndarray) -> float:
+        rms = float(np.sqrt(np.mean(samples.astype(np.float32) ** 2))) if len(samples) else 0.0
+        rate = self.fall if rms < self.level else self.rise
+        self.level += (rms - self.level) * rate
+        return rms
+
+
+class AudioCapture:
+    """Owns the audio source (the microphone by default) and the shared ring buffer."""
+
+    def __init__(self, rate: int = RATE, block_size: int = 1280, buffer_seconds: float = 10.0, source=None,
+                 echo_canceller=None, reference=None, echo_delay: float = 0.0):
+        self.rate = rate
+        self.block_size = block_size
+        self.ring = AudioRingBuffer(buffer_seconds, rate)
+        self.noise = NoiseFloor()
+        self.source = source or MicrophoneSource(rate, block_size)
+        self.overflows = 0
+        # Optional echo cancellation (core/echo_cancel.py): the reference is
+        # what the speakers played, echo_delay how long it takes to reach the mic
+        self.echo_canceller = echo_canceller
+        self.reference = reference
+        self.echo_delay = echo_delay
+        self.written_at = None  # time.monotonic() of the last write
+
+    def start(self):
+        self.source.start(self._on_audio, self.ring.wait_for_room)
+
+    def stop(self):
+        self.source.stop()
+
+    def _on_audio(self, samples, overflow=False):
+        if overflow:
+            # The device dropped input because this callback ran late
+            self.overflows += 1
+            metrics.incr("audio.overflows")
+        now = time.monotonic()
+        if self.echo_canceller is not None and self.reference is not None:
+            ref = self.reference.read(len(samples), now - self.echo_delay)
+            if ref is not None:
+                samples = self.echo_canceller.process(samples, ref)
+        self.noise.update(samples)
+        self.ring.write(samples)
+        self.written_at = now
+
+    @property
+    def active(self) -> bool:
+        """False once the source has stopped delivering audio (e.g. the mic was unplugged)."""
+        return self.source.active
+
+    def time_at(self, position: int) -> float:
+        """Approximate time.monotonic() at which the sample at `position` was captured."""
+        if self.written_at is None:
+            return time.monotonic()
+        return self.written_at - (self.ring.position - position) / self.rate
+
+    @property
+    def position(self) -> int:
+        return self.ring.position
+
+    def cursor(self, position: int = None) -> AudioCursor:
+        """A new reader, starting now or at an absolute position."""
+        return AudioCursor(self.ring, position)
+
+    def seconds_to_samples(self, seconds: float) -> int:
+        return int(seconds * self.rate)
@@ -0,0 +1,124 @@
+import threading
+import time
+import wave
+
+import numpy as np
+
+# Where AudioCapture gets its samples from.
+# A source calls on_audio(samples, overflow) with int16 blocks from its own
+# thread, exactly like the sounddevice callback did:
+#   MicrophoneSource  - the live input stream
+#   WavReplaySource   - recorded 16 kHz sessions, paced at real time or as
+#                       fast as the pipeline keeps up (for headless runs)
+# In fast mode the replay waits for room in the ring buffer (wait_for_room)
+# instead of overwriting audio a reader hasn't got to yet, so results don't
+# depend on how fast the machine is.
+
+RATE = 16000
+
+
+def read_wav(path: str) -> np.ndarray:
+    """Loads a 16 kHz mono 16-bit WAV as int16 samples."""
+    with wave.open(path, "rb") as w:
+        if w.getframerate() != RATE or w.getsampwidth() != 2 or w.getnchannels() != 1:
+            raise ValueError(f"{path}: expected 16 kHz mono 16-bit")
+        return np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+
+
+class MicrophoneSource:
+    def __init__(self, rate: int = RATE, block_size: int = 1280):
+        self.rate = rate
+        self.block_size = block_size
+        self.stream = None
+
+    def start(self, on_audio, wait_for_room=None):
+        import sounddevice as sd
+
+        def callback(indata, frames, time_info, status):
+            samples = indata[:, 0] if indata.ndim > 1 else indata
+            on_audio(samples, bool(status and status.input_overflow))
+
+        self.stream = sd.InputStream(samplerate=self.rate, blocksize=self.block_size, channels=1,
+                                     dtype='int16', callback=callback)
+        self.stream.start()
+
+    @property
+    def active(self) -> bool:
+        return self.stream is not None and self.stream.active
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+
+class WavReplaySource:
+    """
+    Plays WAV files back to back as if they came from the microphone, with
+    `gap` seconds of silence between files and `tail` seconds after the last
+    one so the endpointer can close a final command. `finished` is set once
+    everything has been delivered.
+    """
+
+    def __init__(self, paths, realtime: bool = True, rate: int = RATE, block_size: int = 1280,
+                 gap: float = 1.0, tail: float = 2.0, room_timeout: float = 30.0):
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.realtime = realtime
+        self.rate = rate
+        self.block_size = block_size
+        self.gap = gap
+        self.tail = tail
+        self.room_timeout = room_timeout
+        self.segments = []  # (path, first sample, end sample) in stream positions
+        self.delivered = 0
+        self.finished = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def start(self, on_audio, wait_for_room=None):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, args=(on_audio, wait_for_room), daemon=True)
+        self.thread.start()
+
+    @property
+    def active(self) -> bool:
+        return self.running  # stays "open" after the last file, like an idle mic
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+
+    def _stream(self):
+        position = 0
+        for i, path in enumerate(self.paths):
+            samples = read_wav(path)
+            self.segments.append((path, position, position + len(samples)))
+            position += len(samples)
+            yield samples
+            pad = self.tail if i == len(self.paths) - 1 else self.gap
+            yield np.zeros(int(pad * self.rate), dtype=np.int16)
+            position += int(pad * self.rate)
+
+    def _run(self, on_audio, wait_for_room):
+        started = time.monotonic()
+        try:
+            for samples in self._stream():
+                for i in range(0, len(samples), self.block_size):
+                    if not self.running:
+                        return
+                    block = samples[i:i + self.block_size]
+                    if self.realtime:
+                        due = started + (self.delivered + len(block)) / self.rate
+                        wait = due - time.monotonic()
+                        if wait > 0:
+                            time.sleep(wait)
+                    elif wait_for_room is not None:
+                        wait_for_room(len(block), self.room_timeout)
+                    on_audio(block, False)
+                    self.delivered += len(block)
+        except Exception as e:
+            print(f"Replay Error: {e}")
+        finally:
+            self.finished.set()
@@ -1,13 +1,126 @@
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+# Shared car state.
+# Voice threads, action functions and Qt buttons all write this, so every
+# change goes through update() under one lock. Plain attribute assignment
+# (state.ac_on = True) still works and is the same as update(ac_on=True).
+# Each update that changes something bumps `version` and calls subscribers
+# with a field-level diff {field: (old, new)}; the dashboard uses this
+# instead of polling. Subscribers are called with the lock held and in
+# version order, so they must be quick (e.g. emit a Qt signal). A subscriber
+# may itself call update(); that change is delivered after the current one.
+# snapshot() returns an immutable copy, cached until the next change;
+# transaction() holds the lock for read-modify-write sequences.
+
+DEFAULTS = {
+    "ac_on": False,
+    "ac_temp": 22,
+    "destination": None,
+    "lights_on": False,
+    "wipers_on": False,
+    "speed": 0,            # km/h, from the vehicle bus (core/vehicle_bus.py) if configured
+    "fuel": 85,            # %
+    "windows": {"driver": 0, "passenger": 0},  # 0=closed, 100=open
+    "ai_talking": False,
+    "is_listening": False,
+    "position": None,      # (lat, lon) of the car, when known
+    "eta_minutes": None,   # of the active route (core/routing.py)
+}
+FIELDS = tuple(DEFAULTS)
+
+StateSnapshot = namedtuple("StateSnapshot", FIELDS + ("version",))
+
+
+def _frozen(value):
+    # Dict fields are stored as read-only views so they can only change
+    # through update()
+    return MappingProxyType(dict(value)) if isinstance(value, (dict, MappingProxyType)) else value
+
+
 class CarState:
-    def __init__(self):
-        self.ac_on = False
-        self.ac_temp = 22
-        self.destination = None
-        self.lights_on = False
-        self.wipers_on = False
-        self.speed = 0          # simulated
-        self.fuel = 85          # %
-
-        self.windows = {"driver": 0, "passenger": 0} # 0=closed, 100=open
-        self.ai_talking = False
-        self.is_listening = False
+    def __init__(self, **fields):
+        values = {name: _frozen(value) for name, value in DEFAULTS.items()}
+        for name, value in fields.items():
+            if name not in values:
+                raise AttributeError(f"CarState has no field '{name}'")
+            values[name] = _frozen(value)
+        object.__setattr__(self, "_values", values)
+        object.__setattr__(self, "_lock", threading.RLock())
+        object.__setattr__(self, "_subscribers", [])
+        object.__setattr__(self, "_snapshot", None)
+        object.__setattr__(self, "_pending", None)  # changes waiting to be delivered while notifying
+        object.__setattr__(self, "version", 0)
+
+    def __getattr__(self, name):
+        # Only called for names that aren't real attributes, i.e. the fields
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        if name in DEFAULTS:
+            self.update(**{name: value})
+        else:
+            object.__setattr__(self, name, value)
+
+    def update(self, **fields) -> int:
+        """Sets several fields at once. Returns the resulting version."""
+        with self._lock:
+            diff = {}
+            for name, value in fields.items():
+                if name not in DEFAULTS:
+                    raise AttributeError(f"CarState has no field '{name}'")
+                value = _frozen(value)
+                old = self._values[name]
+                if old != value:
+                    diff[name] = (old, value)
+                    self._values[name] = value
+            if not diff:
+                return self.version
+            object.__setattr__(self, "version", self.version + 1)
+            object.__setattr__(self, "_snapshot", None)
+            if self._pending is not None:
+                # Called from a subscriber: delivered once the current change is
+                self._pending.append((diff, self.version))
+                return self.version
+            object.__setattr__(self, "_pending", [(diff, self.version)])
+            try:
+                while self._pending:
+                    change, version = self._pending.pop(0)
+                    for callback in list(self._subscribers):
+                        try:
+                            callback(change, version)
+                        except Exception as e:
+                            print(f"CarState subscriber error: {e}")
+            finally:
+                object.__setattr__(self, "_pending", None)
+            return self.version
+
+    def transaction(self):
+        """
+        Holds the lock for a read-modify-write, e.g.
+            with state.transaction():
+                state.update(windows={**state.windows, "driver": 100})
+        """
+        return self._lock
+
+    def snapshot(self) -> StateSnapshot:
+        """Immutable copy of every field plus the version it was taken at."""
+        with self._lock:
+            if self._snapshot is None:
+                object.__setattr__(self, "_snapshot", StateSnapshot(version=self.version, **self._values))
+            return self._snapshot
+
+    def subscribe(self, callback):
+        """Calls callback(diff, version) after every change. Returns a function that unsubscribes."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from . import intent_parser
+from .car_state import CarState
+
+# Cache of resolved LLM results keyed by normalized utterance.
+# Tool calls are stored rather than their spoken result so a hit still runs the
+# action against the live CarState. Plain-text answers remember the CarState
+# fields they may depend on and are dropped once any of those fields change.
+
+_STOP_WORDS = set("""
+    hey hi jarvis please can could would will you u me my the a an it now right
+    just quickly thanks thank i want wanna like need switch turn
+""".split())
+
+# Words in an utterance -> CarState fields an answer to it may depend on
+_FIELD_HINTS = {
+    "ac": ("ac_on", "ac_temp"), "air": ("ac_on", "ac_temp"), "climate": ("ac_on", "ac_temp"),
+    "temperature": ("ac_temp",), "temp": ("ac_temp",), "cold": ("ac_on", "ac_temp"), "hot": ("ac_on", "ac_temp"),
+    "lights": ("lights_on",), "light": ("lights_on",), "headlights": ("lights_on",),
+    "wipers": ("wipers_on",), "wiper": ("wipers_on",),
+    "window": ("windows",), "windows": ("windows",),
+    "navigation": ("destination",), "destination": ("destination",), "route": ("destination", "eta_minutes"), "eta": ("destination", "eta_minutes"),
+    "speed": ("speed",), "fast": ("speed",), "fuel": ("fuel",), "battery": ("fuel",), "range": ("fuel",),
+}
+STATE_FIELDS = ("ac_on", "ac_temp", "destination", "eta_minutes", "lights_on", "wipers_on", "windows", "speed", "fuel")
+
+
+def normalize(text: str) -> str:
+    """Canonical cache key: lowercase, no punctuation or filler words."""
+    words = [w for w in intent_parser.normalize(text).split() if w not in _STOP_WORDS]
+    if len(words) <= 3:
+        # "AC on" and "on the AC" are the same short command; longer
+        # utterances keep their order (destinations, compound requests)
+        words.sort()
+    return " ".join(words)
+
+
+def _fields_for(key: str):
+    fields = set()
+    for word in key.split():
+        fields.update(_FIELD_HINTS.get(word, ()))
+    return tuple(sorted(fields)) if fields else STATE_FIELDS
+
+
+def _fingerprint(state: CarState, fields):
+    snapshot = state.snapshot()  # one consistent version for all fields
+    values = []
+    for field in fields:
+        value = getattr(snapshot, field, None)
+        values.append(tuple(sorted(value.items())) if isinstance(value, Mapping) else value)
+    return tuple(values)
+
+
+class CacheEntry:
+    __slots__ = ("tool_calls", "text", "fields", "fingerprint", "expires")
+
+    def __init__(self, tool_calls, text, fields, fingerprint, expires):
+        self.tool_calls = tool_calls
+        self.text = text
+        self.fields = fields
+        self.fingerprint = fingerprint
+        self.expires = expires
+
+
+class CommandCache:
+    def __init__(self, max_size: int = 128, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, text: str, state: CarState):
+        """Returns a live CacheEntry for this utterance or None."""
+        key = normalize(text)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry.expires < time.monotonic():
+                    del self.entries[key]
+                    entry = None
+                elif entry.fields and entry.fingerprint != _fingerprint(state, entry.fields):
+                    del self.entries[key]
+                    self.invalidations += 1
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put_tool_calls(self, text: str, tool_calls):
+        """Caches resolved tool calls; they are re-executed on every hit."""
+        self._put(normalize(text), CacheEntry(list(tool_calls), None, (), None, time.monotonic() + self.ttl))
+
+    def put_text(self, text: str, answer: str, state: CarState):
+        """Caches a plain answer, tied to the state fields it may depend on."""
+        key = normalize(text)
+        fields = _fields_for(key)
+        self._put(key, CacheEntry(None, answer, fields, _fingerprint(state, fields), time.monotonic() + self.ttl))
+
+    def _put(self, key, entry):
+        if not key:
+            return
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
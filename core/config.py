@@ -2,3 +2,122 @@
 import os
 
 OLLAMA_MODEL = "gemma3:1b" 
+
+# Fast-path intent parser: commands matched locally with at least this
+# confidence are executed without calling Ollama.
+FAST_PATH_ENABLED = True
+FAST_PATH_MIN_CONFIDENCE = 0.8
+
+# Stream tokens from Ollama: tool calls fire as soon as their JSON closes and
+# plain answers are spoken sentence by sentence.
+OLLAMA_STREAM = True
+
+# Ollama connection. KEEP_ALIVE=-1 keeps the model loaded indefinitely.
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+OLLAMA_KEEP_ALIVE = -1
+OLLAMA_NUM_CTX = 2048
+
+# Cache of resolved LLM tool calls / answers for repeated utterances
+COMMAND_CACHE_ENABLED = True
+COMMAND_CACHE_SIZE = 128
+COMMAND_CACHE_TTL = 600  # seconds
+
+# "structured": constrain Ollama to a JSON schema built from TOOLS_SCHEMA
+# (needs Ollama 0.5+, falls back automatically). "heuristic": free-form
+# output with JSON searched for in the text.
+OLLAMA_OUTPUT_MODE = "structured"
+
+# Command worker pool (see core/scheduler.py)
+COMMAND_WORKERS = 2
+COMMAND_QUEUE_SIZE = 8
+
+# LLM failure handling
+OLLAMA_TIMEOUT = 8.0             # seconds per HTTP connect/read
+OLLAMA_DEADLINE = 10.0           # seconds for a whole streamed response
+BREAKER_FAILURE_THRESHOLD = 2    # failures in a row before failing fast
+BREAKER_RESET_TIMEOUT = 30.0     # seconds before trying Ollama again
+# While the breaker is open, local intents are accepted at this confidence
+FAST_PATH_DEGRADED_MIN_CONFIDENCE = 0.5
+
+# Optional tiered models, smallest first, e.g. ["qwen2.5:0.5b"]. Output that
+# can't be parsed or validated is retried on the next tier; OLLAMA_MODEL is
+# always the last tier.
+OLLAMA_TIER_MODELS = []
+
+# Audio capture (one persistent stream feeding a ring buffer)
+AUDIO_BUFFER_SECONDS = 10.0
+PREROLL_SECONDS = 0.3       # command audio starts this long before the wake word fired
+LISTEN_TIMEOUT = 5.0        # seconds to wait for speech to start
+PHRASE_TIME_LIMIT = 8.0     # longest command
+MIC_RETRY_INITIAL = 0.1     # first reopen retry after a mic error; doubles each time...
+MIC_RETRY_MAX = 5.0         # ...up to this
+
+# Self-trigger suppression: wake-word detections in audio captured while the
+# assistant was talking (or up to WAKE_SUPPRESS_TAIL_MS after) are ignored.
+# With ECHO_CANCEL_ENABLED, pre-rendered replies are subtracted from the mic
+# signal instead (core/echo_cancel.py), so the driver can still barge in with
+# the wake word while those play; ECHO_DELAY_MS is speaker-to-mic latency.
+WAKE_SUPPRESS_TAIL_MS = 250
+ECHO_CANCEL_ENABLED = False
+ECHO_DELAY_MS = 30
+
+# Voice activity detection / endpointing (core/vad.py)
+VAD_FRAME_MS = 20
+VAD_END_SILENCE_MS = 300    # pause that ends a command
+VAD_ONSET_MS = 60           # speech must last this long to count
+VAD_ENERGY_MARGIN_DB = 9.0  # speech = this far above the noise floor (plus spectral checks)
+
+# Speech-to-text: "vosk" (offline, streams partials while you speak) or
+# "google" (online, uploads after the endpoint). Vosk falls back to Google
+# if the package or model is missing. Small English model:
+# https://alphacephei.com/vosk/models (vosk-model-small-en-us-0.15)
+STT_ENGINE = "vosk"
+VOSK_MODEL_PATH = "models/vosk-model-small-en-us-0.15"
+
+# Pre-rendered audio for fixed replies ("Headlights on.", "AC turned on at 22°C."...)
+PHRASE_CACHE_ENABLED = True
+PHRASE_CACHE_DIR = "cache/phrases"
+PHRASE_CACHE_MAX_MB = 20
+
+# Wake word: "process" runs openwakeword in its own process (fed over shared
+# memory) so the GUI can't stall it; "inprocess" runs it on the voice thread.
+WAKEWORD_MODE = "process"
+WAKEWORD_MODEL = "hey_jarvis"
+WAKEWORD_THRESHOLD = 0.5
+WAKEWORD_THREADS = 1        # ONNX Runtime intra-op threads
+WAKEWORD_MANIFEST = "models/wakeword_manifest.json"  # model files already checked against their pins
+
+# Startup report (import times, first frame, voice ready); "" to skip writing it
+STARTUP_REPORT_PATH = "logs/startup.json"
+
+# Per-interaction latency traces (core/tracing.py), one JSON object per line
+TRACE_ENABLED = True
+TRACE_PATH = "logs/traces.jsonl"
+TRACE_MAX_BYTES = 1_000_000
+TRACE_BACKUPS = 3
+
+# CarState persistence (core/state_journal.py): cabin settings and the active
+# route are journaled here and restored on startup
+STATE_JOURNAL_ENABLED = True
+STATE_JOURNAL_DIR = "data/state"
+STATE_JOURNAL_COMPACT_EVERY = 256   # records between snapshots
+STATE_JOURNAL_FSYNC = True          # fsync every record (changes are infrequent)
+
+# Telemetry history (core/telemetry.py), fixed memory per signal:
+# raw samples, then 1 s and 1 min min/max/mean/last buckets
+TELEMETRY_RAW_SAMPLES = 6000        # 60 s at 100 Hz
+TELEMETRY_SECONDS = 3600            # 1 s buckets kept (1 hour)
+TELEMETRY_MINUTES = 1440            # 1 min buckets kept (1 day)
+
+# Vehicle bus ingestion (core/vehicle_bus.py): None (off), "log:path/to/candump.log"
+# (replayed at recorded speed) or "udp:127.0.0.1:29536" (local bus stand-in)
+BUS_SOURCE = None
+BUS_SIGNAL_DB = None         # JSON signal database; None uses vehicle_bus.SIGNALS
+BUS_PUBLISH_HZ = 10.0        # CarState updates per second from bus data
+
+# Offline routing (core/routing.py): road graph as .npz (CSR arrays, named
+# places, optional landmark tables). Write a synthetic demo graph with
+#   python -m benchmarks.routing_bench --write models/roads.npz
+ROUTING_GRAPH_PATH = "models/roads.npz"
+ROUTING_CACHE_SIZE = 128
+ROUTING_OFF_ROUTE_M = 40     # a fix this close to an off-route junction triggers a reroute
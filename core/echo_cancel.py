@@ -0,0 +1,92 @@
+import threading
+import time
+
+import numpy as np
+
+# Optional echo cancellation for the assistant's own voice.
+# When a reply is played from pre-rendered audio (the phrase cache) we know
+# exactly what the speakers are sending, so the TTS worker hands it to a
+# PlaybackReference. AudioCapture asks the reference for the slice that was
+# playing while each microphone block was recorded and an NLMS adaptive
+# filter subtracts its estimate of the echo before the block reaches the
+# ring buffer. Live pyttsx3 speech has no reference signal; for that the
+# wake word is simply gated on the playback window (TTSWorker.played_near).
+#
+# The filter is block NLMS: the output for a whole block uses the same
+# weights and the weights are updated once per block, so everything is
+# vectorized and a 1280-sample block costs well under a millisecond.
+
+
+class PlaybackReference:
+    """What the speakers are playing, resampled to the capture rate and indexed by time."""
+
+    def __init__(self, rate: int = 16000):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.samples = None
+        self.started = 0.0
+
+    def start(self, samples, rate: int, at: float = None):
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.ndim > 1:
+            samples = samples[:, 0]
+        if rate != self.rate and len(samples):
+            n = int(len(samples) * self.rate / rate)
+            samples = np.interp(np.arange(n) * rate / self.rate, np.arange(len(samples)), samples)
+        with self.lock:
+            self.samples = samples.astype(np.float32)
+            self.started = time.monotonic() if at is None else at
+
+    def stop(self):
+        with self.lock:
+            self.samples = None
+
+    def read(self, count: int, end: float):
+        """
+        The `count` reference samples that were playing up to monotonic time
+        `end` (zeros outside the playback), or None if nothing was playing.
+        """
+        with self.lock:
+            samples, started = self.samples, self.started
+        if samples is None:
+            return None
+        last = int(round((end - started) * self.rate))
+        first = last - count
+        if last <= 0 or first >= len(samples):
+            return None
+        out = np.zeros(count, dtype=np.float32)
+        lo, hi = max(first, 0), min(last, len(samples))
+        out[lo - first:hi - first] = samples[lo:hi]
+        return out
+
+
+class EchoCanceller:
+    """Block NLMS filter: mic - estimate(reference)."""
+
+    def __init__(self, taps: int = 256, mu: float = 0.2, block: int = 160):
+        self.taps = taps
+        self.mu = mu
+        self.block = block
+        self.weights = np.zeros(taps, dtype=np.float64)
+        self.history = np.zeros(taps - 1, dtype=np.float64)  # reference tail from the last call
+
+    def reset(self):
+        self.weights[:] = 0
+        self.history[:] = 0
+
+    def process(self, mic, reference) -> np.ndarray:
+        """Returns mic with the estimated echo of `reference` removed (int16, same length)."""
+        mic = np.asarray(mic, dtype=np.float64)
+        ref = np.concatenate((self.history, np.asarray(reference, dtype=np.float64)))
+        self.history = ref[len(ref) - (self.taps - 1):]
+        # Row i holds the reference samples the filter sees for mic sample i
+        # (newest first)
+        windows = np.lib.stride_tricks.sliding_window_view(ref, self.taps)[:, ::-1]
+        out = np.empty_like(mic)
+        for i in range(0, len(mic), self.block):
+            x = windows[i:i + self.block]
+            error = mic[i:i + self.block] - x @ self.weights
+            out[i:i + self.block] = error
+            power = np.einsum("ij,ij->", x, x) + 1e-3
+            self.weights += self.mu * len(x) * (x.T @ error) / power
+        return np.clip(out, -32768, 32767).astype(np.int16)
@@ -0,0 +1,170 @@
+import re
+from typing import NamedTuple, Optional
+
+# Deterministic fast-path for the handful of commands drivers use most.
+# Everything here is compiled once at import; a match costs a few regex scans
+# instead of a full Ollama round trip. Anything ambiguous is left to the LLM.
+
+
+class IntentMatch(NamedTuple):
+    tool: str
+    args: dict
+    confidence: float
+
+
+_DEVICES = {
+    "set_ac": re.compile(r"\b(?:a\s?c|air\s?con(?:ditioning|ditioner)?|aircon|climate(?: control)?|air conditioning|cooling)\b"),
+    "toggle_lights": re.compile(r"\b(?:head\s?lights?|head\s?lamps?|lights?|lamps?|high\s?beams?|low\s?beams?)\b"),
+    "toggle_wipers": re.compile(r"\b(?:wipers?|windscreen wipers?|windshield wipers?)\b"),
+    "control_window": re.compile(r"\bwindows?\b"),
+}
+
+_ON = re.compile(r"\b(?:on|start|enable|activate|engage)\b")
+_OFF = re.compile(r"\b(?:off|stop|disable|deactivate|kill|shut)\b")
+_OPEN = re.compile(r"\b(?:open|down|lower)\b")
+_CLOSE = re.compile(r"\b(?:close|shut|up|raise)\b")
+_NEGATION = re.compile(r"\b(?:don'?t|do not|never|not|no)\b")
+_TEMPERATURE = re.compile(r"\b(\d{1,2})\s*(?:°|degrees?|deg|celsius|c)?\b")
+_TEMPERATURE_HINT = re.compile(r"\b(?:temp(?:erature)?|degrees?|celsius)\b")
+_WINDOW_SIDE = re.compile(r"\b(driver|passenger|all|both)\b")
+_ROLL = re.compile(r"\broll\b")
+
+_NAVIGATE = re.compile(
+    r"^(?:please\s+)?(?P<verb>navigate|take me|drive me|drive|directions|route me|get me|go|head)\s+(?:(?:to|towards)\s+(?:the\s+)?(?P<dest>.+?)|(?P<home>home))(?:\s+please)?$"
+)
+# "go to sleep", "head to the next song": these verbs only mean driving
+# somewhere when the destination is a place we know
+_WEAK_NAV_VERBS = {"go", "head", "get me", "drive"}
+_KNOWN_PLACES = set("""
+    home work office airport station hospital school university gym supermarket mall parking
+    downtown beach hotel pharmacy garage
+""".split()) | {"train station", "bus station", "gas station", "petrol station", "city centre",
+                "city center", "charging station", "car park"}
+_STOP_NAV = re.compile(
+    r"\b(?:stop|cancel|end|exit|quit|clear)\s+(?:the\s+)?(?:navigation|nav|route|routing|directions|guidance)\b"
+)
+
+# Words that carry no meaning for the grammar above. Anything outside this
+# vocabulary lowers the confidence of a match.
+_FILLER = set("""
+    hey hi jarvis please can could would will you u me my the a an it to of for and
+    turn switch set put make get let keep now right just quickly thanks thank
+    in at car some bit little up down all both driver passenger side
+    i want wanna like need
+""".split())
+
+_PUNCTUATION = re.compile(r"[^\w\s°']")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercases and strips punctuation so patterns only see words."""
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+def _unknown_words(text: str, pattern_hits) -> int:
+    words = text
+    for pattern in pattern_hits:
+        words = pattern.sub(" ", words)
+    return sum(1 for w in words.split() if w not in _FILLER)
+
+
+def _confidence(unknown: int) -> float:
+    return max(0.0, 1.0 - 0.25 * unknown)
+
+
+def _nav_confidence(verb: str, destination: str) -> float:
+    """
+    Only a known place fully explains the utterance. Free-text destinations
+    stay below the normal fast-path threshold (the LLM gets to look at them),
+    and after a weak verb they are too doubtful even for degraded mode.
+    """
+    if destination in _KNOWN_PLACES:
+        return 0.95
+    if verb in _WEAK_NAV_VERBS:
+        return 0.3
+    # Long destinations are usually full sentences the LLM handles better
+    return round(max(0.3, 0.7 - 0.05 * (len(destination.split()) - 1)), 2)
+
+
+def parse(text: str) -> Optional[IntentMatch]:
+    """
+    Matches a command against the local grammar.
+    Returns None when the utterance is clearly not a single car command.
+    """
+    text = normalize(text)
+    if not text:
+        return None
+
+    if _NEGATION.search(text):
+        return None
+
+    if _STOP_NAV.search(text):
+        return IntentMatch("stop_navigation", {}, _confidence(_unknown_words(text, [_STOP_NAV])))
+
+    nav = _NAVIGATE.match(text)
+    if nav:
+        destination = (nav.group("dest") or nav.group("home")).strip()
+        return IntentMatch("navigate_to", {"destination": destination.title()},
+                           _nav_confidence(nav.group("verb"), destination))
+
+    devices = [name for name, pattern in _DEVICES.items() if pattern.search(text)]
+    if not devices and _TEMPERATURE_HINT.search(text):
+        devices = ["set_ac"]  # "set the temperature to 20"
+    if len(devices) != 1:
+        return None  # none or compound request -> LLM
+    tool = devices[0]
+
+    if tool == "control_window":
+        opening, closing = bool(_OPEN.search(text)), bool(_CLOSE.search(text))
+        if opening == closing:
+            return None
+        side = _WINDOW_SIDE.search(text)
+        window = side.group(1) if side else "all"
+        args = {"window": "all" if window == "both" else window, "action": "open" if opening else "close"}
+        used = [_DEVICES[tool], _OPEN, _CLOSE, _WINDOW_SIDE, _ROLL]
+        return IntentMatch(tool, args, _confidence(_unknown_words(text, used)))
+
+    on, off = bool(_ON.search(text)), bool(_OFF.search(text))
+    used = [_DEVICES[tool], _ON, _OFF]
+    args = {}
+
+    if tool == "set_ac":
+        temp = _TEMPERATURE.search(text)
+        if temp:
+            args["temperature"] = int(temp.group(1))
+            used += [_TEMPERATURE, _TEMPERATURE_HINT]
+            if not off:
+                on = True  # "AC to 20" implies on
+        elif _TEMPERATURE_HINT.search(text):
+            return None  # "what's the temperature" is a question
+
+    if on == off:
+        return None
+
+    args["on"] = "on" if on else "off"
+    return IntentMatch(tool, args, _confidence(_unknown_words(text, used)))
+
+
+_CONJUNCTION = re.compile(r"\s*(?:,|\band then\b|\bthen\b|\band\b|\balso\b)\s*")
+
+
+def parse_all(text: str):
+    """
+    Matches compound commands ("AC on at 20 and lights on") clause by clause.
+    Returns the ordered matches, or [] unless every clause is a car command.
+    Clauses are tried whenever the whole utterance isn't fully explained by
+    one match, so a weak whole match never hides the rest of a compound.
+    """
+    single = parse(text)
+    if single and single.confidence >= 1.0:
+        return [single]
+    fallback = [single] if single else []
+    clauses = [c for c in _CONJUNCTION.split(text.lower()) if c.strip()]
+    if len(clauses) < 2:
+        return fallback
+    matches = [parse(clause) for clause in clauses]
+    if not all(matches):
+        return fallback  # "navigate to Fish and Chips" is one destination
+    return matches
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import ollama
+
+from . import config
+from . import metrics
+
+# Managed Ollama client.
+# One ollama.Client (and its pooled HTTP connection) is shared by every request,
+# the model is preloaded on a background thread at startup and kept resident
+# with keep_alive, and every request sends the same model options and system
+# prompt so Ollama can reuse the already-evaluated prompt prefix instead of
+# reloading the runner or re-reading SYSTEM_PROMPT.
+
+# Anything slower than this to load the model counts as a cold start
+COLD_LOAD_THRESHOLD = 0.1  # seconds
+
+
+class LLMClient:
+    def __init__(self, host=None, model=None):
+        self.model = model or config.OLLAMA_MODEL
+        # The HTTP timeout bounds connect and each read; streams also get an
+        # overall deadline in _timed_stream
+        self.client = ollama.Client(host=host or config.OLLAMA_HOST, timeout=config.OLLAMA_TIMEOUT)
+        self.warm = threading.Event()
+        self._warm_thread = None
+
+    def _options(self, extra=None):
+        # Changing num_ctx between requests forces Ollama to reload the model,
+        # so it is pinned here and only per-request sampling options vary.
+        options = {"num_ctx": config.OLLAMA_NUM_CTX}
+        if extra:
+            options.update(extra)
+        return options
+
+    def warm_up(self, system_prompt: str = None):
+        """Loads the model(s) and evaluates the system prompt so it is cached."""
+        messages = [{'role': 'system', 'content': system_prompt}] if system_prompt else []
+        try:
+            for model in tier_models():
+                started = time.monotonic()
+                try:
+                    self.client.chat(
+                        model=model,
+                        messages=messages,
+                        keep_alive=config.OLLAMA_KEEP_ALIVE,
+                        options=self._options({"num_predict": 1}),
+                    )
+                    metrics.observe("llm.warm_up", time.monotonic() - started)
+                    print(f"Ollama model {model} warmed up in {time.monotonic() - started:.2f}s")
+                except Exception as e:
+                    print(f"Ollama warm-up failed for {model}: {e}")
+        finally:
+            self.warm.set()
+
+    def warm_up_async(self, system_prompt: str = None):
+        """Starts warm_up() on a background thread (only once)."""
+        if self._warm_thread is None:
+            self._warm_thread = threading.Thread(target=self.warm_up, args=(system_prompt,), daemon=True)
+            self._warm_thread.start()
+        return self._warm_thread
+
+    def chat(self, messages, stream=False, options=None, model=None, deadline=None, **kwargs):
+        """
+        Same as ollama.chat, with the managed model, keep_alive and options.
+        Latency is recorded as llm.latency.cold or llm.latency.warm.
+        A stream raises TimeoutError once `deadline` (time.monotonic()) passes.
+        """
+        started = time.monotonic()
+        response = self.client.chat(
+            model=model or self.model,
+            messages=messages,
+            stream=stream,
+            keep_alive=config.OLLAMA_KEEP_ALIVE,
+            options=self._options(options),
+            **kwargs,
+        )
+        if stream:
+            return self._timed_stream(response, started, deadline)
+        self._record(response, started)
+        return response
+
+    def _timed_stream(self, chunks, started, deadline=None):
+        for chunk in chunks:
+            if deadline is not None and time.monotonic() > deadline:
+                if hasattr(chunks, "close"):
+                    chunks.close()
+                raise TimeoutError("LLM response deadline exceeded")
+            if chunk.get('done'):
+                self._record(chunk, started)
+            yield chunk
+
+    def _record(self, response, started):
+        elapsed = time.monotonic() - started
+        load = (response.get('load_duration') or 0) / 1e9
+        kind = "cold" if load > COLD_LOAD_THRESHOLD else "warm"
+        metrics.observe(f"llm.latency.{kind}", elapsed)
+        if response.get('prompt_eval_count') is not None:
+            # Drops sharply when the system prompt prefix is reused
+            metrics.observe("llm.prompt_tokens_evaluated", response['prompt_eval_count'])
+
+
+def tier_models():
+    """Models to try in order: the small tiers first, then config.OLLAMA_MODEL."""
+    models = list(config.OLLAMA_TIER_MODELS)
+    if config.OLLAMA_MODEL not in models:
+        models.append(config.OLLAMA_MODEL)
+    return models
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> LLMClient:
+    """Returns the shared LLMClient, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
+
+
+def latency_stats() -> dict:
+    """Cold-start and steady-state request latency."""
+    return {
+        "cold": metrics.summary("llm.latency.cold"),
+        "warm": metrics.summary("llm.latency.warm"),
+        "warm_up": metrics.summary("llm.warm_up"),
+    }
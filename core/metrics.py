@@ -0,0 +1,72 @@
+import threading
+from collections import deque
+
+# Lightweight in-process counters and latency samples shared by the core modules.
+# Everything is keyed by a dotted name, e.g. "route.local" or "llm.latency".
+
+MAX_SAMPLES = 500
+
+_lock = threading.Lock()
+_counters = {}
+_samples = {}
+
+
+def incr(name: str, amount: int = 1):
+    """Increments a named counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name: str, value: float):
+    """Records a sample (usually seconds) for a named measurement."""
+    with _lock:
+        if name not in _samples:
+            _samples[name] = deque(maxlen=MAX_SAMPLES)
+        _samples[name].append(value)
+
+
+def counter(name: str) -> int:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of an unsorted sequence."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summary(name: str) -> dict:
+    """Returns count / last / p50 / p95 / p99 / max for a measurement."""
+    with _lock:
+        values = list(_samples.get(name, ()))
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "last": values[-1],
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def snapshot() -> dict:
+    """Returns all counters and measurement summaries."""
+    with _lock:
+        counters = dict(_counters)
+        names = list(_samples.keys())
+    return {
+        "counters": counters,
+        "timings": {name: summary(name) for name in names},
+    }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _samples.clear()
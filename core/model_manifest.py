@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import threading
+
+# Model files checked against pinned SHA-256 checksums.
+# Instead of asking openwakeword to download (i.e. check GitHub for) its
+# models on every boot, the files are checked against the pins. A file that
+# matched is remembered in a local manifest with its size and mtime, so
+# hashing is only redone when those change and a normal boot is just a few
+# stat() calls. Files without a pin are accepted if present (there is
+# nothing to check them against); what is on disk never becomes a pin.
+# The one exception is accept(): a file the official downloader has just
+# fetched that still differs from its pin (the pins may be out of date for
+# the installed package) is remembered as unverified with its own hash, so
+# it is used, with a warning, instead of being fetched again on every boot.
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelManifest:
+    def __init__(self, path: str, pinned: dict = None):
+        self.path = path
+        self.pinned = dict(pinned or {})  # file name -> expected sha256
+        self.lock = threading.Lock()
+        self.files = {}  # model path -> {"sha256", "size", "mtime_ns"[, "unverified"]} of checked files
+        try:
+            with open(path) as f:
+                self.files = json.load(f).get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def verify(self, paths) -> list:
+        """Returns the paths that are missing or don't match their pinned checksum."""
+        bad = []
+        changed = False
+        for p in paths:
+            expected = self.pinned.get(os.path.basename(p))
+            try:
+                st = os.stat(p)
+            except OSError:
+                bad.append(p)
+                continue
+            if expected is None:
+                continue
+            entry = self.files.get(p)
+            if (entry is not None and (entry["sha256"] == expected or entry.get("unverified"))
+                    and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns):
+                if entry.get("unverified"):
+                    print(f"Model file {os.path.basename(p)} does not match its pinned checksum "
+                          f"(accepted after download)")
+                continue  # checked before and untouched since
+            digest = file_digest(p)
+            if digest != expected:
+                if entry is not None and entry.get("unverified") and entry["sha256"] == digest:
+                    entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)  # only touched
+                    changed = True
+                    continue
+                bad.append(p)
+                if self.files.pop(p, None) is not None:
+                    changed = True
+                continue
+            self.files[p] = {"sha256": expected, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            changed = True
+        if changed:
+            self.save()
+        return bad
+
+    def accept(self, paths):
+        """Remembers freshly downloaded files that don't match their pins as unverified."""
+        for p in paths:
+            st = os.stat(p)
+            self.files[p] = {"sha256": file_digest(p), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                             "unverified": True}
+        self.save()
+
+    def save(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"files": self.files}, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
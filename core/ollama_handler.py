@@ -1,71 +1,20 @@
 
-import ollama
+import itertools
 import json
-from . import actions
+import time
+from typing import NamedTuple
 from .car_state import CarState
 from . import config
-
-# Define available tools schema for context
-TOOLS_SCHEMA = [
-    {
-        "type": "function",
-        "function": {
-            "name": "set_ac",
-            "description": "Control the Air Conditioning",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "on": {"type": "string", "enum": ["on", "off"]},
-                    "temperature": {"type": "integer", "description": "Target temperature in Celsius"}
-                },
-                "required": ["on"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "navigate_to",
-            "description": "Set navigation destination",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "destination": {"type": "string", "description": "The destination address or name"}
-                },
-                "required": ["destination"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "toggle_lights",
-            "description": "Turn headlights on or off",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "on": {"type": "string", "enum": ["on", "off"]}
-                },
-                "required": ["on"]
-            }
-        }
-    },
-    {
-        "type": "function",
-        "function": {
-            "name": "toggle_wipers",
-            "description": "Turn wipers on or off",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "on": {"type": "string", "enum": ["on", "off"]}
-                },
-                "required": ["on"]
-            }
-        }
-    }
-]
-
+from . import intent_parser
+from . import metrics
+from . import tracing
+from .llm_client import get_client, tier_models
+from .circuit_breaker import CircuitBreaker
+from .command_cache import CommandCache
+from .stream_parser import JsonObjectDetector, SentenceSplitter
+from . import tool_registry
+from .tool_registry import TOOLS_SCHEMA, ToolCallError, UnknownToolError
+from .structured_output import OUTPUT_SCHEMA, STRUCTURED_SYSTEM_PROMPT, parse_response
 
 # System Prompt optimized for small models (1B/2B parameters)
 SYSTEM_PROMPT = """
@@ -75,7 +24,8 @@ You are a car assistant. You can control:
 2. LIGHTS (on/off) -> distinct tool "lights" 
 3. WIPERS (on/off) -> distinct tool "wipers"
 4. NAVIGATE (destination) -> distinct tool "nav"
-
+5. STOP NAVIGATION -> distinct tool "stop_nav"
+6. WINDOWS (driver/passenger/all, open/close) -> distinct tool "window"
 
 When the user asks for an action, response ONLY with a JSON object like:
 {"tool": "ac", "args": {"on": "on", "temperature": 22}}
@@ -84,64 +34,423 @@ When the user asks for an action, response ONLY with a JSON object like:
 {"tool": "wipers", "args": {"on": "on"}}
 {"tool": "wipers", "args": {"on": "off"}}
 {"tool": "nav", "args": {"destination": "Home"}}
+{"tool": "stop_nav", "args": {}}
+{"tool": "window", "args": {"window": "driver", "action": "open"}}
+
+If the user asks for several actions, reply with one JSON object per action, in order:
+{"tool": "ac", "args": {"on": "on", "temperature": 20}}
+{"tool": "lights", "args": {"on": "on"}}
 
 If it's just a question, reply normally.
 """
 
-def process_command(text: str, state: CarState) -> str:
+
+class ActionResult(NamedTuple):
+    tool: str
+    args: dict
+    ok: bool
+    message: str
+
+
+def execute_tool(tool_name: str, tool_args: dict, state: CarState) -> str:
+    """Runs a resolved tool call against the car state."""
+    return tool_registry.dispatch(tool_name, tool_args, state)
+
+
+def run_tool_call(tool_name: str, tool_args: dict, state: CarState) -> ActionResult:
+    """Runs one tool call, turning failures into a result instead of raising."""
+    with tracing.span("action"):
+        try:
+            result = ActionResult(tool_name, tool_args, True, execute_tool(tool_name, tool_args, state))
+            metrics.incr("actions.ok")
+            return result
+        except UnknownToolError as e:
+            print(f"Rejected tool call: {e}")
+            metrics.incr("actions.failed")
+            return ActionResult(tool_name, tool_args, False, str(e))
+        except ToolCallError as e:
+            print(f"Rejected tool call: {e}")
+            metrics.incr("actions.failed")
+            return ActionResult(tool_name, tool_args, False, f"Couldn't run {tool_name}.")
+        except Exception as e:
+            print(f"Tool Error: {tool_name} with {tool_args}: {e}")
+            metrics.incr("actions.failed")
+            return ActionResult(tool_name, tool_args, False, f"Couldn't run {tool_name}.")
+
+
+def run_tool_calls(tool_calls, state: CarState):
+    """Runs an ordered list of (tool, args); a failure doesn't stop the rest."""
+    return [run_tool_call(name, args, state) for name, args in tool_calls]
+
+
+def parse_tool_calls(content: str):
     """
-    Process the user's text command using Ollama and execute any tools.
+    Extracts every {"tool": ..., "args": ...} object from a completion, in order.
+    Handles one object, several objects, or a JSON list of objects.
     """
-    model = config.OLLAMA_MODEL
-    
-    messages = [
-        {'role': 'system', 'content': SYSTEM_PROMPT},
+    objects, _ = JsonObjectDetector().feed(content)
+    tool_calls = []
+    for obj in objects:
+        try:
+            tool_call = json.loads(obj)
+        except json.JSONDecodeError:
+            print(f"Ignoring malformed tool call: {obj}")
+            continue
+        if "tool" in tool_call and "args" in tool_call:
+            tool_calls.append((tool_call["tool"], tool_call["args"]))
+    return tool_calls
+
+
+def _summarize(results) -> str:
+    return " ".join(r.message for r in results)
+
+
+def route_stats() -> dict:
+    """How many commands were handled by the local fast path, the cache and the LLM."""
+    local = metrics.counter("route.local")
+    cache = metrics.counter("route.cache")
+    llm = metrics.counter("route.llm")
+    degraded = metrics.counter("route.degraded")
+    total = local + cache + llm + degraded
+    return {
+        "local": local,
+        "cache": cache,
+        "llm": llm,
+        "degraded": degraded,
+        "local_share": (local / total) if total else 0.0,
+        "no_inference_share": ((local + cache) / total) if total else 0.0,
+        "command_cache": command_cache.stats(),
+    }
+
+
+NOT_UNDERSTOOD = "Sorry, I didn't understand that."
+OFFLINE_REPLY = "My local brain is offline right now. I can still handle basic car controls."
+
+# Opens after repeated Ollama failures so later commands don't wait on it
+llm_breaker = CircuitBreaker("llm", failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+                             reset_timeout=config.BREAKER_RESET_TIMEOUT)
+
+# Cleared if the Ollama server rejects JSON-schema formats
+_structured_supported = True
+
+# Resolved LLM results for repeated utterances
+command_cache = CommandCache(max_size=config.COMMAND_CACHE_SIZE, ttl=config.COMMAND_CACHE_TTL)
+
+
+def warm_up():
+    """Preloads the model and system prompt in the background."""
+    get_client().warm_up_async(STRUCTURED_SYSTEM_PROMPT if _structured_mode() else SYSTEM_PROMPT)
+
+
+def _try_fast_path(text: str, state: CarState, min_confidence: float = None, route: str = "route.local"):
+    """Returns the action result if the local intent parser handled the command."""
+    if not config.FAST_PATH_ENABLED:
+        return None
+    if min_confidence is None:
+        min_confidence = config.FAST_PATH_MIN_CONFIDENCE
+    with tracing.span("intent"):
+        matches = intent_parser.parse_all(text)
+    if matches and all(m.confidence >= min_confidence for m in matches):
+        metrics.incr(route)
+        tracing.annotate(route=route.split(".", 1)[1])
+        print(f"Fast Path Calling Tools: {[(m.tool, m.args) for m in matches]}")
+        return _summarize(run_tool_calls([(m.tool, m.args) for m in matches], state))
+    return None
+
+
+def _try_cache(text: str, state: CarState):
+    """Returns the result of a cached LLM resolution, re-running any tool calls."""
+    if not config.COMMAND_CACHE_ENABLED:
+        return None
+    with tracing.span("cache"):
+        entry = command_cache.get(text, state)
+    if entry is None:
+        return None
+    metrics.incr("route.cache")
+    tracing.annotate(route="cache")
+    if entry.tool_calls is not None:
+        print(f"Cache Calling Tools: {entry.tool_calls}")
+        return _summarize(run_tool_calls(entry.tool_calls, state))
+    return entry.text
+
+
+def _degraded(text: str, state: CarState) -> str:
+    """Answer while the Ollama circuit is open: local intents only, no waiting."""
+    result = _try_fast_path(text, state, config.FAST_PATH_DEGRADED_MIN_CONFIDENCE, route="route.degraded")
+    if result is None:
+        metrics.incr("route.degraded")
+        tracing.annotate(route="degraded")
+        return OFFLINE_REPLY
+    return result
+
+
+def _structured_mode() -> bool:
+    return config.OLLAMA_OUTPUT_MODE == "structured" and _structured_supported
+
+
+def _build_messages(text: str, structured: bool = False):
+    return [
+        {'role': 'system', 'content': STRUCTURED_SYSTEM_PROMPT if structured else SYSTEM_PROMPT},
         {'role': 'user', 'content': text}
     ]
 
+
+def _prefetch(stream):
+    """Reads the first chunk now; returns an iterator over the whole stream."""
     try:
-        response = ollama.chat(model=model, messages=messages)
-        content = response['message']['content']
-        
-        # Strip code blocks if present
-        if "```json" in content:
-            content = content.replace("```json", "").replace("```", "")
-        elif "```" in content:
-            content = content.replace("```", "")
-            
-        # Check for JSON tool call
+        first = next(stream)
+    except StopIteration:
+        return iter(())
+    return itertools.chain((first,), stream)
+
+
+def _chat(text: str, stream: bool = False, model: str = None):
+    """
+    Sends the command to Ollama in the configured output mode.
+    Returns (response, structured). If the server rejects the schema format,
+    structured mode is switched off for the session and the call is retried.
+    """
+    global _structured_supported
+    deadline = time.monotonic() + config.OLLAMA_DEADLINE
+    structured = _structured_mode()
+    if structured:
         try:
-            # simple heuristic to find json
-            if "{" in content and "}" in content:
-                json_start = content.find("{")
-                json_end = content.rfind("}") + 1
-                json_str = content[json_start:json_end]
-                
-                tool_call = json.loads(json_str)
-                
-                if "tool" in tool_call and "args" in tool_call:
-                    tool_name = tool_call["tool"]
-                    tool_args = tool_call["args"]
-                    
-                    print(f"Ollama Calling Tool: {tool_name} with {tool_args}")
-                    
-                    if tool_name == "ac" or tool_name == "set_ac":
-                        return actions.set_ac(state, **tool_args)
-                    elif tool_name == "nav" or tool_name == "navigate_to":
-                        return actions.navigate_to(state, **tool_args)
-                    elif tool_name == "lights" or tool_name == "toggle_lights":
-                        return actions.toggle_lights(state, **tool_args)
-                    elif tool_name == "wipers" or tool_name == "toggle_wipers":
-                        return actions.toggle_wipers(state, **tool_args)
-                    else:
-                        return f"Unknown tool: {tool_name}"
-            
-            # If no JSON or parsing failed/not a tool call, return text
-            return content
+            response = get_client().chat(_build_messages(text, True), stream=stream, model=model,
+                                         deadline=deadline, format=OUTPUT_SCHEMA)
+            if stream:
+                # A stream only sends the request when first read, so the
+                # server's 400 would otherwise surface outside this try
+                response = _prefetch(response)
+            return response, True
+        except Exception as e:
+            if getattr(e, "status_code", None) != 400:
+                raise
+            print(f"Structured output unavailable, using heuristic parsing: {e}")
+            _structured_supported = False
+    return get_client().chat(_build_messages(text), stream=stream, model=model, deadline=deadline), False
 
-        except json.JSONDecodeError:
-            return content
+
+def _resolve(content: str, structured: bool):
+    """
+    Turns a completion into (tool_calls, answer).
+    Structured responses go through the schema parser (with repair); free-form
+    ones through the old heuristic, falling back to repair when they look like
+    broken JSON. Raw JSON is never returned as an answer.
+    """
+    if structured:
+        try:
+            return parse_response(content)
+        except ValueError:
+            metrics.incr("llm.parse_failures")
+            return [], None
+
+    # Strip code blocks if present
+    if "```json" in content:
+        content = content.replace("```json", "").replace("```", "")
+    elif "```" in content:
+        content = content.replace("```", "")
+
+    tool_calls = parse_tool_calls(content)
+    if tool_calls or "{" not in content:
+        return tool_calls, content.strip() if not tool_calls else None
+    try:
+        return parse_response(content)
+    except ValueError:
+        metrics.incr("llm.parse_failures")
+        return [], None
+
+
+def _valid(tool_calls) -> bool:
+    """True if every call names a known tool with acceptable arguments."""
+    try:
+        for name, args in tool_calls:
+            tool_registry.resolve(name).validate(args)
+        return True
+    except ToolCallError:
+        return False
+
+
+def process_command(text: str, state: CarState) -> str:
+    """
+    Process the user's text command, trying the local intent parser first and
+    falling back to Ollama. Executes any tools.
+    """
+    result = _try_fast_path(text, state)
+    if result is None:
+        result = _try_cache(text, state)
+    if result is not None:
+        return result
+
+    if not llm_breaker.allow():
+        return _degraded(text, state)
+
+    metrics.incr("route.llm")
+    tracing.annotate(route="llm")
+    return _process_with_llm(text, state)
+
+
+def process_command_stream(text: str, state: CarState, on_sentence=None) -> str:
+    """
+    Streaming variant of process_command.
+    Tool calls are executed as soon as their JSON object closes and prose is
+    handed to on_sentence one sentence at a time while the model is still
+    generating. Returns the full response text.
+    """
+    started = time.monotonic()
+    spoken = []
+
+    def emit(sentence):
+        if not spoken:
+            metrics.observe("llm.time_to_first_audio", time.monotonic() - started)
+        spoken.append(sentence)
+        if on_sentence:
+            on_sentence(sentence)
+
+    result = _try_fast_path(text, state)
+    if result is None:
+        result = _try_cache(text, state)
+    if result is None and not llm_breaker.allow():
+        result = _degraded(text, state)
+    if result is not None:
+        emit(result)
+        return result
+
+    metrics.incr("route.llm")
+    tracing.annotate(route="llm")
+    try:
+        models = tier_models()
+        for tier, model in enumerate(models):
+            last = tier + 1 == len(models)
+            with tracing.span("llm"):
+                tool_calls, results, prose, rejected = _stream_once(text, state, model, started, emit, last)
+            llm_breaker.record_success()
+            if (tool_calls or prose) and not rejected:
+                if tier:
+                    metrics.incr("llm.escalated")
+                if tool_calls:
+                    if all(r.ok for r in results):  # never replay a rejected or failed call
+                        command_cache.put_tool_calls(text, tool_calls)
+                else:
+                    command_cache.put_text(text, " ".join(prose), state)
+                break
+            if not last:
+                print(f"No usable output from {model}, escalating to {models[tier + 1]}")
+        else:
+            emit(NOT_UNDERSTOOD)
+
+    except Exception as e:
+        llm_breaker.record_failure()
+        print(f"Ollama Error: {e}")
+        emit("I'm having trouble connecting to my local brain.")
+
+    return " ".join(spoken)
+
+
+def _stream_once(text: str, state: CarState, model: str, started: float, emit, last: bool = True):
+    """
+    Streams one completion from `model`. Returns the (tool_calls, results,
+    prose) it produced and whether it was cut short by a tool call that failed
+    validation. That only happens when `last` is False: like the non-streaming
+    path, a rejected call is not run but escalated to the next tier.
+    """
+    splitter = SentenceSplitter()
+    first_token = True
+    content = []
+    tool_calls = []
+    results = []
+    prose = []
+
+    stream, structured = _chat(text, stream=True, model=model)
+    # Structured output wraps the calls in {"calls": [...]}, so watch one level down
+    detector = JsonObjectDetector(emit_depth=2 if structured else 1)
+    for chunk in stream:
+        token = chunk['message']['content']
+        content.append(token)
+        if first_token and token:
+            metrics.observe("llm.time_to_first_token", time.monotonic() - started)
+            tracing.event("first_token")
+            first_token = False
+
+        objects, text_part = detector.feed(token)
+        if not structured:
+            for sentence in splitter.feed(text_part):
+                prose.append(sentence)
+                emit(sentence)
+
+        for tool_name, tool_args in parse_tool_calls("".join(objects)):
+            if not last and not _valid([(tool_name, tool_args)]):
+                print(f"Rejected tool call from {model}: {tool_name} with {tool_args}")
+                return tool_calls, results, prose, True
+            print(f"Ollama Calling Tool: {tool_name} with {tool_args}")
+            if not tool_calls:
+                metrics.observe("llm.time_to_first_action", time.monotonic() - started)
+                tracing.event("first_action")
+            tool_calls.append((tool_name, tool_args))
+            result = run_tool_call(tool_name, tool_args, state)
+            results.append(result)
+            emit(result.message)
+
+    full = "".join(content)
+    if not tool_calls and (structured or detector.pending):
+        # Nothing fired while streaming: a structured text answer, or JSON
+        # too broken for the detector that the repair parser may recover
+        calls, answer = _resolve(full, structured)
+        if calls and not last and not _valid(calls):
+            print(f"Rejected tool calls from {model}: {calls}")
+            return tool_calls, results, prose, True
+        if calls:
+            print(f"Ollama Calling Tools: {calls}")
+            tool_calls.extend(calls)
+            results.extend(run_tool_calls(calls, state))
+            emit(_summarize(results))
+        elif answer:
+            for sentence in splitter.feed(answer):
+                prose.append(sentence)
+                emit(sentence)
+
+    # An unterminated object at the end is not a tool call; don't read it out
+    for sentence in splitter.flush():
+        prose.append(sentence)
+        emit(sentence)
+
+    return tool_calls, results, prose, False
+
+
+def _process_with_llm(text: str, state: CarState) -> str:
+    """
+    Process the user's text command using Ollama and execute any tools.
+    A single completion may contain several tool calls; all of them are run.
+    With tiered models, output that can't be parsed or validated is retried on
+    the next (larger) model before anything is executed.
+    """
+    try:
+        models = tier_models()
+        for tier, model in enumerate(models):
+            with tracing.span("llm"):
+                response, structured = _chat(text, model=model)
+            llm_breaker.record_success()
+            tool_calls, answer = _resolve(response['message']['content'], structured)
+
+            last = tier + 1 == len(models)
+            if not last and not (answer if not tool_calls else _valid(tool_calls)):
+                print(f"Low-confidence output from {model}, escalating to {models[tier + 1]}")
+                continue
+            if tier:
+                metrics.incr("llm.escalated")
+
+            if tool_calls:
+                print(f"Ollama Calling Tools: {tool_calls}")
+                results = run_tool_calls(tool_calls, state)
+                if all(r.ok for r in results):  # never replay a rejected or failed call
+                    command_cache.put_tool_calls(text, tool_calls)
+                return _summarize(results)
+
+            if not answer:
+                return NOT_UNDERSTOOD
+            command_cache.put_text(text, answer, state)
+            return answer
             
     except Exception as e:
+        llm_breaker.record_failure()
         print(f"Ollama Error: {e}")
         return "I'm having trouble connecting to my local brain."
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import re
+import threading
+import wave
+
+import numpy as np
+
+from . import actions
+from .car_state import CarState
+
+# Pre-rendered audio for the assistant's fixed replies.
+# Almost everything the assistant says after a car command is one of a few
+# dozen strings from core/actions.py ("Headlights on.", "AC turned on at
+# 22°C."...). Those are synthesized once to WAV, kept on disk under a size cap
+# (least recently used files are evicted first) and played straight from
+# memory; only novel LLM answers go through live synthesis.
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def fixed_phrases():
+    """Every reply the action templates can produce (except free-text destinations)."""
+    from .ollama_handler import NOT_UNDERSTOOD, OFFLINE_REPLY
+    phrases = []
+    for temp in range(16, 31):
+        phrases.append(actions.set_ac(CarState(), "on", temperature=temp))
+    phrases.append(actions.set_ac(CarState(), "off"))
+    for on in ("on", "off"):
+        phrases.append(actions.toggle_lights(CarState(), on))
+        phrases.append(actions.toggle_wipers(CarState(), on))
+    for window in ("driver", "passenger", "all"):
+        for action in ("open", "close"):
+            phrases.append(actions.control_window(CarState(), action, window))
+    phrases.append(actions.stop_navigation(CarState()))
+    # "Navigating to X." and its ETA are free text; only the no-route note is fixed
+    phrases.append(actions.NO_ROUTE)
+    phrases += [NOT_UNDERSTOOD, OFFLINE_REPLY, "I didn't catch that."]
+    # Cached per sentence, the unit TTSWorker.say() splits replies into
+    return list(dict.fromkeys(s for p in phrases for s in split_sentences(p)))
+
+
+def split_sentences(text: str):
+    """Action summaries are several templates joined by spaces; split them back."""
+    return [s for s in _SENTENCE_END.split(text.strip()) if s]
+
+
+class PhraseCache:
+    def __init__(self, directory: str, max_bytes: int, voice_key: str = ""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.voice_key = voice_key  # rate/voice; changing it renders a fresh set
+        self.known = set(fixed_phrases())
+        self.audio = {}  # text -> (int16 samples, rate)
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def is_fixed(self, text: str) -> bool:
+        return text in self.known
+
+    def path(self, text: str) -> str:
+        digest = hashlib.sha1(f"{self.voice_key}|{text}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{digest}.wav")
+
+    def missing(self):
+        """Fixed phrases that still need rendering."""
+        return [t for t in self.known if not os.path.exists(self.path(t))]
+
+    def get(self, text: str):
+        """Returns (samples, rate) for a rendered phrase, or None."""
+        with self.lock:
+            if text in self.audio:
+                return self.audio[text]
+        path = self.path(text)
+        if not os.path.exists(path):
+            return None
+        try:
+            with wave.open(path, "rb") as w:
+                raw = w.readframes(w.getnframes())
+                rate, channels, width = w.getframerate(), w.getnchannels(), w.getsampwidth()
+            if width != 2:
+                raise ValueError(f"unsupported sample width {width}")
+            samples = np.frombuffer(raw, dtype=np.int16).reshape(-1, channels)
+        except Exception as e:
+            # Some TTS drivers can't write WAV; forget the file and speak live
+            print(f"Phrase cache: can't use {path}: {e}")
+            self._remove(path)
+            self.known.discard(text)
+            return None
+        os.utime(path)  # mtime doubles as last-used time for eviction
+        with self.lock:
+            self.audio[text] = (samples, rate)
+        return samples, rate
+
+    def added(self, text: str):
+        """Called after a phrase was rendered to path(text)."""
+        if os.path.exists(self.path(text)):
+            self.evict()
+
+    def evict(self):
+        """Deletes least recently used files until the directory fits max_bytes."""
+        files = []
+        for name in os.listdir(self.directory):
+            full = os.path.join(self.directory, name)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, full))
+        total = sum(size for _, size, _ in files)
+        for _, size, full in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._remove(full)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        with self.lock:
+            for text in [t for t in self.audio if self.path(t) == path]:
+                del self.audio[text]
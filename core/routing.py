@@ -0,0 +1,507 @@
+import heapq
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from . import config
+from . import metrics
+
+# Offline routing for navigate_to.
+#
+# The road graph is one .npz file in CSR form, loaded in one go:
+#   lat, lon            node coordinates (degrees)
+#   indptr, indices     outgoing edges of node i: indices[indptr[i]:indptr[i+1]]
+#   length_m, speed_kmh per edge
+#   place_names, place_nodes   named destinations ("Home", "Office", ...)
+#   lm_from, lm_to      optional landmark tables (build_landmarks()): travel
+#                       seconds from / to a few landmark nodes
+# Queries run A* on travel time. With landmarks the heuristic is ALT
+# (triangle inequality over the landmark tables), which is far tighter than
+# straight-line distance over top speed, so a cross-city query settles a small
+# part of the graph. Bounds are worked out per node as the search reaches it
+# and kept per target, so a query never pays for nodes it doesn't touch and a
+# reroute reuses the bounds of the original search. Recent routes are kept in
+# an LRU cache, and since any tail of a shortest path is itself shortest, a
+# cached route also answers queries that start on it.
+#
+# When the car leaves the route, reroute() searches from where the car is
+# until it can rejoin the old route (or reach the destination directly) and
+# keeps the old route from the join point on, instead of planning again from
+# scratch. Navigator ties this to CarState: its worker thread follows
+# `position` changes and keeps `eta_minutes` up to date.
+
+EARTH_RADIUS_M = 6371000.0
+ACTIVE_LANDMARKS = 4   # landmark tables used per target
+_router = None
+_router_lock = threading.Lock()
+_load_failed = False
+
+
+@contextmanager
+def _timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(name, time.perf_counter() - started)
+
+
+class RoadGraph:
+    def __init__(self, lat, lon, indptr, indices, length_m, speed_kmh, places=None, lm_from=None, lm_to=None):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.length_m = np.asarray(length_m, dtype=np.float64)
+        self.speed_kmh = np.asarray(speed_kmh, dtype=np.float64)
+        self.places = dict(places or {})
+        self.lm_from = None if lm_from is None else np.ascontiguousarray(lm_from, dtype=np.float64)
+        self.lm_to = None if lm_to is None else np.ascontiguousarray(lm_to, dtype=np.float64)
+        self.seconds = self.length_m / (self.speed_kmh / 3.6)
+        self.max_speed = float(self.speed_kmh.max()) / 3.6 if len(self.speed_kmh) else 1.0
+        # Python lists for the search loop; indexing numpy arrays one element
+        # at a time is several times slower
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._seconds = self.seconds.tolist()
+        self._lookup = {name.lower(): node for name, node in self.places.items()}
+        # Equirectangular projection around the graph's centre, in metres
+        self._cos = math.cos(math.radians(float(self.lat.mean()))) if len(self.lat) else 1.0
+        self._x = np.radians(self.lon) * self._cos * EARTH_RADIUS_M
+        self._y = np.radians(self.lat) * EARTH_RADIUS_M
+        self._xs = self._x.tolist()
+        self._ys = self._y.tolist()
+
+    @property
+    def nodes(self) -> int:
+        return len(self.lat)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            places = dict(zip(data["place_names"].tolist(), data["place_nodes"].tolist())) \
+                if "place_names" in data else {}
+            return cls(data["lat"], data["lon"], data["indptr"], data["indices"], data["length_m"],
+                       data["speed_kmh"], places,
+                       data["lm_from"] if "lm_from" in data else None,
+                       data["lm_to"] if "lm_to" in data else None)
+
+    def save(self, path: str):
+        arrays = {
+            "lat": self.lat.astype(np.float64), "lon": self.lon.astype(np.float64),
+            "indptr": self.indptr.astype(np.int32), "indices": self.indices.astype(np.int32),
+            "length_m": self.length_m.astype(np.float32), "speed_kmh": self.speed_kmh.astype(np.float32),
+            "place_names": np.array(list(self.places), dtype=str),
+            "place_nodes": np.array(list(self.places.values()), dtype=np.int32),
+        }
+        if self.lm_from is not None:
+            arrays["lm_from"] = self.lm_from.astype(np.float32)
+            arrays["lm_to"] = self.lm_to.astype(np.float32)
+        np.savez_compressed(path, **arrays)
+
+    def place(self, name: str):
+        """Node for a named destination, or None."""
+        return self._lookup.get(name.strip().lower())
+
+    def nearest_node(self, lat: float, lon: float) -> int:
+        x = math.radians(lon) * self._cos * EARTH_RADIUS_M
+        y = math.radians(lat) * EARTH_RADIUS_M
+        return int(np.argmin((self._x - x) ** 2 + (self._y - y) ** 2))
+
+    def distance_m(self, node: int, lat: float, lon: float) -> float:
+        x = math.radians(lon) * self._cos * EARTH_RADIUS_M
+        y = math.radians(lat) * EARTH_RADIUS_M
+        return math.hypot(self._x[node] - x, self._y[node] - y)
+
+    def position(self, node: int):
+        return float(self.lat[node]), float(self.lon[node])
+
+    def reversed(self):
+        """indptr / indices / seconds of the reverse graph (incoming edges)."""
+        sources = np.repeat(np.arange(self.nodes), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind="stable")
+        indptr = np.zeros(self.nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=self.nodes), out=indptr[1:])
+        return indptr, sources[order], self.seconds[order]
+
+    def heuristic(self, target: int) -> "_Bound":
+        """Admissible lower bound on travel seconds to `target`, indexed by node."""
+        return _Bound(self, target)
+
+
+class _Bound(dict):
+    """
+    Lower bounds to one target, computed for a node the first time a search
+    asks for it. With landmarks only the ACTIVE_LANDMARKS tables that give the
+    tightest bound at the first node asked (the search's source) are used,
+    which keeps each node down to a few lookups.
+    """
+
+    def __init__(self, graph, target):
+        super().__init__()
+        self.graph = graph
+        self.target = target
+        self.x = graph._xs[target]
+        self.y = graph._ys[target]
+        self.landmarks = None   # (forward, backward) tables, picked on the first lookup
+
+    def _pick_landmarks(self, source):
+        # d(v,t) >= d(L,t) - d(L,v)  and  d(v,t) >= d(v,L) - d(t,L). Tables
+        # are read through memoryviews, which index several times faster
+        # than numpy arrays one element at a time
+        t = self.target
+        candidates = [(row.item(t) - row.item(source), memoryview(row), row.item(t), True)
+                      for row in self.graph.lm_from]
+        candidates += [(row.item(source) - row.item(t), memoryview(row), row.item(t), False)
+                       for row in self.graph.lm_to]
+        # A landmark the target can't reach (or be reached from) gives no bound
+        candidates = [c for c in candidates if math.isfinite(c[2])]
+        candidates.sort(key=lambda c: c[0] if math.isfinite(c[0]) else -math.inf, reverse=True)
+        candidates = candidates[:ACTIVE_LANDMARKS]
+        # Less a millisecond for the float32 rounding of the stored tables.
+        # Both lists are published in one assignment: the bound can be shared
+        # by searches on other threads, which must never see just one of them
+        forward = [(table, at_target - 1e-3) for _, table, at_target, is_forward in candidates if is_forward]
+        backward = [(table, at_target + 1e-3) for _, table, at_target, is_forward in candidates if not is_forward]
+        self.landmarks = (forward, backward)
+        return self.landmarks
+
+    def __missing__(self, v):
+        graph = self.graph
+        bound = math.hypot(graph._xs[v] - self.x, graph._ys[v] - self.y) / graph.max_speed
+        if graph.lm_from is not None:
+            landmarks = self.landmarks
+            if landmarks is None:
+                landmarks = self._pick_landmarks(v)
+            forward, backward = landmarks
+            # inf from a node a landmark can't reach gives no bound
+            for table, at_target in forward:
+                b = at_target - table[v]
+                if bound < b < math.inf:
+                    bound = b
+            for table, at_target in backward:
+                b = table[v] - at_target
+                if bound < b < math.inf:
+                    bound = b
+        self[v] = bound
+        return bound
+
+
+def dijkstra(indptr, indices, seconds, source: int, nodes: int) -> np.ndarray:
+    """Travel seconds from `source` to every node (inf if unreachable)."""
+    indptr, indices, seconds = (np.asarray(a).tolist() for a in (indptr, indices, seconds))
+    dist = [math.inf] * nodes
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            nd = d + seconds[e]
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return np.array(dist)
+
+
+def build_landmarks(graph: RoadGraph, count: int = 8, seed: int = 0):
+    """
+    Precomputes ALT landmark tables into the graph (save() stores them).
+    Landmarks are picked farthest-first so they sit around the edge of the map.
+    """
+    rng = np.random.default_rng(seed)
+    rev = graph.reversed()
+    landmarks = [int(rng.integers(graph.nodes))]
+    lm_from, lm_to = [], []
+    while len(lm_from) < count:
+        lm = landmarks[-1]
+        lm_from.append(dijkstra(graph.indptr, graph.indices, graph.seconds, lm, graph.nodes))
+        lm_to.append(dijkstra(*rev, lm, graph.nodes))
+        # Next landmark: the node farthest from all chosen ones
+        spread = np.min([np.where(np.isfinite(d), d, -1) for d in lm_from], axis=0)
+        landmarks.append(int(np.argmax(spread)))
+    graph.lm_from = np.array(lm_from)
+    graph.lm_to = np.array(lm_to)
+    return landmarks[:count]
+
+
+class Route:
+    def __init__(self, nodes, seconds):
+        self.nodes = list(nodes)
+        self.seconds = seconds
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        self._remaining = None
+        self._join = None
+
+    @property
+    def target(self):
+        return self.nodes[-1]
+
+    def remaining(self, graph) -> list:
+        """Seconds left to the destination from each node of the route."""
+        if self._remaining is None:
+            left = [0.0] * len(self.nodes)
+            for i in range(len(self.nodes) - 2, -1, -1):
+                left[i] = left[i + 1] + _edge_seconds(graph, self.nodes[i], self.nodes[i + 1])
+            self._remaining = left
+        return self._remaining
+
+    def join_costs(self, graph) -> dict:
+        """Node -> seconds left to the destination, for rejoining the route."""
+        if self._join is None:
+            self._join = dict(zip(self.nodes, self.remaining(graph)))
+        return self._join
+
+    def tail(self, graph, node):
+        """The rest of the route from `node` (which must be on it)."""
+        i = self.index[node]
+        return Route(self.nodes[i:], self.remaining(graph)[i])
+
+    def meters(self, graph) -> float:
+        return sum(_edge_length(graph, a, b) for a, b in zip(self.nodes, self.nodes[1:]))
+
+
+def _edge(graph, u, v):
+    for e in range(graph._indptr[u], graph._indptr[u + 1]):
+        if graph._indices[e] == v:
+            return e
+    raise KeyError((u, v))
+
+
+def _edge_seconds(graph, u, v):
+    return graph._seconds[_edge(graph, u, v)]
+
+
+def _edge_length(graph, u, v):
+    return float(graph.length_m[_edge(graph, u, v)])
+
+
+class Router:
+    def __init__(self, graph: RoadGraph, cache_size: int = 128):
+        self.graph = graph
+        self.cache_size = cache_size
+        self.cache = OrderedDict()   # (source, target) -> Route
+        self.lock = threading.Lock()
+        self._heuristics = OrderedDict()  # target -> bounds filled in so far (a few recent targets)
+
+    def _heuristic(self, target):
+        # Kept per target, so a reroute reuses the bounds of the original search
+        with self.lock:
+            h = self._heuristics.get(target)
+            if h is None:
+                h = self._heuristics[target] = self.graph.heuristic(target)
+                while len(self._heuristics) > 4:
+                    self._heuristics.popitem(last=False)
+            else:
+                self._heuristics.move_to_end(target)
+            return h
+
+    def _cached(self, source, target):
+        with self.lock:
+            route = self.cache.get((source, target))
+            if route is not None:
+                self.cache.move_to_end((source, target))
+                return route
+            # Any tail of a shortest path is a shortest path
+            for (s, t), cached in reversed(self.cache.items()):
+                if t == target and source in cached.index:
+                    return cached.tail(self.graph, source)
+        return None
+
+    def _store(self, source, target, route):
+        with self.lock:
+            self.cache[(source, target)] = route
+            self.cache.move_to_end((source, target))
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def route(self, source: int, target: int):
+        """Fastest route between two nodes, or None if there isn't one."""
+        route = self._cached(source, target)
+        if route is not None:
+            metrics.incr("routing.cache_hit")
+            return route
+        metrics.incr("routing.cache_miss")
+        with _timed("routing.query"):
+            route = self._search(source, target, self._heuristic(target))
+        if route is not None:
+            self._store(source, target, route)
+        return route
+
+    def reroute(self, route: Route, source: int):
+        """
+        New route from `source` to route.target that reuses the old route: the
+        search stops as soon as no path can beat rejoining the old route.
+        """
+        if source in route.index:
+            return route.tail(self.graph, source)
+        with _timed("routing.reroute"):
+            new = self._search(source, route.target, self._heuristic(route.target),
+                               join=route.join_costs(self.graph), old=route)
+        if new is not None:
+            self._store(source, route.target, new)
+        return new
+
+    def _search(self, source, target, h, join=None, old=None):
+        indptr, indices, seconds = self.graph._indptr, self.graph._indices, self.graph._seconds
+        dist = {source: 0.0}
+        parent = {source: None}
+        heap = [(h[source], 0.0, source)]
+        best = math.inf        # best complete cost found via a join
+        best_join = None
+        settled = 0
+        while heap:
+            f, d, u = heapq.heappop(heap)
+            if f >= best:
+                break          # nothing left can beat rejoining the old route
+            if d > dist[u]:
+                continue
+            settled += 1
+            if u == target:
+                best, best_join = d, None
+                break
+            if join is not None and u in join and d + join[u] < best:
+                best, best_join = d + join[u], u
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                nd = d + seconds[e]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    parent[v] = u
+                    heapq.heappush(heap, (nd + h[v], nd, v))
+        metrics.observe("routing.settled", settled)
+        if best == math.inf:
+            return None
+        end = target if best_join is None else best_join
+        nodes = []
+        while end is not None:
+            nodes.append(end)
+            end = parent[end]
+        nodes.reverse()
+        if best_join is not None:
+            nodes += old.nodes[old.index[best_join] + 1:]
+        return Route(nodes, best)
+
+
+def get_router():
+    """The shared Router for config.ROUTING_GRAPH_PATH, or None if there is no graph."""
+    global _router, _load_failed
+    with _router_lock:
+        if _router is None and config.ROUTING_GRAPH_PATH and not _load_failed:
+            try:
+                _router = Router(RoadGraph.load(config.ROUTING_GRAPH_PATH), config.ROUTING_CACHE_SIZE)
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Routing unavailable: {e}")
+                _load_failed = True  # don't retry on every command
+        return _router
+
+
+class Navigator:
+    """
+    The active route for one CarState. Position fixes are handed to a worker
+    thread, which follows the route, reroutes when the car leaves it and
+    writes `eta_minutes` back.
+    """
+
+    def __init__(self, state, router: Router):
+        self.state = state
+        self.router = router
+        self.route = None
+        self.lock = threading.Condition()
+        self._fix = None          # newest position not yet looked at
+        self._running = True
+        self._unsubscribe = state.subscribe(self._on_change)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def start(self, target: int):
+        """Plans from the current position. Returns the route or None."""
+        graph = self.router.graph
+        position = self.state.position
+        if position is None:
+            # No GPS fix yet: assume we're at Home (or the first node)
+            home = graph.place("home")
+            position = graph.position(home if home is not None else 0)
+        route = self.router.route(graph.nearest_node(*position), target)
+        with self.lock:
+            self.route = route
+        return route
+
+    def stop(self):
+        with self.lock:
+            self.route = None
+            self._fix = None
+
+    def close(self):
+        """Stops following CarState and ends the worker."""
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        with self.lock:
+            self._running = False
+            self.lock.notify()
+        self.thread.join(timeout=2.0)
+
+    def _on_change(self, diff, version):
+        # Runs with the CarState lock held, on whichever thread moved the car:
+        # only note the fix, the worker does the routing
+        if "position" not in diff or diff["position"][1] is None:
+            return
+        with self.lock:
+            if self.route is None:
+                return
+            self._fix = diff["position"][1]
+            self.lock.notify()
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while self._running and self._fix is None:
+                    self.lock.wait()
+                if not self._running:
+                    return
+                fix, self._fix = self._fix, None
+                route = self.route
+            if route is None:
+                continue
+            try:
+                new = self._follow(route, *fix)
+            except Exception as e:
+                print(f"Navigation update failed: {e}")
+                continue
+            if new is None:
+                continue
+            with self.lock:
+                if self.route is not route:
+                    continue  # stopped or replanned meanwhile
+                self.route = new
+            self.state.update(eta_minutes=max(1, round(new.seconds / 60)))
+
+    def _follow(self, route, lat, lon):
+        """The route from where the car is now, or None to leave it as it is."""
+        graph = self.router.graph
+        node = graph.nearest_node(lat, lon)
+        if node in route.index:
+            return route.tail(graph, node)  # still on the route: count down
+        if graph.distance_m(node, lat, lon) > config.ROUTING_OFF_ROUTE_M:
+            return None  # between junctions; wait for a fix near one
+        metrics.incr("routing.deviations")
+        return self.router.reroute(route, node)
+
+
+def navigator(state):
+    """The Navigator for `state` (created on first use), or None without a road graph."""
+    router = get_router()
+    if router is None:
+        return None
+    with _router_lock:
+        nav = getattr(state, "navigator", None)
+        if nav is None:
+            nav = state.navigator = Navigator(state, router)
+    return nav
@@ -0,0 +1,158 @@
+import heapq
+import itertools
+import threading
+import time
+
+from . import config
+from . import intent_parser
+from . import metrics
+from . import tracing
+
+# Runs commands on a fixed pool of worker threads instead of one thread per
+# command. The queue is bounded, safety-relevant commands jump ahead of
+# chit-chat, and a queued command is cancelled when a newer one for the same
+# target arrives ("AC to 20" then "AC to 22" only runs the second). Commands
+# left to the LLM have no known target and are never superseded.
+# Each job carries a tracing.Trace; the handler is called as
+# handler(text, trace) with the trace active on the worker thread.
+
+PRIORITY_SAFETY = 0   # lights, wipers
+PRIORITY_CONTROL = 1  # other car controls
+PRIORITY_CHAT = 2     # anything that needs the LLM
+
+SAFETY_TOOLS = {"toggle_lights", "toggle_wipers"}
+
+
+def classify(text: str):
+    """Returns (priority, supersede key) for a command; the key is None unless the target is certain."""
+    matches = intent_parser.parse_all(text)
+    if not matches or any(m.confidence < config.FAST_PATH_MIN_CONFIDENCE for m in matches):
+        return PRIORITY_CHAT, None  # goes to the LLM, which may read it differently
+    tools = {m.tool for m in matches}
+    priority = PRIORITY_SAFETY if tools & SAFETY_TOOLS else PRIORITY_CONTROL
+    return priority, ",".join(sorted(tools))
+
+
+class Job:
+    def __init__(self, text, source, priority, key, trace=None):
+        self.text = text
+        self.source = source
+        self.priority = priority
+        self.key = key
+        self.trace = trace or tracing.start(source)
+        self.submitted = time.monotonic()
+        self.cancelled = False
+        self.done = threading.Event()
+        self.error = None
+
+    def wait(self, timeout=None) -> bool:
+        return self.done.wait(timeout)
+
+    def cancel(self, outcome: str):
+        self.cancelled = True
+        self.done.set()
+        self.trace.end(outcome=outcome)
+
+
+class CommandScheduler:
+    def __init__(self, handler, workers: int = 2, max_queue: int = 8):
+        self.handler = handler
+        self.num_workers = workers
+        self.max_queue = max_queue
+        self.heap = []
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.running = False
+        self.active = 0
+        self.threads = []
+        self.counts = {"submitted": 0, "completed": 0, "superseded": 0, "rejected": 0, "evicted": 0}
+
+    def start(self):
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._worker, name=f"command-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            for _, _, job in self.heap:
+                if not job.cancelled:
+                    job.cancel("stopped")
+            self.heap.clear()
+            self.cond.notify_all()
+
+    def _queued(self):
+        return [job for _, _, job in self.heap if not job.cancelled]
+
+    def submit(self, text: str, source: str = "text", trace=None):
+        """
+        Queues a command. Returns the Job, or None if the queue is full of
+        commands at least as important as this one. A trace started earlier
+        (e.g. at the wake word) can be passed in; otherwise one is started here.
+        """
+        priority, key = classify(text)
+        job = Job(text, source, priority, key, trace)
+        job.trace.annotate(priority=priority, key=key)
+        with self.cond:
+            self.counts["submitted"] += 1
+
+            for old in self._queued():
+                if job.key is not None and old.key == job.key:
+                    old.cancel("superseded")
+                    self.counts["superseded"] += 1
+
+            queued = self._queued()
+            if len(queued) >= self.max_queue:
+                # Make room by dropping the least important, oldest command
+                victim = max(queued, key=lambda j: (j.priority, -j.submitted))
+                if victim.priority <= job.priority:
+                    self.counts["rejected"] += 1
+                    job.trace.end(outcome="rejected")
+                    return None
+                victim.cancel("evicted")
+                self.counts["evicted"] += 1
+
+            heapq.heappush(self.heap, (job.priority, next(self.seq), job))
+            metrics.observe("scheduler.queue_depth", len(self._queued()))
+            self.cond.notify()
+        return job
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while self.running and not self.heap:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                _, _, job = heapq.heappop(self.heap)
+                if job.cancelled:
+                    continue
+                self.active += 1
+
+            metrics.observe("scheduler.wait", time.monotonic() - job.submitted)
+            job.trace.add_span("queue", job.submitted)
+            try:
+                with tracing.activate(job.trace):
+                    self.handler(job.text, job.trace)
+            except Exception as e:
+                job.error = e
+                print(f"Command Error: {e}")
+            finally:
+                with self.cond:
+                    self.active -= 1
+                    self.counts["completed"] += 1
+                job.trace.end(outcome="error" if job.error else "done")
+                job.done.set()
+
+    def stats(self) -> dict:
+        with self.cond:
+            stats = dict(self.counts)
+            stats["queue_depth"] = len(self._queued())
+            stats["active"] = self.active
+        stats["wait"] = metrics.summary("scheduler.wait")
+        return stats
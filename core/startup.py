@@ -0,0 +1,86 @@
+import importlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Startup profiler.
+# main.py imports this module first, so T0 is (close to) process start.
+# mark() records milestones such as first_frame and voice_ready, timed() and
+# timed_import() record how long each heavy import took, and finish() prints
+# the report (and writes it as JSON) once everything is up, so startup
+# regressions show up in the console on every run.
+
+T0 = time.perf_counter()
+
+_lock = threading.Lock()
+_marks = {}     # milestone -> seconds since T0
+_imports = {}   # module / label -> seconds it took (None if it failed)
+_finished = False
+
+
+def elapsed() -> float:
+    return time.perf_counter() - T0
+
+
+def mark(name: str):
+    """Records the first time a milestone is reached."""
+    with _lock:
+        _marks.setdefault(name, elapsed())
+
+
+@contextmanager
+def timed(label: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _imports[label] = time.perf_counter() - started
+
+
+def timed_import(name: str):
+    """Imports a module, recording how long it took. Returns None if it isn't installed."""
+    started = time.perf_counter()
+    try:
+        module = importlib.import_module(name)
+    except Exception as e:
+        print(f"Startup: {name} unavailable ({e})")
+        with _lock:
+            _imports[name] = None
+        return None
+    with _lock:
+        _imports[name] = time.perf_counter() - started
+    return module
+
+
+def report() -> dict:
+    with _lock:
+        return {
+            "marks": dict(sorted(_marks.items(), key=lambda kv: kv[1])),
+            "imports": dict(_imports),
+        }
+
+
+def finish(path: str = None):
+    """Marks voice_ready, prints the report once and optionally writes it to `path`."""
+    global _finished
+    mark("voice_ready")
+    with _lock:
+        if _finished:
+            return
+        _finished = True
+    data = report()
+    print("Startup report:")
+    for name, at in data["marks"].items():
+        print(f"  {name:<24} {at * 1000:8.0f} ms")
+    for name, took in sorted(data["imports"].items(), key=lambda kv: -(kv[1] or 0)):
+        print(f"  import {name:<17} {'missing' if took is None else f'{took * 1000:8.0f} ms'}")
+    if path:
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(data, f, indent=2)
+        except OSError as e:
+            print(f"Startup report not written: {e}")
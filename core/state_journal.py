@@ -0,0 +1,246 @@
+import json
+import os
+import queue
+import struct
+import threading
+import zlib
+
+# Durable CarState: cabin settings and the active route survive restarts.
+#
+# Two files in `directory`:
+#   state.snap     compact binary snapshot of the persisted fields, written
+#                  atomically (tmp file + fsync + rename)
+#   state.journal  append-only log of changes since that snapshot
+#
+# Journal record:  <u32 payload length> <u32 crc32> <u64 seq> <JSON diff>
+# The CRC covers seq + payload. On restore, replay stops at the first record
+# that is short or fails its CRC (a write torn by a crash or power loss) and
+# the file is truncated back to the last good record, so new appends never
+# follow garbage. Every record has a sequence number and the snapshot stores
+# the last one it includes, so a crash between writing a snapshot and
+# truncating the journal just replays nothing twice.
+#
+# Changes are written by a background thread (the CarState subscriber only
+# queues them), and the journal is compacted into a fresh snapshot every
+# `compact_every` records, which bounds disk use.
+
+PERSISTED = ("ac_on", "ac_temp", "destination", "lights_on", "wipers_on", "fuel", "windows")
+
+SNAPSHOT_MAGIC = b"CST1"
+_SNAP_HEAD = struct.Struct("<4sQ??B?hB")   # magic, seq, ac_on, lights_on, ac_temp, wipers_on, fuel, n windows
+_SNAP_WINDOW = struct.Struct("<B")          # name length (then name, then u8 position)
+_SNAP_DEST = struct.Struct("<H")            # destination length, 0xFFFF = none
+_RECORD = struct.Struct("<IIQ")             # payload length, crc32, seq
+_CRC = struct.Struct("<I")
+_NO_DESTINATION = 0xFFFF
+
+
+def encode_snapshot(values: dict, seq: int) -> bytes:
+    windows = dict(values["windows"])
+    parts = [_SNAP_HEAD.pack(SNAPSHOT_MAGIC, seq, bool(values["ac_on"]), bool(values["lights_on"]),
+                             int(values["ac_temp"]), bool(values["wipers_on"]), int(values["fuel"]), len(windows))]
+    for name, position in windows.items():
+        raw = name.encode("utf-8")
+        parts += [_SNAP_WINDOW.pack(len(raw)), raw, bytes([int(position)])]
+    if values["destination"] is None:
+        parts.append(_SNAP_DEST.pack(_NO_DESTINATION))
+    else:
+        raw = str(values["destination"]).encode("utf-8")[:_NO_DESTINATION - 1]
+        parts += [_SNAP_DEST.pack(len(raw)), raw]
+    body = b"".join(parts)
+    return body + _CRC.pack(zlib.crc32(body))
+
+
+def decode_snapshot(data: bytes):
+    """Returns (values, seq). Raises ValueError if the snapshot is damaged."""
+    if len(data) < _SNAP_HEAD.size + _CRC.size or zlib.crc32(data[:-_CRC.size]) != _CRC.unpack(data[-_CRC.size:])[0]:
+        raise ValueError("snapshot checksum mismatch")
+    magic, seq, ac_on, lights_on, ac_temp, wipers_on, fuel, n = _SNAP_HEAD.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("not a CarState snapshot")
+    offset = _SNAP_HEAD.size
+    windows = {}
+    for _ in range(n):
+        (length,) = _SNAP_WINDOW.unpack_from(data, offset)
+        offset += _SNAP_WINDOW.size
+        name = data[offset:offset + length].decode("utf-8")
+        windows[name] = data[offset + length]
+        offset += length + 1
+    (length,) = _SNAP_DEST.unpack_from(data, offset)
+    offset += _SNAP_DEST.size
+    destination = None if length == _NO_DESTINATION else data[offset:offset + length].decode("utf-8")
+    values = {"ac_on": ac_on, "ac_temp": ac_temp, "destination": destination, "lights_on": lights_on,
+              "wipers_on": wipers_on, "fuel": fuel, "windows": windows}
+    return values, seq
+
+
+def encode_record(seq: int, changes: dict) -> bytes:
+    payload = json.dumps(changes, separators=(",", ":")).encode("utf-8")
+    crc = zlib.crc32(struct.pack("<Q", seq) + payload)
+    return _RECORD.pack(len(payload), crc, seq) + payload
+
+
+def read_records(data: bytes):
+    """Yields (seq, changes, end offset) for every intact record, stopping at the first torn one."""
+    offset = 0
+    while offset + _RECORD.size <= len(data):
+        length, crc, seq = _RECORD.unpack_from(data, offset)
+        start = offset + _RECORD.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(struct.pack("<Q", seq) + payload) != crc:
+            return
+        try:
+            changes = json.loads(payload)
+        except ValueError:
+            return
+        offset = start + length
+        yield seq, changes, offset
+
+
+def _fsync_dir(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # not supported (Windows)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class StateJournal:
+    def __init__(self, directory: str, fields=PERSISTED, compact_every: int = 256, fsync: bool = True):
+        self.directory = directory
+        self.fields = tuple(fields)
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.snapshot_path = os.path.join(directory, "state.snap")
+        self.journal_path = os.path.join(directory, "state.journal")
+        self.seq = 0            # last sequence number written (or restored)
+        self.records = 0        # records in the journal since the last snapshot
+        self.state = None
+        self.file = None
+        self.queue = queue.Queue()
+        self.thread = None
+        self._unsubscribe = None
+        os.makedirs(directory, exist_ok=True)
+
+    def restore(self, state) -> dict:
+        """
+        Loads the snapshot, replays the journal tail into `state` and trims any
+        torn record off the end of the journal. Returns what it found.
+        """
+        info = {"snapshot": False, "replayed": 0, "torn_bytes": 0}
+        values = {}
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                values, self.seq = decode_snapshot(f.read())
+            info["snapshot"] = True
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            # Only written via rename, so this means disk corruption; the
+            # journal may still have everything since the previous compaction
+            print(f"State snapshot ignored: {e}")
+
+        data = b""
+        try:
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            pass
+        good = 0
+        for seq, changes, end in read_records(data):
+            good = end
+            self.records += 1
+            if seq <= self.seq:
+                continue  # already in the snapshot
+            values.update((k, v) for k, v in changes.items() if k in self.fields)
+            self.seq = seq
+            info["replayed"] += 1
+        if good < len(data):
+            info["torn_bytes"] = len(data) - good
+            print(f"State journal: dropping {len(data) - good} bytes of torn record(s)")
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good)
+
+        if values:
+            state.update(**{k: v for k, v in values.items() if k in self.fields})
+        info["seq"] = self.seq
+        return info
+
+    def attach(self, state):
+        """Journals every change to the persisted fields from now on."""
+        self.state = state
+        self.file = open(self.journal_path, "ab")
+        self._unsubscribe = state.subscribe(self._on_change)
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=5.0)
+            self.thread = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _on_change(self, diff, version):
+        # Called with the CarState lock held: only queue the new values
+        changes = {k: _plain(new) for k, (old, new) in diff.items() if k in self.fields}
+        if changes:
+            self.queue.put(changes)
+
+    def _writer(self):
+        while True:
+            changes = self.queue.get()
+            if changes is None:
+                return
+            try:
+                self._append(changes)
+                if self.records >= self.compact_every:
+                    self.compact()
+            except OSError as e:
+                print(f"State journal write failed: {e}")
+
+    def _append(self, changes):
+        self.seq += 1
+        self.file.write(encode_record(self.seq, changes))
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.records += 1
+
+    def compact(self):
+        """
+        Writes the current state as a snapshot and starts an empty journal.
+        Only called from the writer thread (or before attach()), so no record
+        can be appended in between.
+        """
+        snap = self.state.snapshot()
+        values = {k: _plain(getattr(snap, k)) for k in PERSISTED}
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(encode_snapshot(values, self.seq))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        _fsync_dir(self.directory)
+        # The snapshot now covers everything up to self.seq
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.records = 0
+
+
+def _plain(value):
+    """JSON-friendly copy (dict fields are read-only views in CarState)."""
+    return dict(value) if hasattr(value, "items") else value
@@ -0,0 +1,88 @@
+import re
+
+# Incremental parsers for streamed LLM output. Both are fed raw token text as
+# it arrives and hand back completed pieces as early as possible.
+
+
+class JsonObjectDetector:
+    """
+    Brace-balanced detector for JSON objects in a token stream.
+    feed() returns (objects, text): the raw strings of any objects that closed
+    in this chunk, and the text that arrived outside of any object.
+    By default top-level objects are reported; emit_depth=2 reports the
+    objects nested one level down instead (e.g. each entry of {"calls": [...]})
+    as soon as they close, before the outer object is finished.
+    """
+
+    def __init__(self, emit_depth: int = 1):
+        self.emit_depth = emit_depth
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.current = []
+
+    def feed(self, chunk: str):
+        objects = []
+        text = []
+        for ch in chunk:
+            if self.depth == 0 and ch != "{":
+                text.append(ch)
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+                if self.depth == self.emit_depth:
+                    self.current = []
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == self.emit_depth - 1:
+                    self.current.append(ch)
+                    objects.append("".join(self.current))
+                    self.current = []
+                    continue
+
+            if self.depth >= self.emit_depth:
+                self.current.append(ch)
+        return objects, "".join(text)
+
+    @property
+    def pending(self) -> str:
+        """Text of an object that has been opened but not closed yet."""
+        return "".join(self.current)
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_CODE_FENCE = re.compile(r"```(?:json)?")
+
+
+class SentenceSplitter:
+    """Buffers streamed prose and returns it one complete sentence at a time."""
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, chunk: str):
+        self.buffer += chunk
+        parts = _SENTENCE_END.split(self.buffer)
+        self.buffer = parts.pop()
+        return [s for s in (self._clean(p) for p in parts) if s]
+
+    def flush(self):
+        rest = self._clean(self.buffer)
+        self.buffer = ""
+        return [rest] if rest else []
+
+    @staticmethod
+    def _clean(sentence: str) -> str:
+        sentence = _CODE_FENCE.sub("", sentence).strip()
+        # Leftovers of a JSON list ("[", ",", "]") are not worth saying
+        return sentence if any(c.isalnum() for c in sentence) else ""
@@ -0,0 +1,146 @@
+import json
+import re
+
+from .tool_registry import TOOLS_SCHEMA
+
+# Schema-constrained output mode.
+# Ollama (0.5+) accepts a JSON schema as `format` and restricts decoding to it,
+# so the model can only produce {"calls": [...]} or {"answer": "..."} - no code
+# fences, no preamble. For servers without schema support (or a model that
+# still manages to break out) responses go through a bounded repair parser.
+
+
+def _call_schema(tool: dict) -> dict:
+    function = tool["function"]
+    return {
+        "type": "object",
+        "properties": {
+            "tool": {"type": "string", "enum": [function["name"]]},
+            "args": function.get("parameters", {"type": "object", "properties": {}}),
+        },
+        "required": ["tool", "args"],
+    }
+
+
+def build_output_schema(tools=TOOLS_SCHEMA) -> dict:
+    """Either a list of tool calls or a plain text answer."""
+    return {
+        "anyOf": [
+            {
+                "type": "object",
+                "properties": {
+                    "calls": {"type": "array", "items": {"anyOf": [_call_schema(t) for t in tools]}, "minItems": 1},
+                },
+                "required": ["calls"],
+            },
+            {
+                "type": "object",
+                "properties": {"answer": {"type": "string"}},
+                "required": ["answer"],
+            },
+        ]
+    }
+
+
+OUTPUT_SCHEMA = build_output_schema()
+
+_TOOL_LINES = "\n".join(
+    f"- {t['function']['name']}: {t['function']['description']}. args: "
+    + json.dumps({k: v.get("enum", v["type"]) for k, v in t["function"]["parameters"]["properties"].items()})
+    for t in TOOLS_SCHEMA
+)
+
+STRUCTURED_SYSTEM_PROMPT = f"""
+You are a car assistant. Reply with JSON only.
+Tools:
+{_TOOL_LINES}
+
+For actions: {{"calls": [{{"tool": "set_ac", "args": {{"on": "on", "temperature": 22}}}}]}}
+Several actions go in order in the same list.
+For anything else: {{"answer": "one or two short sentences"}}
+"""
+
+
+# Repair parser limits: never scan or rebuild more than this much text
+MAX_REPAIR_CHARS = 4000
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_CODE_FENCE = re.compile(r"```(?:json)?")
+
+
+def repair_json(text: str):
+    """
+    Best-effort parse of almost-JSON from small models: code fences, prose
+    around the object, trailing commas, single quotes, or output cut off
+    before the closing brackets. Work is bounded by MAX_REPAIR_CHARS.
+    Returns the parsed value or None.
+    """
+    text = _CODE_FENCE.sub("", text)
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return None
+    text = text[min(starts):min(starts) + MAX_REPAIR_CHARS]
+
+    candidates = [text]
+    if "'" in text and '"' not in text:
+        candidates.append(text.replace("'", '"'))
+
+    for candidate in candidates:
+        candidate = _TRAILING_COMMA.sub(r"\1", candidate)
+        # Close whatever is still open, ignoring anything after the outermost close
+        stack = []
+        in_string = escape = False
+        end = len(candidate)
+        for i, ch in enumerate(candidate):
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == "\\":
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch in "{[":
+                stack.append("}" if ch == "{" else "]")
+            elif ch in "}]":
+                if stack:
+                    stack.pop()
+                if not stack:
+                    end = i + 1
+                    break
+        candidate = candidate[:end]
+        if in_string:
+            candidate += '"'
+        candidate = _TRAILING_COMMA.sub(r"\1", candidate.rstrip().rstrip(",")) + "".join(reversed(stack))
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def parse_response(content: str):
+    """
+    Parses a structured response into (tool_calls, answer).
+    tool_calls is a list of (tool, args); raises ValueError if nothing usable.
+    """
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        data = repair_json(content)
+    if data is None:
+        raise ValueError("unparseable response")
+
+    if isinstance(data, dict) and "tool" in data and "args" in data:
+        data = {"calls": [data]}
+    elif isinstance(data, list):
+        data = {"calls": data}
+    if not isinstance(data, dict):
+        raise ValueError("response is not an object")
+
+    calls = [(c["tool"], c["args"]) for c in data.get("calls") or []
+             if isinstance(c, dict) and "tool" in c and "args" in c]
+    answer = data.get("answer")
+    if not calls and not isinstance(answer, str):
+        raise ValueError("response has neither calls nor an answer")
+    return calls, answer if isinstance(answer, str) else None
@@ -0,0 +1,149 @@
+import json
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from . import metrics
+
+# Speech-to-text backends.
+# Every engine takes audio while the driver is still speaking:
+#   start()          - begin a new utterance
+#   accept(samples)  - feed int16 samples, returns the partial transcript (or None)
+#   finish()         - end of speech, returns the final transcript ("" if nothing was understood)
+# Vosk decodes incrementally on-device, so finish() only flushes the last few
+# frames. Google buffers the audio and sends it in one request on finish().
+
+RATE = 16000
+
+
+def _text(result_json: str, key: str) -> str:
+    return json.loads(result_json).get(key, "").strip()
+
+
+class STTEngine(ABC):
+    name = "base"
+
+    def start(self):
+        pass
+
+    def accept(self, samples: np.ndarray):
+        return None
+
+    @abstractmethod
+    def finish(self) -> str:
+        """The final transcript of the utterance ("" if nothing was understood)."""
+
+
+class VoskEngine(STTEngine):
+    """Offline streaming recognizer. The model is loaded once and reused."""
+
+    name = "vosk"
+
+    def __init__(self, model_path: str, rate: int = RATE):
+        import vosk
+        vosk.SetLogLevel(-1)
+        self.vosk = vosk
+        self.rate = rate
+        self.model = vosk.Model(model_path)
+        self.recognizer = None
+        self.segments = []
+        self.partial = ""
+
+    def start(self):
+        # A fresh recognizer per utterance is cheap; the model is what's slow to load
+        self.recognizer = self.vosk.KaldiRecognizer(self.model, self.rate)
+        self.segments = []
+        self.partial = ""
+
+    def accept(self, samples):
+        if self.recognizer is None:
+            self.start()
+        if self.recognizer.AcceptWaveform(np.asarray(samples, dtype=np.int16).tobytes()):
+            # Vosk found a pause inside the utterance and finalized a segment
+            text = _text(self.recognizer.Result(), "text")
+            if text:
+                self.segments.append(text)
+            partial = ""
+        else:
+            partial = _text(self.recognizer.PartialResult(), "partial")
+        current = " ".join(self.segments + ([partial] if partial else []))
+        if current and current != self.partial:
+            self.partial = current
+            return current
+        return None
+
+    def finish(self):
+        if self.recognizer is None:
+            return ""
+        text = _text(self.recognizer.FinalResult(), "text")
+        if text:
+            self.segments.append(text)
+        self.recognizer = None
+        return " ".join(self.segments)
+
+
+class GoogleEngine(STTEngine):
+    """Online recognizer via speech_recognition. Buffers and uploads on finish()."""
+
+    name = "google"
+
+    def __init__(self, rate: int = RATE):
+        import speech_recognition as sr
+        self.sr = sr
+        self.rate = rate
+        self.recognizer = sr.Recognizer()
+        self.frames = []
+
+    def start(self):
+        self.frames = []
+
+    def accept(self, samples):
+        self.frames.append(np.asarray(samples, dtype=np.int16))
+        return None
+
+    def finish(self):
+        if not self.frames:
+            return ""
+        audio = np.concatenate(self.frames)
+        self.frames = []
+        try:
+            return self.recognizer.recognize_google(self.sr.AudioData(audio.tobytes(), self.rate, 2))
+        except self.sr.UnknownValueError:
+            return ""
+
+
+class TimedEngine(STTEngine):
+    """Wraps an engine to record stt.final_latency (end of speech -> final text)."""
+
+    def __init__(self, engine: STTEngine):
+        self.engine = engine
+        self.name = engine.name
+
+    def start(self):
+        self.engine.start()
+
+    def accept(self, samples):
+        return self.engine.accept(samples)
+
+    def finish(self):
+        started = time.monotonic()
+        try:
+            return self.engine.finish()
+        finally:
+            metrics.observe(f"stt.final_latency.{self.name}", time.monotonic() - started)
+
+
+def create_engine(name: str, model_path: str = None, rate: int = RATE) -> STTEngine:
+    """
+    Builds the configured engine. If the offline engine can't be loaded
+    (package or model missing) this falls back to Google so voice still works.
+    """
+    if name == "vosk":
+        try:
+            return TimedEngine(VoskEngine(model_path, rate))
+        except Exception as e:
+            print(f"Vosk unavailable ({e}), falling back to Google STT")
+    elif name != "google":
+        print(f"Unknown STT engine '{name}', using Google STT")
+    return TimedEngine(GoogleEngine(rate))
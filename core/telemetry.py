@@ -0,0 +1,265 @@
+import threading
+import time
+
+import numpy as np
+
+# Telemetry history for diagnostics: speed, fuel and cabin signals over time.
+# Each signal keeps three fixed-size NumPy rings, allocated up front, so
+# memory stays the same however long the car runs:
+#   raw   every sample (the last `raw_samples` of them, e.g. 60 s at 100 Hz)
+#   1s    per-second min / max / mean / last (the last hour)
+#   1m    per-minute min / max / mean / last (the last day)
+# append() is O(1) plain-Python work (a few array stores and running
+# min/max/sum for the open 1 s and 1 min buckets), cheap enough for 100 Hz
+# signals; closed buckets are written into their ring when time moves on.
+# query() returns the samples or buckets in a time window and aggregate()
+# the count / min / max / mean / last over one, using the finest resolution
+# that still covers the start of the window (or, with no start, everything
+# recorded so far). At 1s / 1m a bucket is included if it overlaps the
+# window, so bucketed results snap outwards to whole buckets at both ends.
+
+RESOLUTIONS = {"1s": 1.0, "1m": 60.0}
+BUCKET_COLUMNS = ("t", "min", "max", "mean", "n", "last")
+STATE_FIELDS = ("speed", "fuel", "ac_temp", "ac_on", "lights_on", "wipers_on")
+
+
+class _Ring:
+    """Fixed-capacity columns in a circular buffer, oldest first when read."""
+
+    def __init__(self, capacity: int, columns):
+        self.capacity = capacity
+        self.columns = {name: np.zeros(capacity, dtype=np.float64) for name in columns}
+        self.head = 0    # next slot to write
+        self.count = 0
+
+    def put(self, **values):
+        i = self.head
+        for name, value in values.items():
+            self.columns[name][i] = value
+        self.head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def ordered(self, name):
+        column = self.columns[name]
+        if self.count < self.capacity:
+            return column[:self.count]
+        return np.concatenate((column[self.head:], column[:self.head]))
+
+    def oldest(self):
+        if not self.count:
+            return None
+        return self.columns["t"][0 if self.count < self.capacity else self.head]
+
+    def window(self, start, end, names, width=0.0):
+        """
+        Copies of the requested columns for rows with start <= t < end, or
+        for rows that are buckets `width` wide, whose [t, t + width) overlaps
+        [start, end).
+        """
+        times = self.ordered("t")
+        if start is None:
+            lo = 0
+        elif width:
+            lo = np.searchsorted(times, start - width, side="right")
+        else:
+            lo = np.searchsorted(times, start, side="left")
+        hi = np.searchsorted(times, end, side="left") if end is not None else len(times)
+        out = {"t": times[lo:hi].copy()}
+        for name in names:
+            if name != "t":
+                out[name] = self.ordered(name)[lo:hi].copy()
+        return out
+
+    @property
+    def nbytes(self):
+        return sum(c.nbytes for c in self.columns.values())
+
+
+class _Bucket:
+    """The open (not yet closed) bucket for one resolution."""
+    __slots__ = ("start", "min", "max", "sum", "n", "last")
+
+    def __init__(self):
+        self.start = None
+
+    def reset(self, start, value):
+        self.start = start
+        self.min = self.max = self.sum = self.last = value
+        self.n = 1
+
+
+class Signal:
+    def __init__(self, name: str, raw_samples: int = 6000, seconds: int = 3600, minutes: int = 1440):
+        self.name = name
+        self.raw = _Ring(raw_samples, ("t", "v"))
+        self.rings = {"1s": _Ring(seconds, BUCKET_COLUMNS),
+                      "1m": _Ring(minutes, BUCKET_COLUMNS)}
+        self.open = {res: _Bucket() for res in RESOLUTIONS}
+        self.last_t = None
+        self.last_v = None
+
+    def append(self, t: float, value: float):
+        if self.last_t is not None and t < self.last_t:
+            t = self.last_t  # clock stepped back; keep the rings sorted
+        self.last_t, self.last_v = t, value
+        self.raw.put(t=t, v=value)
+        for res, width in RESOLUTIONS.items():
+            bucket = self.open[res]
+            start = t - t % width
+            if bucket.start == start:
+                if value < bucket.min:
+                    bucket.min = value
+                elif value > bucket.max:
+                    bucket.max = value
+                bucket.sum += value
+                bucket.n += 1
+                bucket.last = value
+                continue
+            if bucket.start is not None:
+                self._close(res, bucket)
+            bucket.reset(start, value)
+
+    def _close(self, res, bucket):
+        self.rings[res].put(t=bucket.start, min=bucket.min, max=bucket.max,
+                            mean=bucket.sum / bucket.n, n=bucket.n, last=bucket.last)
+
+    def buckets(self, res, start=None, end=None) -> dict:
+        """
+        Closed buckets plus the open one that overlap [start, end), as arrays
+        t / min / max / mean / n / last.
+        """
+        width = RESOLUTIONS[res]
+        out = self.rings[res].window(start, end, BUCKET_COLUMNS, width)
+        bucket = self.open[res]
+        if (bucket.start is not None and (start is None or bucket.start + width > start)
+                and (end is None or bucket.start < end)):
+            for name, value in (("t", bucket.start), ("min", bucket.min), ("max", bucket.max),
+                                ("mean", bucket.sum / bucket.n), ("n", bucket.n), ("last", bucket.last)):
+                out[name] = np.append(out[name], value)
+        return out
+
+    @property
+    def nbytes(self):
+        return self.raw.nbytes + sum(r.nbytes for r in self.rings.values())
+
+
+class TelemetryStore:
+    def __init__(self, raw_samples: int = 6000, seconds: int = 3600, minutes: int = 1440):
+        self.sizes = (raw_samples, seconds, minutes)
+        self.signals = {}
+        self.lock = threading.Lock()
+        self._unsubscribe = None
+
+    def _signal(self, name):
+        signal = self.signals.get(name)
+        if signal is None:
+            signal = self.signals[name] = Signal(name, *self.sizes)
+        return signal
+
+    def append(self, name: str, value: float, t: float = None):
+        """Records one sample (t defaults to now, wall-clock seconds)."""
+        t = time.time() if t is None else t
+        with self.lock:
+            self._signal(name).append(float(t), float(value))
+
+    def extend(self, name: str, times, values):
+        """Records a batch of samples in time order."""
+        with self.lock:
+            signal = self._signal(name)
+            for t, v in zip(np.asarray(times, dtype=np.float64).tolist(),
+                            np.asarray(values, dtype=np.float64).tolist()):
+                signal.append(t, v)
+
+    def names(self):
+        with self.lock:
+            return sorted(self.signals)
+
+    def latest(self, name: str):
+        """(t, value) of the newest sample, or None."""
+        with self.lock:
+            signal = self.signals.get(name)
+            return None if signal is None or signal.last_t is None else (signal.last_t, signal.last_v)
+
+    def query(self, name: str, start: float = None, end: float = None, resolution: str = "raw") -> dict:
+        """
+        Samples in [start, end). "raw" gives arrays t / v; "1s" and "1m" give
+        per-bucket t (bucket start) / min / max / mean / n / last for every
+        bucket that overlaps the window.
+        """
+        with self.lock:
+            signal = self.signals.get(name)
+            if signal is None:
+                raise KeyError(name)
+            if resolution == "raw":
+                return signal.raw.window(start, end, ("t", "v"))
+            if resolution not in RESOLUTIONS:
+                raise ValueError(f"unknown resolution {resolution}")
+            return signal.buckets(resolution, start, end)
+
+    def resolution_for(self, name: str, start: float = None) -> str:
+        """
+        The finest resolution whose history still reaches back to `start`, or
+        to the first sample if `start` is None.
+        """
+        with self.lock:
+            signal = self.signals.get(name)
+            if signal is None:
+                raise KeyError(name)
+            # A ring reaches back to `start` if nothing has been overwritten
+            # yet or its oldest row is no newer than `start`
+            for res, ring in (("raw", signal.raw), ("1s", signal.rings["1s"])):
+                if ring.count < ring.capacity or (start is not None and ring.oldest() <= start):
+                    return res
+            return "1m"
+
+    def aggregate(self, name: str, start: float = None, end: float = None) -> dict:
+        """
+        count / min / max / mean / last over [start, end) at the finest
+        resolution that covers it (widened to whole buckets at 1s / 1m).
+        """
+        resolution = self.resolution_for(name, start)
+        data = self.query(name, start, end, resolution)
+        if resolution == "raw":
+            values = data["v"]
+            if not len(values):
+                return {"count": 0, "resolution": resolution}
+            return {"count": int(len(values)), "min": float(values.min()), "max": float(values.max()),
+                    "mean": float(values.mean()), "last": float(values[-1]), "resolution": resolution}
+        n = data["n"]
+        if not len(n):
+            return {"count": 0, "resolution": resolution}
+        return {"count": int(n.sum()), "min": float(data["min"].min()), "max": float(data["max"].max()),
+                "mean": float((data["mean"] * n).sum() / n.sum()), "last": float(data["last"][-1]),
+                "resolution": resolution}
+
+    def memory_bytes(self) -> int:
+        with self.lock:
+            return sum(s.nbytes for s in self.signals.values())
+
+    def attach(self, state, fields=STATE_FIELDS):
+        """
+        Records every change of the given numeric / boolean CarState fields.
+        Leave out fields the vehicle bus drives: BusIngestor already records
+        every decoded sample of those under the bus signal's name.
+        """
+        fields = set(fields)
+
+        def on_change(diff, version):
+            now = time.time()
+            for field, (old, new) in diff.items():
+                if field in fields and isinstance(new, (int, float, bool)):
+                    self.append(field, float(new), now)
+
+        # Start every series from the current value
+        snapshot = state.snapshot()
+        for field in fields:
+            value = getattr(snapshot, field, None)
+            if isinstance(value, (int, float, bool)):
+                self.append(field, float(value))
+        self._unsubscribe = state.subscribe(on_change)
+
+    def detach(self):
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
@@ -0,0 +1,258 @@
+import math
+import re
+
+from . import actions
+from .car_state import CarState
+
+# Define available tools schema for context
+TOOLS_SCHEMA = [
+    {
+        "type": "function",
+        "function": {
+            "name": "set_ac",
+            "description": "Control the Air Conditioning",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "on": {"type": "string", "enum": ["on", "off"], "default": "on"},
+                    "temperature": {"type": "integer", "description": "Target temperature in Celsius"}
+                },
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "navigate_to",
+            "description": "Set navigation destination",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "destination": {"type": "string", "description": "The destination address or name"}
+                },
+                "required": ["destination"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "stop_navigation",
+            "description": "Cancel the active navigation",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "toggle_lights",
+            "description": "Turn headlights on or off",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "on": {"type": "string", "enum": ["on", "off"]}
+                },
+                "required": ["on"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "toggle_wipers",
+            "description": "Turn wipers on or off",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "on": {"type": "string", "enum": ["on", "off"]}
+                },
+                "required": ["on"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "control_window",
+            "description": "Open or close the windows",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "window": {"type": "string", "enum": ["driver", "passenger", "all"]},
+                    "action": {"type": "string", "enum": ["open", "close"]}
+                },
+                "required": ["action"]
+            }
+        }
+    }
+]
+
+# Short names used in SYSTEM_PROMPT (and a few the models like to invent)
+TOOL_ALIASES = {
+    "ac": "set_ac", "air_conditioning": "set_ac", "climate": "set_ac",
+    "nav": "navigate_to", "navigate": "navigate_to", "navigation": "navigate_to",
+    "stop_nav": "stop_navigation", "cancel_navigation": "stop_navigation",
+    "lights": "toggle_lights", "headlights": "toggle_lights",
+    "wipers": "toggle_wipers",
+    "window": "control_window", "windows": "control_window",
+}
+
+# Argument names models use instead of the schema ones
+ARG_ALIASES = {
+    "temp": "temperature",
+    "state": "on",
+    "dest": "destination",
+    "location": "destination",
+}
+
+# Values accepted for enums beyond the exact schema strings
+ENUM_SYNONYMS = {
+    "on": ("true", "1", "yes", "enable", "enabled", "start"),
+    "off": ("false", "0", "no", "disable", "disabled", "stop"),
+    "open": ("opened", "down", "lower"),
+    "close": ("closed", "shut", "up", "raise"),
+    "all": ("both",),
+}
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class ToolCallError(ValueError):
+    """Raised when a tool call doesn't match its schema."""
+
+
+class UnknownToolError(ToolCallError):
+    """Raised when the model asks for a tool that doesn't exist."""
+
+
+def _string_coercer(name, spec):
+    enum = spec.get("enum")
+    if not enum:
+        def coerce(value):
+            if not isinstance(value, (str, int, float)) or isinstance(value, bool) or not str(value).strip():
+                raise ToolCallError(f"'{name}' must be a non-empty string")
+            return str(value).strip()
+        return coerce
+
+    lookup = {}
+    for option in enum:
+        lookup[option.lower()] = option
+        for synonym in ENUM_SYNONYMS.get(option, ()):
+            lookup.setdefault(synonym, option)
+
+    def coerce(value):
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        option = lookup.get(str(value).strip().lower())
+        if option is None:
+            raise ToolCallError(f"'{name}' must be one of {enum}, got {value!r}")
+        return option
+    return coerce
+
+
+def _number_coercer(name, spec):
+    cast = int if spec["type"] == "integer" else float
+
+    def coerce(value):
+        if isinstance(value, bool):
+            raise ToolCallError(f"'{name}' must be a number")
+        if isinstance(value, (int, float)):
+            number = float(value)
+        else:
+            match = _NUMBER.search(str(value))  # "22", "22°C", "22 degrees"
+            if not match:
+                raise ToolCallError(f"'{name}' must be a number, got {value!r}")
+            number = float(match.group())
+        # json.loads accepts NaN / Infinity, and "1e400" overflows to inf
+        if not math.isfinite(number):
+            raise ToolCallError(f"'{name}' must be a finite number, got {value!r}")
+        return int(round(number)) if cast is int else number
+    return coerce
+
+
+def _boolean_coercer(name, spec):
+    truthy = {"true", "1", "yes", "on"}
+    falsy = {"false", "0", "no", "off"}
+
+    def coerce(value):
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in truthy:
+            return True
+        if text in falsy:
+            return False
+        raise ToolCallError(f"'{name}' must be true or false, got {value!r}")
+    return coerce
+
+
+_COERCERS = {
+    "string": _string_coercer,
+    "integer": _number_coercer,
+    "number": _number_coercer,
+    "boolean": _boolean_coercer,
+}
+
+
+class Tool:
+    """A callable action with its argument validator compiled from the schema."""
+
+    def __init__(self, schema: dict):
+        function = schema["function"]
+        self.name = function["name"]
+        self.func = getattr(actions, self.name)
+        parameters = function.get("parameters", {})
+        self.required = tuple(parameters.get("required", ()))
+        self.defaults = {arg: spec["default"] for arg, spec in parameters.get("properties", {}).items()
+                         if "default" in spec}
+        self.coercers = {
+            arg: _COERCERS[spec["type"]](arg, spec)
+            for arg, spec in parameters.get("properties", {}).items()
+        }
+
+    def validate(self, args) -> dict:
+        """Returns cleaned arguments or raises ToolCallError."""
+        if args is None:
+            args = {}
+        if not isinstance(args, dict):
+            raise ToolCallError(f"{self.name}: arguments must be an object")
+        clean = {}
+        for key, value in args.items():
+            key = ARG_ALIASES.get(key, key)
+            coerce = self.coercers.get(key)
+            if coerce is None or value is None:
+                continue  # unknown or empty arguments are dropped
+            clean[key] = coerce(value)
+        for key, value in self.defaults.items():
+            clean.setdefault(key, value)
+        missing = [arg for arg in self.required if arg not in clean]
+        if missing:
+            raise ToolCallError(f"{self.name}: missing {', '.join(missing)}")
+        return clean
+
+    def __call__(self, state: CarState, args) -> str:
+        return self.func(state, **self.validate(args))
+
+
+TOOLS = {schema["function"]["name"]: Tool(schema) for schema in TOOLS_SCHEMA}
+
+_LOOKUP = dict(TOOL_ALIASES)
+_LOOKUP.update({name: name for name in TOOLS})
+
+
+def resolve(tool_name) -> Tool:
+    """Finds a tool by schema name or alias, or raises ToolCallError."""
+    tool = TOOLS.get(_LOOKUP.get(str(tool_name).strip().lower(), ""))
+    if tool is None:
+        raise UnknownToolError(f"Unknown tool: {tool_name}")
+    return tool
+
+
+def dispatch(tool_name, tool_args, state: CarState) -> str:
+    """Validates a tool call and runs it against the car state."""
+    return resolve(tool_name)(state, tool_args)
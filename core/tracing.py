@@ -0,0 +1,201 @@
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from . import config
+from . import metrics
+
+# Per-interaction latency tracing.
+# Every command (spoken or typed) gets a Trace with an ID. Stages record
+# monotonic start/end times as spans: wake, listen, endpoint, stt, queue,
+# intent, cache, llm, action. Point-in-time events (first_token,
+# first_action, first_audio) are recorded as offsets from the trace start.
+# Finished traces are written one JSON object per line to a rotating file.
+# Every span also feeds metrics.observe("trace.<stage>"), so stage_stats()
+# gives rolling per-stage percentiles while the app is running.
+#
+# Code deep in the pipeline doesn't take a trace argument: the scheduler
+# activates the job's trace on its worker thread and span()/event()/annotate()
+# use whatever trace is active (and do nothing if there isn't one).
+#
+# A trace is written once its owner called end() and every hold() was
+# released; the TTS worker holds it until the reply's audio is done.
+
+_ids = itertools.count(1)
+_local = threading.local()
+_stages = set()
+_stages_lock = threading.Lock()
+_logger = None
+_logger_lock = threading.Lock()
+_listeners = []
+
+
+def _get_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger("carai.trace")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            if config.TRACE_ENABLED and config.TRACE_PATH:
+                try:
+                    os.makedirs(os.path.dirname(config.TRACE_PATH) or ".", exist_ok=True)
+                    handler = RotatingFileHandler(config.TRACE_PATH, maxBytes=config.TRACE_MAX_BYTES,
+                                                  backupCount=config.TRACE_BACKUPS, encoding="utf-8")
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    logger.addHandler(handler)
+                except OSError as e:
+                    print(f"Trace log disabled: {e}")
+            _logger = logger
+        return _logger
+
+
+def _observe(stage, seconds):
+    with _stages_lock:
+        _stages.add(stage)
+    metrics.observe(f"trace.{stage}", seconds)
+
+
+class Trace:
+    def __init__(self, source: str, started: float = None, **attrs):
+        now = time.monotonic()
+        self.id = f"{int(time.time()):x}-{next(_ids)}"
+        self.source = source
+        self.started = now if started is None else started  # may be backdated
+        self.wall = time.time() - (now - self.started)
+        self.spans = []      # (stage, start offset, duration)
+        self.events = {}     # name -> offset (first occurrence)
+        self.attrs = dict(attrs)
+        self.lock = threading.Lock()
+        self.holds = 0
+        self.ended = False
+        self.written = False
+
+    def add_span(self, stage: str, start: float, end: float = None):
+        """Records a stage from monotonic `start` to `end` (default: now)."""
+        end = time.monotonic() if end is None else end
+        with self.lock:
+            self.spans.append((stage, start - self.started, end - start))
+        _observe(stage, end - start)
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.monotonic()
+        try:
+            yield self
+        finally:
+            self.add_span(stage, start)
+
+    def event(self, name: str, at: float = None):
+        at = time.monotonic() if at is None else at
+        with self.lock:
+            if name in self.events:
+                return
+            self.events[name] = at - self.started
+        _observe(name, at - self.started)
+
+    def annotate(self, **attrs):
+        with self.lock:
+            self.attrs.update(attrs)
+
+    def hold(self):
+        with self.lock:
+            self.holds += 1
+
+    def release(self):
+        with self.lock:
+            self.holds -= 1
+        self._maybe_write()
+
+    def end(self, **attrs):
+        """The owner is done with the trace (it may still be held by TTS)."""
+        with self.lock:
+            self.attrs.update(attrs)
+            self.ended = True
+        self._maybe_write()
+
+    def _maybe_write(self):
+        with self.lock:
+            if self.written or not self.ended or self.holds > 0:
+                return
+            self.written = True
+            total = time.monotonic() - self.started
+            record = {
+                "id": self.id,
+                "source": self.source,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.wall)),
+                "total_ms": round(total * 1000, 1),
+                "spans": [{"stage": s, "start_ms": round(o * 1000, 1), "ms": round(d * 1000, 1)}
+                          for s, o, d in self.spans],
+                "events": {k: round(v * 1000, 1) for k, v in self.events.items()},
+            }
+            record.update(self.attrs)
+        _observe("total", total)
+        _get_logger().info(json.dumps(record))
+        for fn in list(_listeners):
+            fn(record)
+
+
+def add_listener(fn):
+    """Calls fn(record) with every finished trace (e.g. to collect them in a benchmark)."""
+    _listeners.append(fn)
+
+
+def remove_listener(fn):
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+def start(source: str, started: float = None, **attrs) -> Trace:
+    """New trace; `started` (time.monotonic()) backdates it, e.g. to the end of the wake word."""
+    return Trace(source, started, **attrs)
+
+
+def current():
+    """The trace active on this thread, or None."""
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def activate(trace: Trace):
+    previous = current()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def span(stage: str):
+    """Span on the active trace; a no-op without one."""
+    trace = current()
+    if trace is None:
+        yield None
+        return
+    with trace.span(stage):
+        yield trace
+
+
+def event(name: str):
+    trace = current()
+    if trace is not None:
+        trace.event(name)
+
+
+def annotate(**attrs):
+    trace = current()
+    if trace is not None:
+        trace.annotate(**attrs)
+
+
+def stage_stats() -> dict:
+    """Rolling percentiles (seconds) for every stage and event seen so far."""
+    with _stages_lock:
+        stages = sorted(_stages)
+    return {stage: metrics.summary(f"trace.{stage}") for stage in stages}
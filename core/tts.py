@@ -0,0 +1,253 @@
+import queue
+import threading
+import time
+from collections import deque
+
+from . import metrics
+from .phrase_cache import split_sentences
+
+# Text-to-speech on one long-lived thread.
+# pyttsx3 engines are not thread-safe and are slow to create, so a single
+# worker creates the engine once and is the only thread that ever touches it.
+# Other threads queue sentences with say() and interrupt with cancel().
+# The engine runs its own event loop in non-blocking mode (startLoop(False) +
+# iterate()), which lets the worker notice a cancel between audio callbacks
+# instead of being stuck inside runAndWait() until the sentence ends.
+# With a PhraseCache, fixed replies are played from pre-rendered audio and the
+# worker renders any missing ones with save_to_file() while it is idle.
+#
+# The worker also keeps the recent playback windows (played_near()) so the
+# wake-word loop can ignore detections of the assistant's own voice, and
+# hands pre-rendered audio to an optional PlaybackReference for echo
+# cancellation (core/echo_cancel.py).
+
+RATE = 170  # words per minute
+
+
+class _Item:
+    __slots__ = ("text", "turn_started", "generation", "trace")
+
+    def __init__(self, text, turn_started, generation, trace=None):
+        self.text = text
+        self.turn_started = turn_started
+        self.generation = generation
+        self.trace = trace
+        if trace is not None:
+            trace.hold()  # the trace is written once its audio is done
+
+    def done(self):
+        if self.trace is not None:
+            self.trace.release()
+            self.trace = None
+
+
+class TTSWorker:
+    def __init__(self, state=None, on_error=None, rate: int = RATE, phrase_cache=None, reference=None):
+        self.state = state            # CarState; ai_talking mirrors playback
+        self.on_error = on_error      # called with the exception text
+        self.rate = rate
+        self.phrase_cache = phrase_cache
+        self.reference = reference    # PlaybackReference fed with cached audio
+        self.to_render = []
+        self.queue = queue.Queue()
+        self.generation = 0           # bumped by cancel(); older items are dropped
+        self.lock = threading.Lock()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.running = False
+        self.thread = None
+        self.current = None
+        self._reported_turn = None
+        self.windows = deque(maxlen=8)  # [start, end] monotonic; end is None while talking
+
+    def start(self):
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.cancel()
+        self.queue.put(None)
+
+    def say(self, text: str, turn_started: float = None, trace=None):
+        """
+        Queues a sentence. `turn_started` (time.monotonic()) is when the command
+        began; the first sentence of a turn records tts.time_to_first_audio
+        (and a first_audio event on `trace`).
+        """
+        if not self.running or not text or not text.strip():
+            return
+        # Split so the fixed parts of "AC turned on at 20°C. Headlights on." can
+        # come from the phrase cache
+        pieces = split_sentences(text) if self.phrase_cache else [text]
+        with self.lock:
+            self.idle.clear()
+            self._set_talking(True)
+            for piece in pieces:
+                self.queue.put(_Item(piece, turn_started, self.generation, trace))
+
+    def cancel(self):
+        """Barge-in: drops everything queued and stops the current sentence."""
+        with self.lock:
+            self.generation += 1
+        self._drain()
+        metrics.incr("tts.cancelled")
+
+    def _drain(self):
+        try:
+            while True:
+                item = self.queue.get_nowait()
+                if item is not None:
+                    item.done()
+        except queue.Empty:
+            pass
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        return self.idle.wait(timeout)
+
+    @property
+    def busy(self) -> bool:
+        return not self.idle.is_set()
+
+    def played_near(self, at: float, tail: float = 0.0) -> bool:
+        """True if speech was (or may have been) playing at monotonic time `at`, or ended less than `tail` before it."""
+        with self.lock:
+            windows = list(self.windows)
+        for start, end in windows:
+            if start <= at and (end is None or at <= end + tail):
+                return True
+        return False
+
+    def _set_talking(self, talking):
+        # Called with self.lock held
+        if talking and (not self.windows or self.windows[-1][1] is not None):
+            self.windows.append([time.monotonic(), None])
+        elif not talking and self.windows and self.windows[-1][1] is None:
+            self.windows[-1][1] = time.monotonic()
+        if self.state is not None:
+            self.state.ai_talking = talking
+
+    def _run(self):
+        try:
+            import pyttsx3
+            engine = pyttsx3.init()
+            engine.setProperty('rate', self.rate)
+            engine.connect('started-utterance', self._on_started)
+            engine.startLoop(False)
+        except Exception as e:
+            self._fail(e)
+            return
+        if self.phrase_cache:
+            self.to_render = self.phrase_cache.missing()
+
+        while self.running:
+            if self.current is None:
+                try:
+                    item = self.queue.get(timeout=0.1)
+                except queue.Empty:
+                    self._check_idle(engine)
+                    if self.to_render:
+                        self._render(engine, self.to_render.pop())
+                    continue
+                if item is None:
+                    break
+                if item.generation != self.generation:
+                    item.done()
+                    continue  # cancelled while queued
+                audio = self._cached(item.text)
+                if audio is not None and self._play(item, *audio):
+                    item.done()
+                    continue
+                self.current = item
+                engine.say(item.text)
+
+            try:
+                engine.iterate()
+                if self.current.generation != self.generation:
+                    engine.stop()
+                    self._finish_current()
+                elif not engine.isBusy():
+                    self._finish_current()
+                else:
+                    time.sleep(0.01)
+            except Exception as e:
+                print(f"TTS Error: {e}")
+                self._finish_current()
+
+        try:
+            engine.endLoop()
+        except Exception:
+            pass
+
+    def _cached(self, text):
+        if self.phrase_cache is None or not self.phrase_cache.is_fixed(text):
+            return None
+        audio = self.phrase_cache.get(text)
+        metrics.incr("tts.phrase_hit" if audio is not None else "tts.phrase_miss")
+        return audio
+
+    def _play(self, item, samples, rate):
+        """Plays pre-rendered audio, stopping early on cancel(). False if it couldn't play."""
+        try:
+            import sounddevice as sd
+            sd.play(samples, rate)
+        except Exception as e:
+            print(f"TTS playback error: {e}")
+            return False
+        if self.reference is not None:
+            self.reference.start(samples, rate)
+        self._first_audio(item)
+        end = time.monotonic() + len(samples) / rate
+        while time.monotonic() < end:
+            if item.generation != self.generation:
+                sd.stop()
+                if self.reference is not None:
+                    self.reference.stop()
+                break
+            time.sleep(0.01)
+        return True
+
+    def _render(self, engine, text):
+        """Synthesizes a fixed phrase to the cache. Only called while idle."""
+        try:
+            engine.save_to_file(text, self.phrase_cache.path(text))
+            engine.iterate()
+            while engine.isBusy():
+                engine.iterate()
+                time.sleep(0.01)
+            self.phrase_cache.added(text)
+        except Exception as e:
+            print(f"Phrase render failed for '{text}': {e}")
+
+    def _finish_current(self):
+        self.current.done()
+        self.current = None
+
+    def _on_started(self, name):
+        if self.current is not None:
+            self._first_audio(self.current)
+
+    def _first_audio(self, item):
+        if item.trace is not None:
+            item.trace.event("first_audio")
+        if item.turn_started is not None and item.turn_started != self._reported_turn:
+            self._reported_turn = item.turn_started
+            metrics.observe("tts.time_to_first_audio", time.monotonic() - item.turn_started)
+
+    def _check_idle(self, engine):
+        with self.lock:
+            if self.queue.empty() and not engine.isBusy() and not self.idle.is_set():
+                self._set_talking(False)
+                self.idle.set()
+
+    def _fail(self, e):
+        print(f"TTS Error: {e}")
+        self.running = False
+        self._drain()
+        with self.lock:
+            self._set_talking(False)
+        self.idle.set()
+        if self.on_error:
+            self.on_error(str(e))
@@ -0,0 +1,146 @@
+import numpy as np
+
+# Frame-based voice activity detection and endpointing for 16 kHz int16 audio.
+# Features are computed for a whole block of frames at once with NumPy:
+#   - energy (dB) against an adaptive noise floor
+#   - spectral flatness (noise is flat, voiced speech is peaky)
+#   - share of energy in the 300-3400 Hz speech band
+# A small state machine adds onset confirmation and hangover so single noisy
+# frames don't start an utterance and short pauses between words don't end it.
+
+EPS = 1e-10
+
+
+def frame_features(frames: np.ndarray, rate: int):
+    """
+    frames: (n, frame_len) int16/float array.
+    Returns (energy_db, flatness, speech_band_ratio), each of shape (n,).
+    """
+    x = frames.astype(np.float32)
+    energy_db = 10.0 * np.log10(np.mean(x * x, axis=1) + EPS)
+
+    window = np.hanning(x.shape[1]).astype(np.float32)
+    spectrum = np.abs(np.fft.rfft(x * window, axis=1)) ** 2 + EPS
+    flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+
+    freqs = np.fft.rfftfreq(x.shape[1], 1.0 / rate)
+    band = (freqs >= 300) & (freqs <= 3400)
+    band_ratio = spectrum[:, band].sum(axis=1) / spectrum.sum(axis=1)
+    return energy_db, flatness, band_ratio
+
+
+class VoiceActivityDetector:
+    def __init__(self, rate: int = 16000, frame_ms: int = 20, energy_margin_db: float = 9.0,
+                 max_flatness: float = 0.45, min_band_ratio: float = 0.5,
+                 onset_ms: int = 60, hangover_ms: int = 300, noise_db: float = None):
+        self.rate = rate
+        self.frame = int(rate * frame_ms / 1000)
+        self.energy_margin_db = energy_margin_db
+        self.max_flatness = max_flatness
+        self.min_band_ratio = min_band_ratio
+        self.onset_frames = max(1, onset_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.noise_db = noise_db
+        self.pending = np.zeros(0, dtype=np.int16)
+        self.in_speech = False
+        self.run = 0        # consecutive speech frames while waiting for onset
+        self.hangover = 0   # frames left before a pause ends the speech
+
+    def raw_decisions(self, frames: np.ndarray) -> np.ndarray:
+        """Per-frame speech/non-speech before smoothing; also adapts the noise floor."""
+        energy_db, flatness, band_ratio = frame_features(frames, self.rate)
+        if self.noise_db is None:
+            self.noise_db = float(np.percentile(energy_db, 10))
+
+        loud = energy_db > self.noise_db + self.energy_margin_db
+        decisions = loud & ((flatness < self.max_flatness) | (band_ratio > self.min_band_ratio))
+
+        # The floor is held for the whole block and then moved towards the
+        # non-speech frames in it: fast when they are quieter, slowly when louder
+        background = energy_db[~decisions]
+        if len(background):
+            level = float(np.mean(background))
+            rate = 0.5 if level < self.noise_db else 0.05
+            self.noise_db += (level - self.noise_db) * rate
+        return decisions
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Feeds samples (any length) and returns the smoothed decision for every
+        complete frame they finish. Leftover samples are kept for the next call.
+        """
+        samples = np.concatenate((self.pending, np.asarray(samples, dtype=np.int16).reshape(-1)))
+        n = len(samples) // self.frame
+        self.pending = samples[n * self.frame:]
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+
+        raw = self.raw_decisions(samples[:n * self.frame].reshape(n, self.frame))
+        smoothed = np.empty(n, dtype=bool)
+        for i, speech in enumerate(raw):
+            if self.in_speech:
+                if speech:
+                    self.hangover = self.hangover_frames
+                else:
+                    self.hangover -= 1
+                    if self.hangover <= 0:
+                        self.in_speech = False
+            else:
+                self.run = self.run + 1 if speech else 0
+                if self.run >= self.onset_frames:
+                    self.in_speech = True
+                    self.hangover = self.hangover_frames
+            smoothed[i] = self.in_speech
+        return smoothed
+
+    def reset(self):
+        self.pending = np.zeros(0, dtype=np.int16)
+        self.in_speech = False
+        self.run = self.hangover = 0
+
+
+class Endpointer:
+    """
+    Decides when a spoken command is over.
+    feed() returns None while listening, or one of:
+      "end"     - speech started and then stopped for the hangover period
+      "timeout" - no speech within no_speech_timeout seconds
+      "limit"   - speech ran for max_seconds
+    speech_start / speech_end are sample offsets from the first sample fed.
+    The first `skip_samples` (pre-roll kept only for the transcriber, which
+    may hold the end of the wake word) are not looked at, so they can't start
+    the utterance; the timeouts count from after them.
+    """
+
+    def __init__(self, vad: VoiceActivityDetector, no_speech_timeout: float = 5.0, max_seconds: float = 8.0,
+                 skip_samples: int = 0):
+        self.vad = vad
+        self.no_speech_frames = int(no_speech_timeout * 1000 / (vad.frame * 1000 / vad.rate))
+        self.max_frames = int(max_seconds * 1000 / (vad.frame * 1000 / vad.rate))
+        self.skip_samples = skip_samples
+        self._to_skip = skip_samples
+        self.frames = 0
+        self.speech_start = None
+        self.speech_end = None
+
+    def feed(self, samples: np.ndarray):
+        if self._to_skip:
+            samples = np.asarray(samples).reshape(-1)
+            n = min(self._to_skip, len(samples))
+            self._to_skip -= n
+            samples = samples[n:]
+        offset = self.skip_samples
+        for speech in self.vad.process(samples):
+            self.frames += 1
+            if speech and self.speech_start is None:
+                # Onset is confirmed a few frames late; start from the first of them
+                self.speech_start = offset + max(0, self.frames - self.vad.onset_frames) * self.vad.frame
+            elif not speech and self.speech_start is not None:
+                self.speech_end = offset + self.frames * self.vad.frame
+                return "end"
+            if self.speech_start is None and self.frames >= self.no_speech_frames:
+                return "timeout"
+            if self.frames >= self.max_frames:
+                self.speech_end = offset + self.frames * self.vad.frame
+                return "limit"
+        return None
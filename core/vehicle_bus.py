@@ -0,0 +1,343 @@
+import json
+import re
+import socket
+import threading
+import time
+
+import numpy as np
+
+from . import metrics
+
+# Vehicle signal ingestion from CAN-style frames.
+#
+# A source hands over frames in batches as a NumPy structured array (FRAME:
+# timestamp, id, dlc, 8 data bytes), so decoding never loops over frames in
+# Python. Sources:
+#   LogFileSource  candump-style log ("(1436509052.249713) can0 1A0#10270000"),
+#                  replayed at recorded speed or as fast as possible
+#   UdpSource      local socket stand-in for the bus: each datagram carries
+#                  packed FRAME records (send_frames() writes them)
+# The signal database is declarative (BusSignal entries, or a JSON file with
+# the same fields). decode() groups a batch by frame id and pulls each
+# signal out of the 64-bit payload with one shift/mask over the whole group,
+# skipping frames whose DLC is too short to carry the signal.
+#
+# BusIngestor runs the source on its own thread. Every decoded sample goes
+# into the telemetry store; CarState only gets the latest values at
+# `publish_hz`, in one update() per tick, so the dashboard sees a handful
+# of redraws a second however fast the bus is.
+
+FRAME = np.dtype([("t", "<f8"), ("id", "<u4"), ("dlc", "u1"), ("data", "u1", (8,))])
+
+
+class BusSignal:
+    def __init__(self, name: str, frame_id: int, start: int, length: int, scale: float = 1.0,
+                 offset: float = 0.0, signed: bool = False, byte_order: str = "little",
+                 state_field: str = None, digits: int = 0):
+        """
+        `start` is the bit position of the signal's least significant bit in
+        the payload read as a 64-bit integer of the given byte order (for
+        "little", bit 0 is the low bit of byte 0). `state_field` is the
+        CarState field it drives, rounded to `digits`.
+        """
+        self.name = name
+        self.frame_id = frame_id
+        self.start = start
+        self.length = length
+        self.scale = scale
+        self.offset = offset
+        self.signed = signed
+        self.byte_order = byte_order
+        self.state_field = state_field
+        self.digits = digits
+        # Payload bytes a frame needs to carry the whole signal
+        if byte_order == "big":
+            self.min_dlc = 8 - start // 8
+        else:
+            self.min_dlc = (start + length + 7) // 8
+
+
+# Default database for the demo car
+SIGNALS = [
+    BusSignal("vehicle_speed", 0x1A0, 0, 16, scale=0.01, state_field="speed"),       # km/h
+    BusSignal("engine_rpm", 0x1A0, 16, 16, scale=0.25),
+    BusSignal("fuel_level", 0x2F0, 0, 8, scale=0.4, state_field="fuel"),             # %
+    BusSignal("cabin_temp", 0x3C0, 0, 8, scale=0.5, offset=-40.0, digits=1),         # °C
+    BusSignal("outside_temp", 0x3C0, 8, 8, scale=0.5, offset=-40.0, digits=1),       # °C
+]
+
+
+def load_signal_db(path: str):
+    """Reads a JSON list of BusSignal fields (frame_id may be "0x1A0")."""
+    with open(path) as f:
+        entries = json.load(f)
+    signals = []
+    for entry in entries:
+        entry = dict(entry)
+        if isinstance(entry["frame_id"], str):
+            entry["frame_id"] = int(entry["frame_id"], 0)
+        signals.append(BusSignal(**entry))
+    return signals
+
+
+def decode(frames: np.ndarray, signals) -> dict:
+    """
+    Decodes a batch. Returns {signal name: (times, values)} for signals present
+    in it; frames too short for a signal (DLC) don't produce a sample for it.
+    """
+    out = {}
+    if not len(frames):
+        return out
+    payload_le = frames["data"].copy().view("<u8").reshape(-1)
+    payload_be = None
+    by_id = {}
+    for signal in signals:
+        by_id.setdefault(signal.frame_id, []).append(signal)
+    for frame_id, group in by_id.items():
+        rows = np.flatnonzero(frames["id"] == frame_id)
+        if not len(rows):
+            continue
+        dlc = frames["dlc"][rows]
+        for signal in group:
+            rows_ok = rows
+            short = dlc < signal.min_dlc
+            if short.any():
+                metrics.incr("bus.short_frames", int(short.sum()))
+                rows_ok = rows[~short]
+                if not len(rows_ok):
+                    continue
+            if signal.byte_order == "big":
+                if payload_be is None:
+                    payload_be = frames["data"].copy().view(">u8").reshape(-1)
+                raw = payload_be[rows_ok]
+            else:
+                raw = payload_le[rows_ok]
+            bits = (raw >> np.uint64(signal.start)) & np.uint64((1 << signal.length) - 1)
+            values = bits.astype(np.int64)
+            if signal.signed:
+                values = np.where(values >= 1 << (signal.length - 1), values - (1 << signal.length), values)
+            out[signal.name] = (frames["t"][rows_ok], values * signal.scale + signal.offset)
+    return out
+
+
+def _parse_log_line(line: str):
+    match = re.match(r"\s*\(([\d.]+)\)\s+\S+\s+([0-9A-Fa-f]+)#([0-9A-Fa-f]*)", line)
+    if not match:
+        return None
+    data = bytes.fromhex(match.group(3))[:8]
+    return float(match.group(1)), int(match.group(2), 16), len(data), data.ljust(8, b"\0")
+
+
+def read_log(path: str) -> np.ndarray:
+    """Loads a candump-style log into a FRAME array (unparseable lines are skipped)."""
+    rows = []
+    with open(path) as f:
+        for line in f:
+            parsed = _parse_log_line(line)
+            if parsed is not None:
+                rows.append(parsed)
+    frames = np.zeros(len(rows), dtype=FRAME)
+    if rows:
+        t, ids, dlc, data = zip(*rows)
+        frames["t"] = t
+        frames["id"] = ids
+        frames["dlc"] = dlc
+        frames["data"] = np.frombuffer(b"".join(data), dtype=np.uint8).reshape(-1, 8)
+    return frames
+
+
+def write_log(path: str, frames: np.ndarray, interface: str = "can0"):
+    with open(path, "w") as f:
+        for t, frame_id, dlc, data in zip(frames["t"], frames["id"], frames["dlc"], frames["data"]):
+            f.write(f"({t:.6f}) {interface} {int(frame_id):03X}#{bytes(data[:dlc]).hex().upper()}\n")
+
+
+class LogFileSource:
+    """Replays a log file; `realtime` keeps the recorded frame spacing (scaled by `speed`)."""
+
+    def __init__(self, path: str, realtime: bool = True, speed: float = 1.0, loop: bool = False,
+                 batch_seconds: float = 0.05, batch_frames: int = 4096):
+        self.frames = read_log(path)
+        self.realtime = realtime
+        self.speed = speed
+        self.loop = loop
+        self.batch_seconds = batch_seconds
+        self.batch_frames = batch_frames
+        self.index = 0
+        self.started = None
+        self.finished = threading.Event()
+
+    def read_batch(self, timeout: float = 0.1):
+        """The next batch of frames, an empty batch if none are due yet, or None at the end."""
+        frames = self.frames
+        if self.index >= len(frames):
+            if not self.loop or not len(frames):
+                self.finished.set()
+                return None
+            self.index = 0
+            self.started = None
+        if not self.realtime:
+            batch = frames[self.index:self.index + self.batch_frames]
+            self.index += len(batch)
+            return batch
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now - (frames["t"][self.index] - frames["t"][0]) / self.speed
+        due = frames["t"][0] + (now - self.started) * self.speed
+        end = int(np.searchsorted(frames["t"], due, side="right"))
+        if end <= self.index:
+            time.sleep(min(timeout, self.batch_seconds))
+            return frames[:0]
+        batch = frames[self.index:end]
+        self.index = end
+        return batch
+
+    def close(self):
+        pass
+
+
+class UdpSource:
+    """Frames from datagrams of packed FRAME records on a local UDP port."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 29536, max_frames: int = 4096):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+        self.max_frames = max_frames
+        self.finished = threading.Event()
+
+    def read_batch(self, timeout: float = 0.1):
+        self.sock.settimeout(timeout)
+        chunks = []
+        size = 0
+        try:
+            self._take(self.sock.recv(65536), chunks)
+            # Drain whatever else is already queued, up to one batch
+            self.sock.setblocking(False)
+            while size < self.max_frames * FRAME.itemsize:
+                size += self._take(self.sock.recv(65536), chunks)
+        except (BlockingIOError, socket.timeout):
+            pass
+        except OSError:
+            return None  # closed
+        return np.frombuffer(b"".join(chunks), dtype=FRAME)
+
+    @staticmethod
+    def _take(data, chunks):
+        # A datagram that isn't whole FRAME records is dropped on its own;
+        # joined in, it would shift every frame after it
+        if len(data) % FRAME.itemsize:
+            metrics.incr("bus.bad_datagrams")
+            return 0
+        chunks.append(data)
+        return len(data)
+
+    def close(self):
+        self.sock.close()
+
+
+def send_frames(sock, address, frames: np.ndarray, per_datagram: int = 256):
+    """Sends frames to a UdpSource (the stand-in for a real bus adapter)."""
+    frames = np.ascontiguousarray(frames, dtype=FRAME)
+    for i in range(0, len(frames), per_datagram):
+        sock.sendto(frames[i:i + per_datagram].tobytes(), address)
+
+
+def open_source(spec: str, realtime: bool = True):
+    """"log:path/to/file.log" or "udp:host:port"."""
+    kind, _, rest = spec.partition(":")
+    if kind == "log":
+        return LogFileSource(rest, realtime=realtime)
+    if kind == "udp":
+        host, _, port = rest.rpartition(":")
+        return UdpSource(host or "127.0.0.1", int(port))
+    raise ValueError(f"unknown bus source '{spec}'")
+
+
+class BusIngestor:
+    def __init__(self, source, state=None, telemetry=None, signals=None, publish_hz: float = 10.0):
+        self.source = source
+        self.state = state
+        self.telemetry = telemetry
+        self.signals = list(signals or SIGNALS)
+        self.publish_interval = 1.0 / publish_hz if publish_hz else 0.0
+        self.latest = {}          # CarState field -> newest value not yet published
+        self.last_publish = 0.0
+        self.frames = 0
+        self.samples = 0
+        self.publishes = 0
+        self.busy = 0.0           # seconds spent decoding and storing
+        self.started = None
+        self.running = False
+        self.thread = None
+        self._fields = {s.name: s for s in self.signals if s.state_field}
+        self.state_fields = {s.state_field for s in self._fields.values()}  # CarState fields it drives
+
+    def start(self):
+        self.running = True
+        self.started = time.monotonic()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        self.source.close()
+
+    def _run(self):
+        while self.running:
+            try:
+                batch = self.source.read_batch()
+            except Exception as e:
+                print(f"Bus source error: {e}")
+                time.sleep(0.5)
+                continue
+            if batch is None:
+                break
+            if len(batch):
+                self.process(batch)
+            self._maybe_publish()
+        self._maybe_publish(force=True)
+
+    def process(self, batch):
+        """Decodes one batch into the telemetry store and the pending CarState values."""
+        started = time.perf_counter()
+        decoded = decode(batch, self.signals)
+        for name, (times, values) in decoded.items():
+            if self.telemetry is not None:
+                self.telemetry.extend(name, times, values)
+            signal = self._fields.get(name)
+            if signal is not None:
+                value = round(float(values[-1]), signal.digits)
+                self.latest[signal.state_field] = int(value) if signal.digits == 0 else value
+            self.samples += len(values)
+        self.frames += len(batch)
+        took = time.perf_counter() - started
+        self.busy += took
+        metrics.incr("bus.frames", len(batch))
+        metrics.observe("bus.batch", took)
+
+    def _maybe_publish(self, force=False):
+        now = time.monotonic()
+        if not self.latest or self.state is None:
+            return
+        if not force and now - self.last_publish < self.publish_interval:
+            return
+        latest, self.latest = self.latest, {}
+        self.state.update(**latest)  # one diff (at most one redraw) per tick
+        self.last_publish = now
+        self.publishes += 1
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return {
+            "frames": self.frames,
+            "samples": self.samples,
+            "publishes": self.publishes,
+            "frames_per_second": self.frames / elapsed if elapsed else 0.0,
+            "cpu_share": self.busy / elapsed if elapsed else 0.0,
+            "batch": metrics.summary("bus.batch"),
+        }
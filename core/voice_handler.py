@@ -1,163 +1,337 @@
 
+import importlib.util
 import threading
 import time
-import speech_recognition as sr
-import pyttsx3
-import sounddevice as sd
 
-import sounddevice as sd
 import numpy as np
 
-
-
-try:
-    import onnxruntime 
-    import openwakeword
-    from openwakeword.model import Model
-    OWW_AVAILABLE = True
-except ImportError as e:
-    OWW_AVAILABLE = False
-    print(f"OpenWakeWord import failed: {e}")
-except Exception as e:
-    OWW_AVAILABLE = False
-    print(f"OpenWakeWord general error: {e}")
-
+# The audio and ML stacks (sounddevice, pyttsx3, vosk, onnxruntime,
+# openwakeword) are imported on the voice thread after the dashboard is up,
+# not here; see _preload().
 
 from PyQt6.QtCore import pyqtSignal, QObject
 from . import config
 # Using Ollama exclusively
 from . import ollama_handler as ai_handler
 from .car_state import CarState
+from .scheduler import CommandScheduler
+from .audio_capture import AudioCapture
+from . import metrics
+from . import wakeword
+from . import startup
+from . import tracing
+from .vad import VoiceActivityDetector, Endpointer
+from . import stt
+from .tts import TTSWorker, RATE as TTS_RATE
+from .phrase_cache import PhraseCache
+from .echo_cancel import EchoCanceller, PlaybackReference
+
+CHUNK_SIZE = 1280
+RATE = 16000
 
 class VoiceHandler(QObject):
     voice_status = pyqtSignal(str)
 
-    def __init__(self, state: CarState):
+    def __init__(self, state: CarState, audio_source=None, speech: bool = True):
         super().__init__()
         self.state = state
+        # None means the microphone; a WavReplaySource drives the same
+        # pipeline from recordings (benchmarks/replay_pipeline.py)
+        self.audio_source = audio_source
+        self.speech = speech
         self.running = False
-        self.oww_model = None
+        self.detector = None
+        self.capture = None
+        self.listen_requested = threading.Event()
         self.AUDIO_AVAILABLE = False
-        
-        try:
-            self.recognizer = sr.Recognizer()
-
-            self.recognizer = sr.Recognizer()
-            # TTS engine initialized on demand in speak()
-            self.AUDIO_AVAILABLE = True
-            self.mic_lock = threading.Lock()
-            self.is_processing = False
-        except Exception as e:
-            print(f"Audio Init Failed: {e}")
-            self.AUDIO_AVAILABLE = False
+        # All commands (typed or spoken) run on a fixed worker pool
+        self.scheduler = CommandScheduler(self._process_text_logic,
+                                          workers=config.COMMAND_WORKERS,
+                                          max_queue=config.COMMAND_QUEUE_SIZE)
+        # One TTS thread owns the speech engine; sentences are queued to it
+        phrases = None
+        if config.PHRASE_CACHE_ENABLED:
+            try:
+                phrases = PhraseCache(config.PHRASE_CACHE_DIR, config.PHRASE_CACHE_MAX_MB * 1024 * 1024,
+                                      voice_key=f"rate={TTS_RATE}")
+            except OSError as e:
+                print(f"Phrase cache disabled: {e}")
+        # What the speakers play, for echo cancellation (pre-rendered replies only)
+        self.reference = PlaybackReference(RATE) if config.ECHO_CANCEL_ENABLED else None
+        self.tts = TTSWorker(state, on_error=lambda e: self.voice_status.emit(f"TTS Failed: {e}"),
+                             rate=TTS_RATE, phrase_cache=phrases, reference=self.reference)
+
+        # STT engine is loaded on the voice thread (the offline model takes a moment)
+        self.stt = None
+
+        self.mic_lock = threading.Lock()
+        self.is_processing = False
+        # The mic needs sounddevice. It is only imported on the voice thread
+        # (see _preload), so just check it is installed; replay doesn't need it.
+        self.AUDIO_AVAILABLE = audio_source is not None or importlib.util.find_spec("sounddevice") is not None
+        if not self.AUDIO_AVAILABLE:
+            print("Audio Init Failed: sounddevice is not installed")
 
     def start(self):
         """Starts the wake word detection loop in a separate thread."""
+        # Load the model now so the first command doesn't pay for it
+        ai_handler.warm_up()
+        self.scheduler.start()
+
         if self.AUDIO_AVAILABLE:
+            if self.speech:
+                self.tts.start()
             self.running = True
             threading.Thread(target=self._wake_word_loop, daemon=True).start()
         else:
             # Emit safely after a short delay to ensure UI is ready
             threading.Timer(1.0, lambda: self.voice_status.emit("Audio Unavailable. Text mode only.")).start()
+            startup.finish(config.STARTUP_REPORT_PATH)
 
     def stop(self):
         self.running = False
+        self.scheduler.stop()
+        self.tts.stop()
+        if self.detector is not None:
+            self.detector.close()
+        if self.capture is not None:
+            self.capture.stop()
+
+    def request_listen(self):
+        """Manual listen (UI button). Handled on the voice thread, never the GUI thread."""
+        self.listen_requested.set()
+
+
+    def _open_capture(self) -> bool:
+        """
+        Opens the single persistent mic stream, retrying with exponential
+        backoff until it works. Reopening keeps the same ring buffer, so
+        positions carry on where they left off.
+        """
+        delay = config.MIC_RETRY_INITIAL
+        if self.capture is None:
+            self.capture = AudioCapture(rate=RATE, block_size=CHUNK_SIZE,
+                                        buffer_seconds=config.AUDIO_BUFFER_SECONDS,
+                                        source=self.audio_source,
+                                        echo_canceller=EchoCanceller() if self.reference else None,
+                                        reference=self.reference,
+                                        echo_delay=config.ECHO_DELAY_MS / 1000)
+        while self.running:
+            try:
+                self.capture.start()
+                return True
+            except Exception as e:
+                self.capture.stop()
+                metrics.incr("audio.reopen_failures")
+                self.voice_status.emit(f"Mic Error: {e}. Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                delay = min(delay * 2, config.MIC_RETRY_MAX)
+        return False
+
+    def _self_triggered(self, position) -> bool:
+        """
+        True if the audio at `position` was captured while the assistant was
+        talking (or just after), i.e. the detection is probably its own voice.
+        Replies with a reference signal are echo-cancelled and not gated.
+        """
+        at = self.capture.time_at(position)
+        if not self.tts.played_near(at, config.WAKE_SUPPRESS_TAIL_MS / 1000):
+            return False
+        if self.reference is not None and self.reference.read(CHUNK_SIZE, at) is not None:
+            return False
+        return True
+
+    def _preload(self) -> bool:
+        """
+        Imports the heavy audio/ML packages off the GUI thread, timing each one.
+        Returns False if the mic stack can't be loaded (e.g. no PortAudio).
+        """
+        modules = ["vosk" if config.STT_ENGINE == "vosk" else "speech_recognition"]
+        if config.WAKEWORD_MODE == "inprocess":
+            modules += ["onnxruntime", "openwakeword"]
+        for name in modules:
+            startup.timed_import(name)
+        if self.audio_source is None and startup.timed_import("sounddevice") is None:
+            self.AUDIO_AVAILABLE = False
+            self.voice_status.emit("Audio Unavailable. Text mode only.")
+            return False
+        return True
 
-
-    def _wake_word_loop(self):
-        """Listens for 'hey jarvis' wake word."""
-        if not self.AUDIO_AVAILABLE or not OWW_AVAILABLE:
-            if not OWW_AVAILABLE: self.voice_status.emit("Wake Word feature unavailable.")
-            return
-        
+    def _load_wake_word(self) -> bool:
         try:
-            # Check if models need downloading/loading
-            openwakeword.utils.download_models(["hey_jarvis"])
-            self.oww_model = Model(wakeword_models=["hey_jarvis"], inference_framework="onnx")
+            self.detector = wakeword.create_detector(config.WAKEWORD_MODE, config.WAKEWORD_MODEL,
+                                                     config.WAKEWORD_THRESHOLD, config.WAKEWORD_THREADS)
+            return True
+        except ImportError:
+            self.voice_status.emit("Wake Word feature unavailable.")
+            return False
         except Exception as e:
             self.voice_status.emit(f"Error loading Wake Word: {e}")
-            return
+            return False
 
-        CHUNK_SIZE = 1280
-        RATE = 16000
-        
+    def _wake_word_loop(self):
+        """Listens for 'hey jarvis' wake word (and manual listen requests)."""
+        if not self._preload():
+            startup.finish(config.STARTUP_REPORT_PATH)
+            return
+        with startup.timed("wake word model"):
+            wake_word = self._load_wake_word()
+        with startup.timed("stt engine"):
+            self.stt = stt.create_engine(config.STT_ENGINE, config.VOSK_MODEL_PATH, RATE)
+        if not self._open_capture():
+            return
+        startup.finish(config.STARTUP_REPORT_PATH)
 
-        self.voice_status.emit("Say 'Hey Jarvis'...")
+        preroll = self.capture.seconds_to_samples(config.PREROLL_SECONDS)
+        cursor = self.capture.cursor()
+        if wake_word:
+            self.voice_status.emit("Say 'Hey Jarvis'...")
 
         while self.running:
-            self.oww_model.reset() # Reset model state before listening
             try:
-                # Open stream for wake word detection
-                try:
-                    with sd.InputStream(samplerate=RATE, blocksize=CHUNK_SIZE, channels=1, dtype='int16') as stream:
-                        while self.running:
-                            chunk, overflow = stream.read(CHUNK_SIZE)
-                            
-                            # Flatten if needed
-                            audio_data = np.frombuffer(chunk, dtype=np.int16)
-                            
-                            prediction = self.oww_model.predict(audio_data)
-                            
-                            if prediction["hey_jarvis"] > 0.5 and not self.is_processing:
-                                self.voice_status.emit("Wake Word Detected!")
-                                # Stop this stream loop to release mic for SpeechRecognition
-                                break
-                except Exception as e:
-                    self.voice_status.emit(f"Mic Error: {e}. Retrying...")
-                    time.sleep(5) # Wait before retrying
+                if self.listen_requested.is_set():
+                    self.listen_requested.clear()
+                    self.tts.cancel()
+                    self._handle_command(trace=tracing.start("voice", trigger="button"))
+                    cursor.seek(self.capture.position)
+                    continue
+
+                position = cursor.position
+                chunk = cursor.read(CHUNK_SIZE, timeout=0.5)
+                if chunk is None and not self.capture.active:
+                    # The stream died (mic unplugged, device reset): reopen it
+                    self.voice_status.emit("Mic stream stopped. Reconnecting...")
+                    self.capture.stop()
+                    if not self._open_capture():
+                        return
+                    cursor.seek(self.capture.position)
+                    if wake_word:
+                        self.detector.reset()
+                        self.voice_status.emit("Say 'Hey Jarvis'...")
                     continue
+                if chunk is None or not wake_word:
+                    continue
+
+                detections = self.detector.feed(chunk, position)
 
-                # Stream is closed here. 
-                if self.running:
-                    self._handle_command()
+                if detections and self._self_triggered(detections[0] + CHUNK_SIZE):
+                    metrics.incr("wakeword.suppressed")
+                    self.detector.reset()
+                    continue
+
+                if detections and not self.is_processing:
+                    self.tts.cancel()  # barge-in: stop talking as soon as we're addressed
+                    # The interaction starts when the wake word ended; "wake" is
+                    # how far behind the audio the detection came in
+                    lag = (self.capture.position - (detections[0] + CHUNK_SIZE)) / RATE
+                    trace = tracing.start("voice", started=time.monotonic() - lag, trigger="wake_word",
+                                          audio_position=detections[0] + CHUNK_SIZE)
+                    trace.add_span("wake", trace.started)
+                    self.voice_status.emit("Wake Word Detected!")
+                    # Command audio starts just before the detection so words
+                    # said straight after "Hey Jarvis" are kept; the endpointer
+                    # only listens from the detection on
+                    self._handle_command(start=detections[0] + CHUNK_SIZE - preroll, trace=trace)
+                    # No cooldown: detections of the reply itself are dropped
+                    # by _self_triggered(), so we're listening again straight away
+                    self.detector.reset()
+                    cursor.seek(self.capture.position)
                     self.voice_status.emit("Say 'Hey Jarvis'...")
-                    time.sleep(1.0) # Cooldown to prevent self-triggering
-            
+
             except Exception as e:
                 self.voice_status.emit(f"Voice Loop Error: {e}")
                 time.sleep(1)
 
-            # Check if we should listen (simulated trigger or handling logic)
-            if self.running and False: # force false for now
-                 self._handle_command()
-                 self.voice_status.emit("Say 'Hey Jarvis'...")
-
 
-    def _handle_command(self):
+    def _capture_utterance(self, start, trace=None):
+        """
+        Reads command audio from the ring buffer starting at `start` until the
+        VAD endpointer decides the speaker has finished. The first
+        PREROLL_SECONDS go to the STT engine only: they may hold the end of
+        the wake word, which must not count as the start of the command.
+        Every block is also fed to the STT engine as it arrives, and partial
+        transcripts are shown.
+        Returns int16 samples, or None if nothing was said before the timeout.
+        """
+        cursor = self.capture.cursor(start)
+        block = self.capture.seconds_to_samples(0.03)
+        # Seed the VAD with the cabin level the capture stream has been tracking
+        vad = VoiceActivityDetector(rate=RATE, frame_ms=config.VAD_FRAME_MS,
+                                    energy_margin_db=config.VAD_ENERGY_MARGIN_DB,
+                                    onset_ms=config.VAD_ONSET_MS,
+                                    hangover_ms=config.VAD_END_SILENCE_MS,
+                                    noise_db=20 * np.log10(max(self.capture.noise.level, 1.0)))
+        endpointer = Endpointer(vad, no_speech_timeout=config.LISTEN_TIMEOUT,
+                                max_seconds=config.PHRASE_TIME_LIMIT,
+                                skip_samples=self.capture.seconds_to_samples(config.PREROLL_SECONDS))
+
+        frames = []
+        status = None
+        self.stt.start()
+        while self.running and status is None:
+            chunk = cursor.read(block, timeout=1.0)
+            if chunk is None:
+                break  # stream stalled
+            frames.append(chunk)
+            status = endpointer.feed(chunk)
+            partial = self.stt.accept(chunk)
+            if partial:
+                self.voice_status.emit(f"You: {partial}...")
+
+        if endpointer.speech_start is None or status == "timeout":
+            return None
+        if trace is not None and endpointer.speech_end is not None:
+            # From the end of speech to the endpointer deciding it was the end
+            lag = (cursor.position - (start + endpointer.speech_end)) / RATE
+            now = time.monotonic()
+            trace.add_span("endpoint", now - lag, now)
+        audio = np.concatenate(frames)
+        end = endpointer.speech_end or len(audio)
+        return audio[:end]
+
+    def _handle_command(self, start=None, trace=None):
         """Listens for command and sends to AI."""
-        if not self.AUDIO_AVAILABLE: return
-        if self.is_processing: return # Guard against multiple calls
+        trace = trace or tracing.start("voice")
+        if not self.AUDIO_AVAILABLE or self.capture is None or self.stt is None:
+            trace.end(outcome="no_audio")
+            return
+        if self.is_processing: # Guard against multiple calls
+            trace.end(outcome="busy")
+            return
         
+        outcome = "error"
         with self.mic_lock:
             self.is_processing = True
             self.state.is_listening = True
             self.voice_status.emit("Listening...")
             
             try:
-                with sr.Microphone() as source:
-                    # Short ambient adjust
-                    self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                    try:
-                        audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=8)
-                    except sr.WaitTimeoutError:
-                        self.voice_status.emit("Timeout - didn't hear command.")
-                        self.is_processing = False
-                        return
-                    except Exception as e:
-                        self.voice_status.emit(f"Listen Error: {e}")
-                        self.is_processing = False
-                        return
+                if start is None:
+                    start = self.capture.position - self.capture.seconds_to_samples(config.PREROLL_SECONDS)
+                with trace.span("listen"):
+                    audio = self._capture_utterance(start, trace)
+                self.state.is_listening = False
+                if audio is None:
+                    self.stt.start()  # drop whatever was buffered without decoding it
+                    self.voice_status.emit("Timeout - didn't hear command.")
+                    outcome = "timeout"
+                    return
 
                 try:
-                    # STT
-                    text = self.recognizer.recognize_google(audio)
+                    # STT has been decoding during capture; this only flushes the end
+                    with trace.span("stt"):
+                        text = self.stt.finish()
+                    trace.annotate(stt=self.stt.name)
+                    if not text:
+                        self.voice_status.emit("Sorry, I didn't verify that.")
+                        self.speak("I didn't catch that.", trace=trace)
+                        outcome = "not_understood"
+                        return
                     self.voice_status.emit(f"You: {text}")
 
-                    self.process_text_command(text, blocking=True)
-                    
-                except sr.UnknownValueError:
-                    self.voice_status.emit("Sorry, I didn't verify that.")
-                    self.speak("I didn't catch that.")
+                    self.process_text_command(text, blocking=True, source="voice", trace=trace)
+                    outcome = None  # the scheduler owns (and has ended) the trace
+
                 except Exception as e:
                     self.voice_status.emit(f"Error: {e}")
                     print(f"Processing Error: {e}")
@@ -165,50 +339,50 @@ class VoiceHandler(QObject):
             except Exception as e:
                 self.voice_status.emit(f"Mic Error: {e}")
                 print(f"Mic Error: {e}")
-            
-
-            self.is_processing = False
-            self.state.is_listening = False
 
+            finally:
+                self.is_processing = False
+                self.state.is_listening = False
+                if outcome is not None:
+                    trace.end(outcome=outcome)
 
 
 
-    def speak(self, text):
-        if self.AUDIO_AVAILABLE:
-            try:
-                self.state.ai_talking = True
-                # Re-init engine locally to avoid threading/loop issues
-                engine = pyttsx3.init()
-                engine.setProperty('rate', 170)
-                engine.say(text)
-                engine.runAndWait()
-                # Clean deletion of engine if needed, though pyttsx3 usually handles it
-                del engine
-                self.state.ai_talking = False
-            except Exception as e:
-                self.state.ai_talking = False
-                print(f"TTS Error: {e}")
-                # Fallback print
-                self.voice_status.emit(f"TTS Failed: {e}")
 
+    def speak(self, text, turn_started=None, trace=None):
+        """Queues text on the TTS worker and returns straight away."""
+        if self.AUDIO_AVAILABLE and self.speech:
+            self.tts.say(text, turn_started, trace)
 
-
-    def process_text_command(self, text, blocking=False):
+    def process_text_command(self, text, blocking=False, source="text", trace=None):
         """Processes a text command (from voice or UI)."""
         self.voice_status.emit(f"Processing: {text}")
         self.voice_status.emit("Thinking...")
-        
+        # A new command interrupts whatever is still being said
+        self.tts.cancel()
+
+        # Queued on the worker pool so the UI is never blocked
+        job = self.scheduler.submit(text, source=source, trace=trace)
+        if job is None:
+            self.voice_status.emit("Busy - too many commands queued.")
+            return
         if blocking:
-            self._process_text_logic(text)
-        else:
-            # Run in thread to not block UI (for UI text input)
-            threading.Thread(target=self._process_text_logic, args=(text,)).start()
+            job.wait()
 
 
-    def _process_text_logic(self, text):
+    def _process_text_logic(self, text, trace=None):
+        started = time.monotonic()
         try:
+            if config.OLLAMA_STREAM:
+                # Speak each sentence as soon as it is complete
+                def on_sentence(sentence):
+                    self.voice_status.emit(f"AI: {sentence}")
+                    self.speak(sentence, started, trace)
+                ai_handler.process_command_stream(text, self.state, on_sentence=on_sentence)
+                return
+
             response_text = ai_handler.process_command(text, self.state)
             self.voice_status.emit(f"AI: {response_text}")
-            self.speak(response_text)
+            self.speak(response_text, started, trace)
         except Exception as e:
             self.voice_status.emit(f"AI Error: {e}")
@@ -0,0 +1,413 @@
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from . import config, metrics
+from .model_manifest import ModelManifest
+
+# Wake-word detection, either on a thread in this process or in a dedicated
+# child process.
+# In-process, openwakeword inference shares the GIL with the Qt GUI, STT and
+# TTS, so a busy paint or a long Python step delays detection. In "process"
+# mode the child owns the ONNX sessions and gets audio through a shared-memory
+# ring of fixed-size chunks: the parent copies each chunk in and releases a
+# semaphore, the child reads it, and detections come back on a queue tagged
+# with the absolute sample position of the chunk that fired. If the child
+# dies it is restarted (from the current audio, not the backlog); after
+# MAX_RESTARTS the detector switches to running the model in-process.
+#
+# Both detectors have the same interface:
+#   feed(chunk, position) -> list of positions where the wake word fired
+#   poll()                -> detections that arrived since the last feed()
+#   reset()               -> forget the model's audio history (after a detection)
+#   close()
+
+CHUNK_SIZE = 1280      # 80 ms at 16 kHz, what openwakeword expects
+STATS_INTERVAL = 1.0   # seconds between stats messages from the child
+MAX_RESTARTS = 3       # child deaths before falling back to in-process detection
+
+
+def session_options(threads: int = 1):
+    """
+    ONNX Runtime settings for small models on a shared CPU: a fixed number of
+    intra-op threads, sequential execution, and no spin-waiting so idle
+    threads don't burn a core between 80 ms chunks.
+    """
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    options.add_session_config_entry("session.inter_op.allow_spinning", "0")
+    return options
+
+
+def _retune(session, options):
+    """Recreates an InferenceSession from its model file with our options."""
+    import onnxruntime as ort
+    path = getattr(session, "_model_path", None)
+    if not path:
+        return session
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+# SHA-256 of the ONNX model files openwakeword 0.6.0 (pinned in
+# requirements.txt) downloads: the v0.5.1 release models, as also shipped
+# inside the openwakeword 0.5.1 wheel the hashes were taken from. Update
+# these together with the openwakeword version.
+MODEL_SHA256 = {
+    "embedding_model.onnx": "70d164290c1d095d1d4ee149bc5e00543250a7316b59f31d056cff7bd3075c1f",
+    "melspectrogram.onnx": "ba2b0e0f8b7b875369a2c89cb13360ff53bac436f2895cced9f479fa65eb176f",
+    "silero_vad.onnx": "a35ebf52fd3ce5f1469b2a36158dba761bc47b973ea3382b3186ca15b1f5af28",
+    "alexa_v0.1.onnx": "6ff566a01d12670e8d9e3c59da32651db1575d17272a601b7f8a39283dfbae3e",
+    "hey_jarvis_v0.1.onnx": "94a13cfe60075b132f6a472e7e462e8123ee70861bc3fb58434a73712ee0d2cb",
+    "hey_mycroft_v0.1.onnx": "c2a311e8fa1338de89c31b3b46dc4dffd4af2f9a8d6ddead48893c2d301b1f18",
+    "hey_rhasspy_v0.1.onnx": "5a9b3ed3be2910e35780e097905aa9f35a9c10038df47914cf2b3ec4d670f6ea",
+    "timer_v0.1.onnx": "371e44535470a29248b3b8f1bbbbaf2525c86417fd8f75c67fcf02ae0b9626df",
+    "weather_v0.1.onnx": "8441da8e746899e8d969528d5bad5651cdd563079c05962788f77753041f60e7",
+}
+
+
+def model_files(name: str):
+    """The ONNX files openwakeword needs for `name` (feature models included)."""
+    import openwakeword
+    paths = [m["model_path"] for m in openwakeword.FEATURE_MODELS.values()]
+    if name in openwakeword.MODELS:
+        paths.append(openwakeword.MODELS[name]["model_path"])
+    return [p.replace(".tflite", ".onnx") for p in paths]
+
+
+def ensure_models(name: str, manifest_path: str = None):
+    """
+    Checks the model files against MODEL_SHA256 and only falls back to
+    openwakeword's downloader if something is missing or corrupt. Bad files
+    are deleted first (the downloader skips files that exist). Raises
+    RuntimeError if files are still missing after downloading; freshly
+    downloaded files that differ from their pins are used with a warning
+    (and not fetched again), since the pins may not match the installed
+    openwakeword.
+    """
+    import openwakeword
+    manifest = ModelManifest(manifest_path or config.WAKEWORD_MANIFEST, MODEL_SHA256)
+    paths = model_files(name)
+    bad = manifest.verify(paths)
+    if not bad:
+        return
+    print(f"Wake-word models missing or changed, fetching: {name}")
+    _remove(bad)
+    try:
+        openwakeword.utils.download_models([name])
+    except Exception as e:
+        print(f"Wake-word model download failed: {e}")
+    bad = manifest.verify(paths)
+    missing = [p for p in bad if not os.path.exists(p)]
+    if missing:
+        raise RuntimeError(f"wake-word model files missing: {', '.join(map(os.path.basename, missing))}")
+    if bad:
+        print(f"Warning: downloaded wake-word models don't match their pinned checksums "
+              f"({', '.join(map(os.path.basename, bad))}); check MODEL_SHA256 against the openwakeword version")
+        manifest.accept(bad)
+
+
+def _remove(paths):
+    for p in paths:
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+
+def load_model(name: str, threads: int = 1, manifest_path: str = None):
+    """Loads an openwakeword ONNX model and rebuilds its sessions with session_options()."""
+    from openwakeword.model import Model
+
+    ensure_models(name, manifest_path)
+    model = Model(wakeword_models=[name], inference_framework="onnx")
+    options = session_options(threads)
+
+    # openwakeword creates its sessions with its own defaults; swap them out.
+    # The preprocessor looks its sessions up by attribute on every call, the
+    # wake-word models are bound into prediction functions, so rebind those.
+    pre = model.preprocessor
+    pre.melspec_model = _retune(pre.melspec_model, options)
+    pre.embedding_model = _retune(pre.embedding_model, options)
+    for key, session in list(model.models.items()):
+        tuned = _retune(session, options)
+        model.models[key] = tuned
+        model.model_prediction_function[key] = (
+            lambda x, s=tuned: s.run(None, {s.get_inputs()[0].name: x}))
+    return model
+
+
+def _score(prediction: dict, name: str) -> float:
+    # Keys are the model name, e.g. "hey_jarvis" (or "hey_jarvis_v0.1")
+    if name in prediction:
+        return prediction[name]
+    return max(prediction.values()) if prediction else 0.0
+
+
+class InProcessDetector:
+    def __init__(self, name: str = "hey_jarvis", threshold: float = 0.5, threads: int = 1):
+        self.name = name
+        self.threshold = threshold
+        self.model = load_model(name, threads)
+
+    def feed(self, chunk, position):
+        started = time.perf_counter()
+        score = _score(self.model.predict(chunk), self.name)
+        metrics.observe("wakeword.inference", time.perf_counter() - started)
+        return [position] if score > self.threshold else []
+
+    def poll(self):
+        return []
+
+    def reset(self):
+        self.model.reset()
+
+    def close(self):
+        pass
+
+
+def _child_main(shm_name, slots, chunk_size, written, ready, reset_flag, results, name, threshold, threads):
+    """Entry point of the wake-word process."""
+    try:
+        model = load_model(name, threads)
+    except Exception as e:
+        results.put(("error", str(e)))
+        return
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((slots, chunk_size + 2), dtype=np.int64, buffer=shm.buf)
+    results.put(("ready", None))
+
+    read = written.value  # start from live audio (matters after a restart)
+    dropped = 0
+    timings = []
+    last_stats = time.monotonic()
+    cpu_start = time.process_time()
+    while True:
+        ready.acquire(timeout=0.5)
+        total = written.value
+        if total < 0:
+            break  # parent closed us
+        if reset_flag.value:
+            reset_flag.value = 0
+            model.reset()
+        if total - read > slots:
+            # Parent lapped us: those chunks are already overwritten
+            dropped += total - read - slots
+            read = total - slots
+        while read < total:
+            row = ring[read % slots]
+            seq, position = int(row[0]), int(row[1])
+            if seq != read:
+                # Overwritten while we were getting to it
+                dropped += 1
+                read += 1
+                continue
+            chunk = row[2:].astype(np.int16)
+            read += 1
+            if int(row[0]) != seq:
+                # The parent started rewriting the slot while we copied it
+                dropped += 1
+                continue
+            started = time.perf_counter()
+            score = _score(model.predict(chunk), name)
+            timings.append(time.perf_counter() - started)
+            if score > threshold:
+                results.put(("detect", position))
+
+        now = time.monotonic()
+        if now - last_stats >= STATS_INTERVAL and timings:
+            results.put(("stats", {"inference": timings, "dropped": dropped,
+                                   "cpu": time.process_time() - cpu_start}))
+            timings = []
+            dropped = 0
+            last_stats = now
+    shm.close()
+
+
+class ProcessDetector:
+    """Runs the model in a child process fed through a shared-memory ring."""
+
+    def __init__(self, name: str = "hey_jarvis", threshold: float = 0.5, threads: int = 1,
+                 slots: int = 32, chunk_size: int = CHUNK_SIZE, start_timeout: float = 60.0):
+        self.name = name
+        self.threshold = threshold
+        self.threads = threads
+        self.chunk_size = chunk_size
+        self.slots = slots
+        self.start_timeout = start_timeout
+        # Each slot: [sequence number, absolute position, samples...]; int64 keeps
+        # the header and samples in one array (samples are widened from int16)
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * (chunk_size + 2) * 8)
+        self.ring = np.ndarray((slots, chunk_size + 2), dtype=np.int64, buffer=self.shm.buf)
+        self.ring[:, 0] = -1
+
+        self.ctx = mp.get_context("spawn")  # never fork the Qt process
+        self.written = self.ctx.Value("q", 0, lock=False)
+        self.ready = self.ctx.Semaphore(0)
+        self.reset_flag = self.ctx.Value("b", 0, lock=False)
+        self.cpu = 0.0              # CPU seconds the child has used since it started
+        self.last_position = -1
+        self.ignore_before = 0
+        self.restarts = 0
+        self.fallback = None        # InProcessDetector (or _DisabledDetector) once the child keeps dying
+        self.process = None
+        try:
+            self._start()
+        except Exception:
+            self.close()
+            raise
+
+    def _start(self):
+        """Starts the child and waits until its model is loaded."""
+        self.results = self.ctx.Queue()
+        process = self.ctx.Process(
+            target=_child_main, daemon=True,
+            args=(self.shm.name, self.slots, self.chunk_size, self.written, self.ready, self.reset_flag,
+                  self.results, self.name, self.threshold, self.threads))
+        process.start()
+        self.process = process
+        deadline = time.monotonic() + self.start_timeout
+        while True:
+            try:
+                kind, payload = self.results.get(timeout=0.5)
+                break
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f"wake-word process exited during startup (code {process.exitcode})")
+                if time.monotonic() > deadline:
+                    raise RuntimeError("wake-word process did not start in time")
+        if kind == "error":
+            raise RuntimeError(f"wake-word process failed to start: {payload}")
+
+    def _check_alive(self):
+        """Restarts a dead child, or switches to in-process detection."""
+        if self.process.is_alive():
+            return
+        metrics.incr("wakeword.process_exits")
+        print(f"Wake-word process exited (code {self.process.exitcode}), restarting")
+        self.restarts += 1
+        self.ignore_before = self.last_position + 1  # whatever it queued is stale
+        try:
+            if self.restarts > MAX_RESTARTS:
+                raise RuntimeError(f"exited {self.restarts} times")
+            self._start()
+        except Exception as e:
+            self._stop_process()
+            if not in_process_safe():
+                print(f"Wake-word process unavailable ({e}); in-process detection can't load "
+                      f"onnxruntime after PyQt6 on Windows, wake word disabled")
+                self.fallback = _DisabledDetector()
+                return
+            print(f"Wake-word process unavailable ({e}), running in-process")
+            self.fallback = InProcessDetector(self.name, self.threshold, self.threads)
+
+    def feed(self, chunk, position):
+        if self.fallback is not None:
+            return self.fallback.feed(chunk, position)
+        chunk = np.asarray(chunk).reshape(-1)[:self.chunk_size]
+        seq = self.written.value
+        row = self.ring[seq % self.slots]
+        row[0] = -1  # mark as being written so the child skips a torn slot
+        row[1] = position
+        row[2:2 + len(chunk)] = chunk
+        row[0] = seq
+        self.written.value = seq + 1
+        self.last_position = position
+        self.ready.release()
+        return self.poll()
+
+    def poll(self):
+        """Detections (and stats) that arrived since the last call."""
+        if self.fallback is not None:
+            return []
+        detections = []
+        while True:
+            try:
+                kind, payload = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "detect":
+                if payload >= self.ignore_before:
+                    detections.append(payload)
+            elif kind == "stats":
+                for t in payload["inference"]:
+                    metrics.observe("wakeword.inference", t)
+                if payload["dropped"]:
+                    metrics.incr("wakeword.dropped_chunks", payload["dropped"])
+                self.cpu = payload["cpu"]
+            elif kind == "error":
+                print(f"Wake-word process error: {payload}")
+        self._check_alive()
+        return detections
+
+    def reset(self):
+        if self.fallback is not None:
+            self.fallback.reset()
+            return
+        # Detections already queued from before the reset are stale
+        self.ignore_before = self.last_position + 1
+        self.reset_flag.value = 1
+
+    def _stop_process(self):
+        if self.process is None:
+            return
+        self.written.value = -1
+        self.ready.release()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+
+    def close(self):
+        self._stop_process()
+        if self.fallback is not None:
+            self.fallback.close()
+        self.shm.close()
+        self.shm.unlink()
+
+
+def in_process_safe() -> bool:
+    """
+    True if onnxruntime can be loaded in this process. On Windows it has to
+    load before PyQt6 (DLL conflicts); main.py only preloads it in
+    "inprocess" mode, so a "process" mode fallback can't load it late.
+    """
+    return sys.platform != "win32" or "onnxruntime" in sys.modules or "PyQt6" not in sys.modules
+
+
+class _DisabledDetector:
+    """Stands in for a detector that can't run; never detects anything."""
+
+    def feed(self, chunk, position):
+        return []
+
+    def poll(self):
+        return []
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def create_detector(mode: str, name: str, threshold: float, threads: int):
+    """mode is "process" or "inprocess"; falls back to in-process if the child can't start (and that is safe)."""
+    if mode == "process":
+        try:
+            return ProcessDetector(name, threshold, threads)
+        except Exception as e:
+            if not in_process_safe():
+                raise RuntimeError(f"wake-word process unavailable ({e}); in-process fallback "
+                                   f"disabled on Windows once PyQt6 is loaded")
+            print(f"Wake-word process unavailable ({e}), running in-process")
+    return InProcessDetector(name, threshold, threads)
@@ -1,37 +1,99 @@
-
 import sys
-# Import VoiceHandler first to load onnxruntime/openwakeword before PyQt6 to avoid DLL conflicts
 
-from core.voice_handler import VoiceHandler
-from PyQt6.QtWidgets import QApplication
-from ui.dashboard import Dashboard
-from core.car_state import CarState
+# Imported first so the startup clock starts with the process
+from core import startup
+from core import config
+
 
 def main():
+    if config.WAKEWORD_MODE == "inprocess":
+        # onnxruntime must load before PyQt6 to avoid DLL conflicts on Windows.
+        # In "process" mode it only loads in the wake-word process, and on
+        # Windows the in-process fallback is disabled (wakeword.in_process_safe)
+        startup.timed_import("onnxruntime")
+
+    with startup.timed("PyQt6"):
+        from PyQt6.QtWidgets import QApplication
+    with startup.timed("ui.dashboard"):
+        from ui.dashboard import Dashboard
+    from core.car_state import CarState
+
     app = QApplication(sys.argv)
     
-    # Shared State
+    # Shared State, restored from the journal of the previous run
     state = CarState()
+    journal = None
+    if config.STATE_JOURNAL_ENABLED:
+        from core.state_journal import StateJournal
+        with startup.timed("state restore"):
+            try:
+                journal = StateJournal(config.STATE_JOURNAL_DIR, compact_every=config.STATE_JOURNAL_COMPACT_EVERY,
+                                       fsync=config.STATE_JOURNAL_FSYNC)
+                journal.restore(state)
+                journal.attach(state)
+            except OSError as e:
+                print(f"State journal disabled: {e}")
+                journal = None
+        if state.destination:
+            from core import actions
+            with startup.timed("resume navigation"):
+                print(actions.resume_navigation(state))
+
+    # History of speed, fuel and cabin signals for diagnostics
+    from core.telemetry import STATE_FIELDS, TelemetryStore
+    telemetry = TelemetryStore(config.TELEMETRY_RAW_SAMPLES, config.TELEMETRY_SECONDS, config.TELEMETRY_MINUTES)
+
+    # Real speed / fuel from the vehicle bus, if one is configured
+    bus = None
+    if config.BUS_SOURCE:
+        from core import vehicle_bus
+        try:
+            signals = vehicle_bus.load_signal_db(config.BUS_SIGNAL_DB) if config.BUS_SIGNAL_DB else None
+            bus = vehicle_bus.BusIngestor(vehicle_bus.open_source(config.BUS_SOURCE), state, telemetry,
+                                          signals=signals, publish_hz=config.BUS_PUBLISH_HZ)
+            bus.start()
+        except (OSError, ValueError) as e:
+            print(f"Vehicle bus disabled: {e}")
+            bus = None
+    # One series per signal: fields the bus drives are recorded by the bus
+    driven = bus.state_fields if bus is not None else set()
+    telemetry.attach(state, [f for f in STATE_FIELDS if f not in driven])
     
     # UI
     window = Dashboard(state)
-    
+    window.show()
+    startup.mark("window_shown")
 
-    # Voice Handler
-    voice = VoiceHandler(state)
-    voice.voice_status.connect(window.update_voice_status)
+    voice = None
 
-    # Connect text input from UI to Voice Handler
-    window.command_entered.connect(voice.process_text_command)
-    # Connect manual listen button
-    window.listen_requested.connect(lambda: voice._handle_command())
-    
-    voice.start()
-    
-    window.show()
+    def start_voice():
+        nonlocal voice
+        # Voice Handler (Ollama client, scheduler); audio and ML stacks load
+        # on its own thread from here
+        with startup.timed("core.voice_handler"):
+            from core.voice_handler import VoiceHandler
+        voice = VoiceHandler(state)
+        voice.voice_status.connect(window.update_voice_status)
+
+        # Connect text input from UI to Voice Handler
+        window.command_entered.connect(voice.process_text_command)
+        # Connect manual listen button
+        window.listen_requested.connect(voice.request_listen)
+
+        voice.start()
+
+    # Everything else waits until the dashboard has painted once
+    window.first_frame.connect(start_voice)
     
     exit_code = app.exec()
-    voice.stop()
+    if voice is not None:
+        voice.stop()
+    if bus is not None:
+        bus.stop()
+    if getattr(state, "navigator", None) is not None:
+        state.navigator.close()
+    if journal is not None:
+        journal.close()
     sys.exit(exit_code)
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from core.audio_capture import AudioCapture, AudioRingBuffer, AudioCursor
+from core.audio_source import RATE, WavReplaySource, read_wav
+
+
+def _write_wav(path, samples):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(samples.astype(np.int16).tobytes())
+
+
+def test_ring_buffer_wraps_and_reads_by_position():
+    ring = AudioRingBuffer(seconds=1.0, rate=100)  # 100 samples
+    ring.write(np.arange(80))
+    ring.write(np.arange(80, 150))
+    assert ring.oldest == 50
+    assert ring.read(90, 20).tolist() == list(range(90, 110))
+    assert ring.read(0, 10).tolist() == list(range(50, 60))  # clamped to what is held
+
+
+def test_slow_reader_drops_without_backpressure():
+    ring = AudioRingBuffer(seconds=1.0, rate=100)
+    cursor = AudioCursor(ring)
+    ring.write(np.arange(250))
+    samples = cursor.read(10, timeout=0)
+    assert samples.tolist() == list(range(150, 160))
+    assert cursor.dropped == 150
+
+
+def test_fast_replay_never_drops_for_a_slow_reader(tmp_path):
+    rng = np.random.default_rng(0)
+    clips = [rng.integers(-2000, 2000, int(RATE * s)).astype(np.int16) for s in (1.3, 0.7)]
+    paths = []
+    for i, clip in enumerate(clips):
+        paths.append(tmp_path / f"clip{i}.wav")
+        _write_wav(paths[-1], clip)
+
+    source = WavReplaySource([str(p) for p in paths], realtime=False, gap=0.25, tail=0.5)
+    # A buffer far smaller than the recording, so the replay has to wait for the reader
+    capture = AudioCapture(rate=RATE, block_size=1280, buffer_seconds=0.2, source=source)
+    cursor = capture.cursor(0)
+    capture.start()
+
+    got = []
+    while True:
+        chunk = cursor.read(1000, timeout=0.5)
+        if chunk is None:
+            if source.finished.is_set():
+                break
+            continue
+        got.append(chunk)
+        time.sleep(0.001)  # slower than the replay would like
+    got.append(capture.ring.read(cursor.position, capture.position - cursor.position))
+    capture.stop()
+
+    silence = np.zeros(int(0.25 * RATE), np.int16), np.zeros(int(0.5 * RATE), np.int16)
+    expected = np.concatenate([clips[0], silence[0], clips[1], silence[1]])
+    assert cursor.dropped == 0
+    assert np.array_equal(np.concatenate(got), expected)
+    assert [s[1:] for s in source.segments] == [(0, len(clips[0])),
+                                               (len(clips[0]) + len(silence[0]),
+                                                len(clips[0]) + len(silence[0]) + len(clips[1]))]
+
+
+def test_read_wav_rejects_other_formats(tmp_path):
+    path = tmp_path / "stereo.wav"
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(b"\0" * 400)
+    with pytest.raises(ValueError):
+        read_wav(str(path))
@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+from core.car_state import CarState
+
+
+def test_update_bumps_version_only_on_change():
+    state = CarState()
+    assert state.update(ac_on=True, ac_temp=20) == 1
+    assert state.update(ac_on=True) == 1
+    state.lights_on = True
+    assert state.version == 2
+    assert (state.ac_on, state.ac_temp, state.lights_on) == (True, 20, True)
+
+
+def test_unknown_field():
+    state = CarState()
+    with pytest.raises(AttributeError):
+        state.update(warp_drive=True)
+    with pytest.raises(AttributeError):
+        CarState(warp_drive=True)
+
+
+def test_subscribers_get_field_diffs():
+    state = CarState()
+    seen = []
+    unsubscribe = state.subscribe(lambda diff, version: seen.append((diff, version)))
+    state.update(ac_on=True, ac_temp=22)  # ac_temp is already 22
+    state.update(windows={"driver": 100, "passenger": 0})
+    unsubscribe()
+    state.update(ac_on=False)
+    assert seen[0] == ({"ac_on": (False, True)}, 1)
+    diff, version = seen[1]
+    assert version == 2
+    assert dict(diff["windows"][1]) == {"driver": 100, "passenger": 0}
+    assert len(seen) == 2
+
+
+def test_failing_subscriber_doesnt_stop_others():
+    state = CarState()
+    seen = []
+    state.subscribe(lambda diff, version: 1 / 0)
+    state.subscribe(lambda diff, version: seen.append(version))
+    state.update(wipers_on=True)
+    assert seen == [1]
+
+
+def test_dict_fields_are_read_only():
+    state = CarState()
+    with pytest.raises(TypeError):
+        state.windows["driver"] = 100
+    state.update(windows={**state.windows, "driver": 100})
+    assert state.windows["driver"] == 100
+
+
+def test_snapshot_is_cached_until_the_next_change():
+    state = CarState()
+    first = state.snapshot()
+    assert state.snapshot() is first
+    state.update(speed=50)
+    second = state.snapshot()
+    assert second is not first
+    assert (first.speed, first.version) == (0, 0)
+    assert (second.speed, second.version) == (50, 1)
+
+
+def test_nested_updates_are_delivered_in_version_order():
+    state = CarState()
+    seen = []
+
+    def follow(diff, version):
+        # A subscriber reacting to one field by writing another
+        if "destination" in diff and diff["destination"][1]:
+            state.update(eta_minutes=12)
+
+    state.subscribe(follow)
+    state.subscribe(lambda diff, version: seen.append((version, sorted(diff))))
+    state.update(destination="Airport")
+    assert seen == [(1, ["destination"]), (2, ["eta_minutes"])]
+
+
+def test_concurrent_writers_notify_in_version_order():
+    state = CarState()
+    versions = []
+    state.subscribe(lambda diff, version: versions.append(version))
+
+    def writer(n):
+        for i in range(500):
+            state.update(speed=n * 1000 + i + 1)  # never the initial 0
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert versions == list(range(1, 2001))
+    assert state.version == 2000
+
+
+def test_transaction_makes_read_modify_write_atomic():
+    state = CarState(fuel=0)
+
+    def add():
+        for _ in range(1000):
+            with state.transaction():
+                state.update(fuel=state.fuel + 1)
+
+    threads = [threading.Thread(target=add) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert state.fuel == 4000
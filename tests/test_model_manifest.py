@@ -0,0 +1,34 @@
+import hashlib
+
+from core.model_manifest import ModelManifest
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_mismatch_is_reported_until_accepted(tmp_path, capsys):
+    good = _write(tmp_path / "good.onnx", b"good")
+    other = _write(tmp_path / "other.onnx", b"newer release")
+    pins = {"good.onnx": hashlib.sha256(b"good").hexdigest(),
+            "other.onnx": hashlib.sha256(b"older release").hexdigest()}
+    manifest_path = str(tmp_path / "manifest.json")
+
+    manifest = ModelManifest(manifest_path, pins)
+    assert manifest.verify([good, other]) == [other]
+    manifest.accept([other])
+
+    # Remembered across restarts, so the file isn't fetched again every boot
+    assert ModelManifest(manifest_path, pins).verify([good, other]) == []
+    assert "does not match its pinned checksum" in capsys.readouterr().out
+
+    # ...but only while it is the file that was accepted
+    (tmp_path / "other.onnx").write_bytes(b"tampered")
+    assert ModelManifest(manifest_path, pins).verify([good, other]) == [other]
+
+
+def test_missing_file_is_bad(tmp_path):
+    pins = {"gone.onnx": hashlib.sha256(b"x").hexdigest()}
+    path = str(tmp_path / "gone.onnx")
+    assert ModelManifest(str(tmp_path / "manifest.json"), pins).verify([path]) == [path]
@@ -0,0 +1,51 @@
+import pytest
+
+from core import config, metrics, ollama_handler
+from core.car_state import CarState
+
+REPLIES = {
+    "small": '{"tool": "ac", "args": {"on": "maybe"}}',
+    "big": 'Sure. {"tool": "ac", "args": {"on": "on", "temperature": 21}}',
+}
+
+
+@pytest.fixture
+def tiers(monkeypatch):
+    monkeypatch.setattr(config, "OLLAMA_TIER_MODELS", ["small"])
+    monkeypatch.setattr(config, "OLLAMA_MODEL", "big")
+    asked = []
+
+    def chat(text, stream=False, model=None):
+        asked.append(model)
+        content = REPLIES[model]
+        if stream:
+            return iter([{"message": {"content": content[i:i + 7]}} for i in range(0, len(content), 7)]), False
+        return {"message": {"content": content}}, False
+
+    monkeypatch.setattr(ollama_handler, "_chat", chat)
+    monkeypatch.setattr(ollama_handler.command_cache, "put_tool_calls", lambda text, calls: None)
+    metrics.reset()
+    return asked
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_rejected_tool_call_escalates(tiers, stream):
+    state = CarState()
+    text = "make the cabin nice and cosy please"
+    if stream:
+        reply = ollama_handler.process_command_stream(text, state)
+    else:
+        reply = ollama_handler.process_command(text, state)
+    assert tiers == ["small", "big"]
+    assert "AC turned on at 21°C." in reply
+    assert (state.ac_on, state.ac_temp) == (True, 21)
+    assert metrics.counter("llm.escalated") == 1
+
+
+def test_last_tier_still_reports_a_rejected_call(tiers, monkeypatch):
+    monkeypatch.setattr(config, "OLLAMA_TIER_MODELS", [])
+    monkeypatch.setattr(config, "OLLAMA_MODEL", "small")
+    state = CarState()
+    reply = ollama_handler.process_command_stream("make the cabin nice and cosy please", state)
+    assert tiers == ["small"]
+    assert reply and state.version == 0
@@ -0,0 +1,176 @@
+import math
+import random
+import time
+
+import numpy as np
+import pytest
+
+from benchmarks.routing_bench import make_city_graph
+from core import config, metrics, routing
+from core.car_state import CarState
+from core.routing import Navigator, RoadGraph, Router, build_landmarks, dijkstra
+
+
+@pytest.fixture(scope="module")
+def graph():
+    graph = make_city_graph(size=30, seed=3)
+    build_landmarks(graph, count=6)
+    return graph
+
+
+def _plain(graph):
+    return RoadGraph(graph.lat, graph.lon, graph.indptr, graph.indices, graph.length_m, graph.speed_kmh)
+
+
+def _check_path(graph, route, source, target):
+    assert route.nodes[0] == source and route.target == target
+    seconds = sum(routing._edge_seconds(graph, a, b) for a, b in zip(route.nodes, route.nodes[1:]))
+    assert math.isclose(seconds, route.seconds, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def test_astar_and_alt_match_dijkstra(graph):
+    rng = random.Random(0)
+    routers = [Router(_plain(graph)), Router(graph)]
+    for source in rng.sample(range(graph.nodes), 8):
+        exact = dijkstra(graph.indptr, graph.indices, graph.seconds, source, graph.nodes)
+        for target in rng.sample(range(graph.nodes), 8):
+            for router in routers:
+                route = router.route(source, target)
+                if math.isinf(exact[target]):
+                    assert route is None
+                    continue
+                _check_path(graph, route, source, target)
+                assert math.isclose(route.seconds, exact[target], rel_tol=1e-9)
+
+
+def test_bounds_are_admissible(graph):
+    target = 17
+    to_target = dijkstra(*graph.reversed(), target, graph.nodes)
+    h = graph.heuristic(target)
+    for v in range(graph.nodes):
+        assert h[v] <= to_target[v] + 1e-6
+
+
+def test_cached_route_answers_queries_along_it(graph):
+    router = Router(graph)
+    route = router.route(0, graph.nodes - 1)
+    metrics.reset()
+    tail = router.route(route.nodes[5], route.target)
+    assert tail.nodes == route.nodes[5:]
+    assert metrics.counter("routing.cache_hit") == 1
+
+
+def test_reroute_is_optimal(graph):
+    router = Router(graph)
+    rng = random.Random(1)
+    checked = 0
+    while checked < 10:
+        route = router.route(rng.randrange(graph.nodes), rng.randrange(graph.nodes))
+        if route is None or len(route.nodes) < 6:
+            continue
+        at = route.nodes[len(route.nodes) // 2]
+        off = [v for v in graph._indices[graph._indptr[at]:graph._indptr[at + 1]] if v not in route.index]
+        if not off:
+            continue
+        new = router.reroute(route, off[0])
+        exact = dijkstra(graph.indptr, graph.indices, graph.seconds, off[0], graph.nodes)[route.target]
+        _check_path(graph, new, off[0], route.target)
+        assert math.isclose(new.seconds, exact, rel_tol=1e-9)
+        checked += 1
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_navigator_updates_eta_from_its_worker(graph, monkeypatch):
+    monkeypatch.setattr(config, "ROUTING_OFF_ROUTE_M", 1000.0)
+    state = CarState()
+    nav = Navigator(state, Router(graph))
+    try:
+        route = nav.start(graph.nodes - 1)
+        assert route.nodes[0] == graph.place("home")  # no GPS fix yet
+
+        # Moving along the route counts down
+        mid = route.nodes[len(route.nodes) // 2]
+        state.update(position=graph.position(mid))
+        _wait_for(lambda: nav.route.nodes[0] == mid)
+        assert nav.route.nodes == route.nodes[len(route.nodes) // 2:]
+        _wait_for(lambda: state.eta_minutes == max(1, round(nav.route.seconds / 60)))
+
+        # Leaving it reroutes from where the car is
+        metrics.reset()
+        off = next(v for v in graph._indices[graph._indptr[mid]:graph._indptr[mid + 1]] if v not in route.index)
+        state.update(position=graph.position(off))
+        _wait_for(lambda: nav.route.nodes[0] == off)
+        assert metrics.counter("routing.deviations") == 1
+        exact = dijkstra(graph.indptr, graph.indices, graph.seconds, off, graph.nodes)[route.target]
+        assert math.isclose(nav.route.seconds, exact, rel_tol=1e-9)
+    finally:
+        nav.close()
+    assert not nav.thread.is_alive()
+
+
+def test_stopped_navigator_ignores_fixes(graph):
+    state = CarState()
+    nav = Navigator(state, Router(graph))
+    try:
+        nav.start(graph.nodes - 1)
+        nav.stop()
+        state.update(position=graph.position(5))
+        time.sleep(0.05)
+        assert nav.route is None and state.eta_minutes is None
+    finally:
+        nav.close()
+
+
+def test_failed_graph_load_is_not_retried(tmp_path, monkeypatch):
+    path = str(tmp_path / "missing.npz")
+    monkeypatch.setattr(config, "ROUTING_GRAPH_PATH", path)
+    monkeypatch.setattr(routing, "_router", None)
+    monkeypatch.setattr(routing, "_load_failed", False)
+    assert routing.get_router() is None
+    assert routing._load_failed and config.ROUTING_GRAPH_PATH == path
+
+    graph = make_city_graph(size=5)
+    graph.save(path)
+    assert routing.get_router() is None  # still off until restart
+    monkeypatch.setattr(routing, "_load_failed", False)
+    assert isinstance(routing.get_router(), Router)
+
+
+def test_graph_save_load_roundtrip(graph, tmp_path):
+    path = str(tmp_path / "roads.npz")
+    graph.save(path)
+    loaded = RoadGraph.load(path)
+    assert loaded.nodes == graph.nodes and loaded.places == graph.places
+    assert np.array_equal(loaded.indices, graph.indices)
+    route = Router(loaded).route(0, graph.nodes - 1)
+    assert math.isclose(route.seconds, Router(graph).route(0, graph.nodes - 1).seconds, rel_tol=1e-5)
+
+
+def test_restored_destination_is_routed_again(graph, tmp_path, monkeypatch):
+    from core import actions
+    from core.state_journal import StateJournal
+
+    state = CarState()
+    journal = StateJournal(str(tmp_path), fsync=False)
+    journal.restore(state)
+    journal.attach(state)
+    state.update(destination="Airport")
+    journal.close()
+
+    monkeypatch.setattr(routing, "_router", Router(graph))
+    restored = CarState()
+    StateJournal(str(tmp_path), fsync=False).restore(restored)
+    assert restored.destination == "Airport" and restored.eta_minutes is None
+    try:
+        assert actions.resume_navigation(restored).startswith("Navigating to Airport. ETA")
+        assert restored.navigator.route.target == graph.place("Airport")
+        assert restored.eta_minutes is not None
+    finally:
+        restored.navigator.close()
+    assert actions.resume_navigation(CarState()) is None
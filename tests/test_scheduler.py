@@ -0,0 +1,45 @@
+import threading
+import time
+
+from core.scheduler import PRIORITY_CHAT, PRIORITY_CONTROL, PRIORITY_SAFETY, CommandScheduler, classify
+
+
+def test_classify():
+    assert classify("lights on") == (PRIORITY_SAFETY, "toggle_lights")
+    assert classify("set the AC to 20") == (PRIORITY_CONTROL, "set_ac")
+    assert classify("what's the weather like") == (PRIORITY_CHAT, None)
+    assert classify("go to sleep") == (PRIORITY_CHAT, None)
+
+
+def _blocked_scheduler():
+    """A one-worker scheduler busy until the returned event is set."""
+    gate = threading.Event()
+    ran = []
+    scheduler = CommandScheduler(lambda text, trace: (gate.wait(5), ran.append(text)), workers=1)
+    scheduler.start()
+    scheduler.submit("tell me a joke")  # occupies the worker
+    while not scheduler.active:
+        time.sleep(0.001)
+    return scheduler, gate, ran
+
+
+def test_newer_command_for_same_target_supersedes():
+    scheduler, gate, ran = _blocked_scheduler()
+    first = scheduler.submit("set the AC to 20")
+    second = scheduler.submit("set the AC to 22")
+    gate.set()
+    assert second.wait(5)
+    assert first.cancelled
+    assert "set the AC to 22" in ran and "set the AC to 20" not in ran
+    scheduler.stop()
+
+
+def test_llm_commands_are_not_superseded():
+    scheduler, gate, ran = _blocked_scheduler()
+    jobs = [scheduler.submit("drive me to Marios Pizza"), scheduler.submit("what's the weather like")]
+    gate.set()
+    for job in jobs:
+        assert job.wait(5)
+        assert not job.cancelled
+    assert scheduler.stats()["superseded"] == 0
+    scheduler.stop()
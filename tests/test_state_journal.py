@@ -0,0 +1,57 @@
+import pytest
+
+from benchmarks.state_journal_check import check_compaction_crash, check_torn_writes
+from core.car_state import CarState
+from core.state_journal import StateJournal, decode_snapshot, encode_record, encode_snapshot, read_records
+
+VALUES = {"ac_on": True, "ac_temp": 19, "destination": "Zürich Hauptbahnhof", "lights_on": False,
+          "wipers_on": True, "fuel": 42, "windows": {"driver": 100, "passenger": 0}}
+
+
+def test_snapshot_roundtrip():
+    assert decode_snapshot(encode_snapshot(VALUES, 7)) == (VALUES, 7)
+    no_destination = {**VALUES, "destination": None}
+    assert decode_snapshot(encode_snapshot(no_destination, 0)) == (no_destination, 0)
+
+
+def test_damaged_snapshot_is_rejected():
+    data = bytearray(encode_snapshot(VALUES, 7))
+    data[10] ^= 0xFF
+    with pytest.raises(ValueError):
+        decode_snapshot(bytes(data))
+    with pytest.raises(ValueError):
+        decode_snapshot(b"CST1")
+
+
+def test_read_records_stops_at_a_torn_record():
+    data = encode_record(1, {"ac_on": True}) + encode_record(2, {"fuel": 10})
+    assert [(seq, changes) for seq, changes, _ in read_records(data)] == [(1, {"ac_on": True}), (2, {"fuel": 10})]
+    assert [seq for seq, _, _ in read_records(data[:-1])] == [1]
+
+
+def test_restore_trims_torn_tail(tmp_path):
+    state = CarState()
+    journal = StateJournal(str(tmp_path), fsync=False)
+    journal.restore(state)
+    journal.attach(state)
+    state.update(ac_temp=18)
+    state.update(destination="Home")
+    journal.close()
+    with open(journal.journal_path, "ab") as f:
+        f.write(encode_record(3, {"fuel": 5})[:-3])
+
+    restored = CarState()
+    info = StateJournal(str(tmp_path), fsync=False).restore(restored)
+    assert (info["replayed"], info["seq"]) == (2, 2)
+    assert info["torn_bytes"] > 0
+    assert (restored.ac_temp, restored.destination, restored.fuel) == (18, "Home", state.fuel)
+
+
+def test_every_torn_write_restores_the_last_intact_state(capsys):
+    cases, failures = check_torn_writes(12, seed=1)
+    assert cases > 100
+    assert failures == []
+
+
+def test_crash_between_snapshot_and_truncate_replays_nothing_twice(capsys):
+    assert check_compaction_crash(12, seed=1)
@@ -0,0 +1,83 @@
+import numpy as np
+
+from core.telemetry import TelemetryStore
+
+
+def _store_with_ramp(duration=180, hz=10, **sizes):
+    store = TelemetryStore(**sizes)
+    times = np.arange(duration * hz) / hz
+    store.extend("speed", times, times)  # value == time, so buckets are easy to check
+    return store
+
+
+def test_buckets_downsample_min_max_mean_last():
+    store = _store_with_ramp()
+    seconds = store.query("speed", 10.0, 12.0, "1s")
+    assert seconds["t"].tolist() == [10.0, 11.0]
+    assert seconds["min"].tolist() == [10.0, 11.0]
+    assert np.allclose(seconds["max"], [10.9, 11.9])
+    assert np.allclose(seconds["mean"], [10.45, 11.45])
+    assert np.allclose(seconds["last"], [10.9, 11.9])
+    assert seconds["n"].tolist() == [10, 10]
+
+    minutes = store.query("speed", None, None, "1m")
+    assert minutes["t"].tolist() == [0.0, 60.0, 120.0]  # the last one is still open
+    assert np.allclose(minutes["last"], [59.9, 119.9, 179.9])
+    assert minutes["n"].sum() == 1800
+
+
+def test_aggregate_last_is_the_newest_sample():
+    store = _store_with_ramp(raw_samples=100, seconds=30)
+    result = store.aggregate("speed")
+    assert result["resolution"] == "1m"
+    assert result["count"] == 1800
+    assert np.isclose(result["last"], 179.9)
+    assert np.isclose(result["mean"], np.arange(1800).mean() / 10)
+    assert (result["min"], result["max"]) == (0.0, 179.9)
+
+
+def test_resolution_for_picks_the_finest_that_covers_the_window():
+    store = _store_with_ramp(raw_samples=100, seconds=30)  # raw holds 10 s, 1 s buckets 30 s
+    assert store.resolution_for("speed", 175.0) == "raw"
+    assert store.resolution_for("speed", 160.0) == "1s"
+    assert store.resolution_for("speed", 10.0) == "1m"
+    assert store.resolution_for("speed", None) == "1m"
+
+    short = _store_with_ramp(duration=5)  # nothing has wrapped yet
+    assert short.resolution_for("speed", None) == "raw"
+    assert short.aggregate("speed")["count"] == 50
+
+
+def test_memory_is_fixed():
+    store = _store_with_ramp(duration=10, raw_samples=100, seconds=30)
+    before = store.memory_bytes()
+    store.extend("speed", np.arange(100, 2000) / 10, np.zeros(1900))
+    assert store.memory_bytes() == before
+
+
+def test_buckets_overlapping_the_window_are_included():
+    store = _store_with_ramp(duration=5)
+    seconds = store.query("speed", 1.5, 3.5, "1s")
+    assert seconds["t"].tolist() == [1.0, 2.0, 3.0]  # partial first and last buckets included
+    assert store.query("speed", 4.5, None, "1s")["t"].tolist() == [4.0]  # the open bucket too
+    assert store.query("speed", 2.0, 3.0, "1s")["t"].tolist() == [2.0]  # aligned windows unchanged
+
+    wrapped = _store_with_ramp(duration=5, raw_samples=10)
+    result = wrapped.aggregate("speed", 1.5, 3.5)
+    assert result["resolution"] == "1s"
+    assert result["count"] == 30 and (result["min"], result["max"]) == (1.0, 3.9)
+
+
+def test_bus_driven_fields_are_not_recorded_twice():
+    from core.car_state import CarState
+    from core.telemetry import STATE_FIELDS
+    from core.vehicle_bus import BusIngestor
+
+    state = CarState()
+    store = TelemetryStore()
+    bus = BusIngestor(None, state, store)
+    store.attach(state, [f for f in STATE_FIELDS if f not in bus.state_fields])
+    state.update(speed=50, fuel=40, ac_temp=20)
+    store.detach()
+    assert "speed" not in store.names() and "fuel" not in store.names()
+    assert "ac_temp" in store.names()
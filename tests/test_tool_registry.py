@@ -0,0 +1,169 @@
+import pytest
+
+from core import routing
+from core.car_state import CarState
+from core.ollama_handler import run_tool_call
+from core.tool_registry import TOOLS, ToolCallError, UnknownToolError, dispatch, resolve
+
+
+@pytest.fixture
+def state(monkeypatch):
+    monkeypatch.setattr(routing, "get_router", lambda: None)  # no road graph in tests
+    return CarState()
+
+
+def test_every_schema_tool_is_registered():
+    assert set(TOOLS) == {"set_ac", "navigate_to", "stop_navigation",
+                          "toggle_lights", "toggle_wipers", "control_window"}
+
+
+@pytest.mark.parametrize("alias, name", [
+    ("ac", "set_ac"), ("AC", "set_ac"), ("nav", "navigate_to"), ("stop_nav", "stop_navigation"),
+    ("lights", "toggle_lights"), ("wipers", "toggle_wipers"), ("windows", "control_window"),
+])
+def test_aliases_resolve(alias, name):
+    assert resolve(alias).name == name
+
+
+def test_unknown_tool(state):
+    with pytest.raises(UnknownToolError):
+        dispatch("launch_rockets", {}, state)
+    result = run_tool_call("launch_rockets", {}, state)
+    assert not result.ok
+    assert state.version == 0
+
+
+# set_ac
+
+def test_set_ac_valid(state):
+    assert dispatch("set_ac", {"on": "on", "temperature": 21}, state) == "AC turned on at 21°C."
+    assert (state.ac_on, state.ac_temp) == (True, 21)
+
+
+def test_set_ac_coerced(state):
+    dispatch("ac", {"state": True, "temp": "19°C"}, state)
+    assert (state.ac_on, state.ac_temp) == (True, 19)
+    dispatch("set_ac", {"on": "disable"}, state)
+    assert state.ac_on is False
+
+
+def test_set_ac_defaults_to_on(state):
+    assert dispatch("set_ac", {"temperature": 20}, state) == "AC turned on at 20°C."
+    assert (state.ac_on, state.ac_temp) == (True, 20)
+
+
+@pytest.mark.parametrize("args", [{"on": "maybe"}, {"on": "on", "temperature": "warm"},
+                                  {"on": "on", "temperature": True}, ["on"],
+                                  {"on": "on", "temperature": float("nan")},
+                                  {"on": "on", "temperature": float("inf")},
+                                  {"on": "on", "temperature": "9" * 400}])
+def test_set_ac_malformed(state, args):
+    before = state.snapshot()
+    with pytest.raises(ToolCallError):
+        dispatch("set_ac", args, state)
+    assert not run_tool_call("set_ac", args, state).ok
+    assert state.snapshot() == before
+
+
+# navigate_to
+
+def test_navigate_to_valid(state):
+    result = run_tool_call("navigate_to", {"destination": "Airport"}, state)
+    assert result.ok
+    assert result.message == "Navigating to Airport."
+    assert state.destination == "Airport"
+
+
+def test_navigate_to_coerced(state):
+    dispatch("nav", {"location": "  Office "}, state)
+    assert state.destination == "Office"
+
+
+@pytest.mark.parametrize("args", [{}, {"destination": ""}, {"destination": None}, {"destination": ["x"]}])
+def test_navigate_to_malformed(state, args):
+    assert not run_tool_call("navigate_to", args, state).ok
+    assert state.destination is None
+
+
+# stop_navigation
+
+def test_stop_navigation_valid(state):
+    state.update(destination="Airport")
+    assert run_tool_call("stop_navigation", {}, state).ok
+    assert state.destination is None
+
+
+def test_stop_navigation_coerced(state):
+    state.update(destination="Airport")
+    # Stray arguments and a missing args object are ignored
+    dispatch("cancel_navigation", {"destination": "Airport"}, state)
+    assert state.destination is None
+    state.update(destination="Office")
+    dispatch("stop_nav", None, state)
+    assert state.destination is None
+
+
+def test_stop_navigation_malformed(state):
+    state.update(destination="Airport")
+    assert not run_tool_call("stop_navigation", "now", state).ok
+    assert state.destination == "Airport"
+
+
+# toggle_lights
+
+def test_toggle_lights_valid(state):
+    assert dispatch("toggle_lights", {"on": "on"}, state) == "Headlights on."
+    assert state.lights_on is True
+
+
+@pytest.mark.parametrize("value, expected", [("true", True), ("yes", True), (False, False), ("OFF", False)])
+def test_toggle_lights_coerced(state, value, expected):
+    state.update(lights_on=not expected)
+    dispatch("headlights", {"state": value}, state)
+    assert state.lights_on is expected
+
+
+@pytest.mark.parametrize("args", [{}, {"on": "dim"}, {"brightness": 3}])
+def test_toggle_lights_malformed(state, args):
+    assert not run_tool_call("toggle_lights", args, state).ok
+    assert state.lights_on is False
+
+
+# toggle_wipers
+
+def test_toggle_wipers_valid(state):
+    assert dispatch("toggle_wipers", {"on": "on"}, state) == "Wipers activated."
+    assert state.wipers_on is True
+
+
+def test_toggle_wipers_coerced(state):
+    state.update(wipers_on=True)
+    dispatch("wipers", {"on": "stop"}, state)
+    assert state.wipers_on is False
+
+
+@pytest.mark.parametrize("args", [{}, {"on": "fast"}, {"on": None}])
+def test_toggle_wipers_malformed(state, args):
+    assert not run_tool_call("toggle_wipers", args, state).ok
+    assert state.wipers_on is False
+
+
+# control_window
+
+def test_control_window_valid(state):
+    dispatch("control_window", {"window": "driver", "action": "open"}, state)
+    assert dict(state.windows) == {"driver": 100, "passenger": 0}
+
+
+def test_control_window_coerced(state):
+    dispatch("windows", {"window": "both", "action": "down"}, state)
+    assert dict(state.windows) == {"driver": 100, "passenger": 100}
+    dispatch("window", {"window": "Passenger", "action": "shut"}, state)
+    assert dict(state.windows) == {"driver": 100, "passenger": 0}
+
+
+@pytest.mark.parametrize("args", [{}, {"window": "driver"}, {"window": "sunroof", "action": "open"},
+                                  {"action": "smash"}])
+def test_control_window_malformed(state, args):
+    assert not run_tool_call("control_window", args, state).ok
+    assert dict(state.windows) == {"driver": 0, "passenger": 0}
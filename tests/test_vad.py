@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from core.vad import Endpointer, VoiceActivityDetector
+
+RATE = 16000
+BLOCK = 480  # 30 ms, as the voice handler reads
+
+
+def _noise(seconds, rng):
+    return rng.normal(0, 30, int(seconds * RATE))
+
+
+def _voiced(seconds, rng):
+    """A 150 Hz buzz with harmonics: loud and far from flat, like a vowel."""
+    t = np.arange(int(seconds * RATE)) / RATE
+    tone = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 12))
+    return tone * 3000 + rng.normal(0, 30, len(t))
+
+
+def _audio(*parts, seed=0):
+    """Parts are ("speech" | "quiet", seconds)."""
+    rng = np.random.default_rng(seed)
+    return np.concatenate([_voiced(s, rng) if kind == "speech" else _noise(s, rng)
+                           for kind, s in parts]).astype(np.int16)
+
+
+def _vad():
+    return VoiceActivityDetector(rate=RATE, frame_ms=20, onset_ms=60, hangover_ms=300, noise_db=30.0)
+
+
+def _run(audio, **kwargs):
+    endpointer = Endpointer(_vad(), **kwargs)
+    status = None
+    for i in range(0, len(audio), BLOCK):
+        status = endpointer.feed(audio[i:i + BLOCK])
+        if status:
+            break
+    start = None if endpointer.speech_start is None else endpointer.speech_start / RATE
+    end = None if endpointer.speech_end is None else endpointer.speech_end / RATE
+    return status, start, end
+
+
+def test_short_blip_does_not_start_speech():
+    decisions = _vad().process(_audio(("quiet", 0.5), ("speech", 0.04), ("quiet", 0.5)))
+    assert not decisions.any()
+
+
+def test_onset_and_hangover():
+    status, start, end = _run(_audio(("quiet", 0.5), ("speech", 1.0), ("quiet", 1.0)))
+    assert status == "end"
+    assert start == pytest.approx(0.5, abs=0.04)
+    assert end == pytest.approx(1.5 + 0.3, abs=0.04)  # the pause had to last the hangover
+
+
+def test_short_pause_does_not_end_the_command():
+    status, start, end = _run(_audio(("quiet", 0.3), ("speech", 0.6), ("quiet", 0.2),
+                                     ("speech", 0.6), ("quiet", 1.0)))
+    assert status == "end"
+    assert end == pytest.approx(1.7 + 0.3, abs=0.04)
+
+
+def test_no_speech_timeout():
+    status, start, end = _run(_audio(("quiet", 3.0)), no_speech_timeout=2.0)
+    assert (status, start) == ("timeout", None)
+
+
+def test_max_length_cutoff():
+    status, start, end = _run(_audio(("quiet", 0.2), ("speech", 5.0)), max_seconds=2.0)
+    assert status == "limit"
+    assert end == pytest.approx(2.0, abs=0.04)
+
+
+def test_wake_word_tail_in_the_preroll_is_ignored():
+    # 0.3 s pre-roll: the end of "Jarvis", then a pause before the command
+    audio = _audio(("speech", 0.2), ("quiet", 0.7), ("speech", 1.0), ("quiet", 1.0))
+    # Without skipping it, the wake word tail is taken as the whole command
+    status, start, end = _run(audio)
+    assert status == "end" and end < 0.9
+
+    status, start, end = _run(audio, skip_samples=int(0.3 * RATE))
+    assert status == "end"
+    assert start == pytest.approx(0.9, abs=0.04)
+    assert end == pytest.approx(1.9 + 0.3, abs=0.04)
@@ -0,0 +1,91 @@
+import socket
+
+import numpy as np
+
+from core import metrics
+from core.vehicle_bus import FRAME, SIGNALS, BusSignal, UdpSource, decode, read_log, send_frames, write_log
+
+
+def _frames(rows):
+    """FRAME array from (t, id, payload bytes) rows; dlc is the payload length."""
+    frames = np.zeros(len(rows), dtype=FRAME)
+    for i, (t, frame_id, data) in enumerate(rows):
+        frames[i]["t"] = t
+        frames[i]["id"] = frame_id
+        frames[i]["dlc"] = len(data)
+        frames[i]["data"][:len(data)] = list(data)
+    return frames
+
+
+def test_decode_default_signals():
+    frames = _frames([
+        (0.0, 0x1A0, (5000).to_bytes(2, "little") + (3000 * 4).to_bytes(2, "little")),
+        (0.1, 0x2F0, bytes([125])),
+        (0.2, 0x3C0, bytes([120, 70])),
+        (0.3, 0x1A0, (5100).to_bytes(2, "little") + (3100 * 4).to_bytes(2, "little")),
+        (0.4, 0x7FF, bytes(8)),  # not in the database
+    ])
+    out = decode(frames, SIGNALS)
+    times, speed = out["vehicle_speed"]
+    assert times.tolist() == [0.0, 0.3]
+    assert np.allclose(speed, [50.0, 51.0])
+    assert np.allclose(out["engine_rpm"][1], [3000, 3100])
+    assert np.allclose(out["fuel_level"][1], [50.0])
+    assert np.allclose(out["cabin_temp"][1], [20.0])
+    assert np.allclose(out["outside_temp"][1], [-5.0])
+
+
+def test_decode_signed_and_big_endian():
+    signals = [BusSignal("steering", 0x100, 0, 16, scale=0.1, signed=True),
+               BusSignal("torque", 0x100, 48, 16, byte_order="big")]
+    frames = _frames([(0.0, 0x100, (-1234).to_bytes(2, "little", signed=True) + bytes(6)),
+                      (0.1, 0x100, bytes([0x01, 0x02]) + bytes(6))])  # big-endian bits 48-63 are bytes 0-1
+    out = decode(frames, signals)
+    assert np.allclose(out["steering"][1], [-123.4, 0x0201 * 0.1])
+    assert out["torque"][1].tolist() == [0x2EFB, 0x0102]  # -1234 is 2E FB in little-endian bytes
+
+
+def test_decode_skips_signals_past_the_dlc():
+    metrics.reset()
+    frames = _frames([
+        (0.0, 0x3C0, bytes([120])),       # only cabin_temp fits
+        (0.1, 0x3C0, bytes([100, 90])),
+    ])
+    out = decode(frames, SIGNALS)
+    assert out["cabin_temp"][0].tolist() == [0.0, 0.1]
+    assert out["outside_temp"][0].tolist() == [0.1]
+    assert metrics.counter("bus.short_frames") == 1
+
+    big = BusSignal("flag", 0x100, 56, 8, byte_order="big")  # byte 0
+    assert "flag" in decode(_frames([(0.0, 0x100, bytes([7]))]), [big])
+    low = BusSignal("level", 0x100, 0, 8, byte_order="big")   # byte 7
+    assert "level" not in decode(_frames([(0.0, 0x100, bytes([7]))]), [low])
+
+
+def test_log_roundtrip(tmp_path):
+    frames = _frames([(1.5, 0x1A0, bytes([0x88, 0x13])), (1.6, 0x2F0, bytes([200])), (1.7, 0x3C0, b"")])
+    path = tmp_path / "bus.log"
+    write_log(str(path), frames)
+    loaded = read_log(str(path))
+    assert np.array_equal(loaded, frames)
+
+
+def test_udp_drops_only_the_malformed_datagram():
+    metrics.reset()
+    source = UdpSource("127.0.0.1", 0)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        good = _frames([(float(i), 0x1A0, bytes([i, 0])) for i in range(6)])
+        send_frames(sender, source.address, good[:3])
+        sender.sendto(good[3:4].tobytes()[:-5], source.address)  # truncated record
+        send_frames(sender, source.address, good[3:])
+        got = []
+        for _ in range(10):
+            got.append(source.read_batch(timeout=1.0))
+            if sum(len(b) for b in got) >= 6:
+                break
+        assert np.array_equal(np.concatenate(got), good)
+        assert metrics.counter("bus.bad_datagrams") == 1
+    finally:
+        sender.close()
+        source.close()
@@ -29,6 +29,7 @@ except ImportError:
                 self.setText(html)
 
 from core import car_state
+from core import startup
 
 
 
@@ -304,13 +305,15 @@ class Dashboard(QMainWindow):
         self.setWindowTitle("CarAI Assistant")
         self.setStyleSheet("background-color: #1e1e1e; color: white;")
         self.setMinimumSize(1000, 600)
+        self._painted = False
 
         self.init_ui()
-        
-        # update timer
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_ui)
-        self.timer.start(500) # update every 500ms
+        self.update_ui()
+
+        # Redraw only what changed, as soon as it changes. The state can be
+        # written from any thread; the signal queues the redraw to the GUI thread.
+        self.state_changed.connect(self.apply_changes)
+        self._unsubscribe = self.state.subscribe(self._on_state_changed)
 
 
 
@@ -600,31 +603,58 @@ class Dashboard(QMainWindow):
     # Define signals
     command_entered = pyqtSignal(str)
     listen_requested = pyqtSignal()
+    first_frame = pyqtSignal()  # once, after the window has been painted
+    state_changed = pyqtSignal(dict)  # CarState diff {field: (old, new)}
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            startup.mark("first_frame")
+            # Queued so slow work connected to it runs after this paint finishes
+            QTimer.singleShot(0, self.first_frame.emit)
 
 
     def update_voice_status(self, text):
         self.status_label.setText(text)
 
 
+    def _on_state_changed(self, diff, version):
+        # Called on whichever thread changed the state; the animations read
+        # ai_talking / is_listening themselves
+        if any(field in self.REDRAW for field in diff):
+            self.state_changed.emit(diff)
+
+    def apply_changes(self, diff):
+        """Refreshes the parts of the UI whose fields are in `diff`."""
+        for update in {self.REDRAW[field] for field in diff if field in self.REDRAW}:
+            update(self)
+
     def update_ui(self):
-        """Updates UI elements based on car_state."""
-        # Update Speed
+        """Updates every UI element from car_state."""
+        for update in set(self.REDRAW.values()):
+            update(self)
+
+    def _update_speed(self):
         self.speed_label.setText(str(self.state.speed))
-        # Sync Button States
-        self.ac_btn.setChecked(self.state.ac_on)
-        self.ac_btn.setText(f"AC: {'ON' if self.state.ac_on else 'OFF'}")
-        
+
+    def _update_lights(self):
         self.lights_btn.setChecked(self.state.lights_on)
         self.lights_btn.setText(f"Lights: {'ON' if self.state.lights_on else 'OFF'}")
-        
-        self.wipers_btn.setChecked(self.state.wipers_on)
 
+    def _update_wipers(self):
+        self.wipers_btn.setChecked(self.state.wipers_on)
         self.wipers_btn.setText(f"Wipers: {'ON' if self.state.wipers_on else 'OFF'}")
-        
+
+    def _update_ac(self):
+        ac_on, ac_temp = self.state.ac_on, self.state.ac_temp
+        self.ac_btn.setChecked(ac_on)
+        self.ac_btn.setText(f"AC: {'ON' if ac_on else 'OFF'}")
+
         # Update AC Display
-        ac_status = "ON" if self.state.ac_on else "OFF"
-        self.ac_display.setText(f"AC: {ac_status}  {self.state.ac_temp}°C")
-        if self.state.ac_on:
+        ac_status = "ON" if ac_on else "OFF"
+        self.ac_display.setText(f"AC: {ac_status}  {ac_temp}°C")
+        if ac_on:
              self.ac_display.setStyleSheet("""
                 font-size: 24px; color: #00ffaa; background-color: rgba(0, 50, 0, 150);
                 border: 1px solid #00ffaa; border-radius: 10px; padding: 10px; margin-top: 10px;
@@ -635,14 +665,29 @@ class Dashboard(QMainWindow):
                 border: 1px solid #555; border-radius: 10px; padding: 10px; margin-top: 10px;
              """)
 
-        # Nav
+    def _update_nav(self):
+        eta = f" (ETA {self.state.eta_minutes} min)" if self.state.eta_minutes else ""
         if self.state.destination:
              if HAS_WEBENGINE:
                  self.map_view.setHtml(f"""
                     <html><body style='background:#222;color:#1e90ff;display:flex;justify-content:center;align-items:center;height:100%;font-family:sans-serif;'>
-                    <h1>Navigating to: {self.state.destination}</h1>
+                    <h1>Navigating to: {self.state.destination}{eta}</h1>
                     </body></html>
                 """)
              else:
-                 self.map_view.set_html(f"Navigating to: {self.state.destination}")
+                 self.map_view.set_html(f"Navigating to: {self.state.destination}{eta}")
+        elif HAS_WEBENGINE:
+             self.map_view.setHtml("<html><body style='background:#0f0f1a;color:#00d4ff;font-family:sans-serif;'><h3>NAV ONLINE</h3></body></html>")
+        else:
+             self.map_view.setText("NAV SYSTEM\nTARGET: N/A")
 
+    # CarState field -> what to redraw when it changes
+    REDRAW = {
+        "speed": _update_speed,
+        "ac_on": _update_ac,
+        "ac_temp": _update_ac,
+        "lights_on": _update_lights,
+        "wipers_on": _update_wipers,
+        "destination": _update_nav,
+        "eta_minutes": _update_nav,
+    }